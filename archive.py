@@ -0,0 +1,214 @@
+# archive.py - ARCHIVO DE VENTAS ANTIGUAS (BASE CALIENTE / BASE FRÍA)
+"""
+Mueve las ventas de meses cerrados de pos.db a un archivo SQLite aparte
+(pos_archive.db) para que la caja trabaje siempre sobre una base chica:
+consultas, respaldos y VACUUM dependen del tamaño de los últimos meses y no
+de todo el historial.
+
+    python archive.py                       # deja los últimos 12 meses en pos.db
+    python archive.py --keep-months 6 --vacuum
+    python archive.py --before 2024-01-01 --dry-run
+
+El movimiento se hace en dos pasos, cada uno atómico en su propio archivo
+(con WAL, SQLite no garantiza transacciones entre dos bases adjuntas):
+
+1. Copiar ventas y renglones al archivo (INSERT OR IGNORE por id).
+2. En pos.db: sumar los totales de esos días en sale_days y borrar sólo las
+   ventas que ya están en el archivo.
+
+Si se interrumpe entre ambos pasos, volver a ejecutarlo termina el trabajo
+sin duplicar nada.
+
+La aplicación adjunta el archivo en modo sólo lectura (attach(), ver db.py)
+y los reportes históricos leen ambas bases con union_of(tabla). Los totales
+por día de lo archivado quedan en sale_days dentro de pos.db.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+from datetime import date, datetime
+from urllib.request import pathname2url
+
+from sqlalchemy import column, event, select, table, union_all
+
+import migrations
+from pos_logging import get_logger
+
+log = get_logger("archive")
+
+ARCHIVE_PATH = os.environ.get('POS_ARCHIVE_DB', 'pos_archive.db')
+SCHEMA = 'archive'
+KEEP_MONTHS = 12
+ARCHIVED_TABLES = ('sales', 'sale_items')
+
+_CREATE_TABLE = re.compile(r'^CREATE TABLE\s+', re.IGNORECASE)
+_CREATE_INDEX = re.compile(r'^CREATE (UNIQUE )?INDEX\s+', re.IGNORECASE)
+
+attached = False  # True si la sesión de la aplicación ve el archivo
+
+
+# ========== LECTURA DESDE LA APLICACIÓN ==========
+def attach(engine, path=ARCHIVE_PATH):
+    """✅ Adjuntar el archivo en sólo lectura a cada conexión del engine (si existe)"""
+    global attached
+    if not os.path.exists(path):
+        return False
+    uri = f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+
+    @event.listens_for(engine, 'connect')
+    def _attach(dbapi_conn, record):
+        dbapi_conn.execute(f"ATTACH DATABASE ? AS {SCHEMA}", (uri,))
+
+    attached = True
+    log.debug("🗄️ Archivo de ventas adjunto: %s", path)
+    return True
+
+
+def union_of(hot):
+    """Tabla caliente + la misma tabla del archivo (UNION ALL), con las mismas columnas
+
+    Sin archivo adjunto devuelve la tabla tal cual, así que se puede usar siempre:
+
+        sales = union_of(Sale.__table__)
+        session.query(func.count()).select_from(sales).filter(sales.c.date >= desde)
+    """
+    if not attached:
+        return hot
+    cold = table(hot.name, *(column(c.name) for c in hot.c), schema=SCHEMA)
+    return union_all(select(*hot.c), select(*cold.c)).subquery(f"{hot.name}_all")
+
+
+# ========== TRABAJO DE ARCHIVO ==========
+def month_start(d):
+    return d.replace(day=1)
+
+
+def default_cutoff(conn, keep_months=KEEP_MONTHS, today=None):
+    """Primer día del mes más antiguo que se queda en pos.db (nunca dentro de un turno abierto)"""
+    today = today or date.today()
+    months = today.year * 12 + today.month - 1 - keep_months
+    cutoff = date(months // 12, months % 12 + 1, 1)
+    open_start = conn.execute("SELECT MIN(start) FROM shifts WHERE \"end\" IS NULL").fetchone()[0]
+    if open_start:
+        cutoff = min(cutoff, month_start(datetime.fromisoformat(open_start).date()))
+    return cutoff
+
+
+def _ensure_schema(conn):
+    """Crear en el archivo las tablas e índices de ventas con la misma definición que pos.db"""
+    placeholders = ",".join("?" * len(ARCHIVED_TABLES))
+    rows = conn.execute(
+        f"SELECT type, sql FROM main.sqlite_master WHERE tbl_name IN ({placeholders}) AND sql IS NOT NULL "
+        f"ORDER BY type = 'index'", ARCHIVED_TABLES
+    ).fetchall()
+    for kind, sql in rows:
+        if kind == 'table':
+            sql = _CREATE_TABLE.sub(f"CREATE TABLE IF NOT EXISTS {SCHEMA}.", sql, count=1)
+        else:
+            sql = _CREATE_INDEX.sub(lambda m: f"CREATE {m.group(1) or ''}INDEX IF NOT EXISTS {SCHEMA}.", sql, count=1)
+        conn.execute(sql)
+
+
+def archive_sales(cutoff, db_path='pos.db', archive_path=ARCHIVE_PATH, dry_run=False):
+    """✅ Mover las ventas anteriores a cutoff al archivo; devuelve {'sales', 'items', 'days'}"""
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        # La venta más nueva se queda siempre: así los ids nuevos nunca repiten los archivados
+        selected = ("SELECT id FROM main.sales WHERE date < :cutoff "
+                    "AND id < (SELECT MAX(id) FROM main.sales)")
+        params = {'cutoff': cutoff.isoformat()}
+
+        if dry_run:
+            sales, items, days = conn.execute(
+                f"SELECT COUNT(DISTINCT s.id), COUNT(i.id), COUNT(DISTINCT s.date) FROM main.sales s "
+                f"LEFT JOIN main.sale_items i ON i.sale_id = s.id WHERE s.id IN ({selected})", params
+            ).fetchone()
+            return {'sales': sales, 'items': items, 'days': days}
+
+        # 1. Copiar al archivo
+        migrations.migrate(db_path)  # sale_days en bases que todavía no abrió el programa
+        conn.execute(f"ATTACH DATABASE ? AS {SCHEMA}", (archive_path,))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _ensure_schema(conn)
+            conn.execute(f"INSERT OR IGNORE INTO {SCHEMA}.sales SELECT * FROM main.sales WHERE id IN ({selected})",
+                         params)
+            conn.execute(f"INSERT OR IGNORE INTO {SCHEMA}.sale_items SELECT * FROM main.sale_items "
+                         f"WHERE sale_id IN ({selected})", params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        # 2. Totales diarios y borrado en pos.db (sólo lo que ya quedó copiado)
+        moved = f"{selected} AND id IN (SELECT id FROM {SCHEMA}.sales)"
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            days = conn.execute(
+                f"INSERT INTO main.sale_days (date, sales, items, total) "
+                f"SELECT s.date, COUNT(DISTINCT s.id), COUNT(i.id), COALESCE(SUM(i.quantity * i.price), 0) "
+                f"FROM main.sales s LEFT JOIN main.sale_items i ON i.sale_id = s.id "
+                f"WHERE s.id IN ({moved}) GROUP BY s.date "
+                f"ON CONFLICT(date) DO UPDATE SET sales = sales + excluded.sales, "
+                f"items = items + excluded.items, total = total + excluded.total", params
+            ).rowcount
+            items = conn.execute(f"DELETE FROM main.sale_items WHERE sale_id IN ({moved})", params).rowcount
+            sales = conn.execute(f"DELETE FROM main.sales WHERE id IN ({moved})", params).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+    log.info("🗄️ %d ventas (%d renglones, %d días) anteriores a %s movidas a %s",
+             sales, items, days, cutoff, archive_path)
+    return {'sales': sales, 'items': items, 'days': days}
+
+
+def vacuum(db_path='pos.db'):
+    """Devolver al disco el espacio liberado en pos.db"""
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mover ventas de meses cerrados al archivo")
+    parser.add_argument('--db', default='pos.db')
+    parser.add_argument('--archive', default=ARCHIVE_PATH)
+    parser.add_argument('--keep-months', type=int, default=KEEP_MONTHS,
+                        help=f"Meses que se quedan en la base principal ({KEEP_MONTHS} por defecto)")
+    parser.add_argument('--before', type=date.fromisoformat, help="Archivar hasta esta fecha (se redondea al mes)")
+    parser.add_argument('--vacuum', action='store_true', help="Compactar pos.db al terminar")
+    parser.add_argument('--dry-run', action='store_true', help="Sólo mostrar cuánto se movería")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"No existe {args.db}")
+    conn = sqlite3.connect(args.db)
+    try:
+        cutoff = default_cutoff(conn, args.keep_months)
+        if args.before:
+            # Sólo meses cerrados: a lo sumo hasta el inicio del mes actual
+            cutoff = min(month_start(args.before), default_cutoff(conn, 0))
+    finally:
+        conn.close()
+
+    result = archive_sales(cutoff, args.db, args.archive, dry_run=args.dry_run)
+    verb = "Se moverían" if args.dry_run else "Movidas"
+    print(f"🗄️ {verb} {result['sales']:,} ventas ({result['items']:,} renglones, "
+          f"{result['days']:,} días) anteriores a {cutoff} → {args.archive}")
+    if args.vacuum and not args.dry_run and result['sales']:
+        vacuum(args.db)
+        print("✅ pos.db compactada")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
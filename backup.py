@@ -0,0 +1,288 @@
+# backup.py - RESPALDOS EN LÍNEA DE pos.db
+"""
+Copia pos.db con la API de respaldo de SQLite (sqlite3.Connection.backup)
+mientras la caja sigue vendiendo: copiar el archivo a mano con el programa
+abierto puede dejar una copia corrupta, y con archivos grandes se traba.
+
+- La copia avanza de a PAGES_PER_STEP páginas en un hilo aparte, con una
+  pausa corta entre pasos para no competir con las ventas por el disco.
+- Si otra conexión escribe durante la copia, SQLite la reinicia. Después de
+  MAX_RESTARTS reinicios el resto se copia en un solo paso: con WAL eso sólo
+  abre una lectura y no frena a quien escribe.
+- La copia se revisa con PRAGMA integrity_check, se comprime con gzip
+  (opcional) y se guarda en backups/pos-AAAAMMDD-HHMMSS.db[.gz]. Se conservan
+  las últimas KEEP copias.
+
+BackupService (main.py) hace un respaldo al cerrar cada turno y otro cada
+noche a la hora POS_BACKUP_HOUR. Desde la consola:
+
+    python backup.py now
+    python backup.py list
+    python backup.py verify backups/pos-20250630-230000.db.gz
+    python backup.py restore backups/pos-20250630-230000.db.gz   # con el programa cerrado
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import queue
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from pos_logging import get_logger
+
+log = get_logger("backup")
+
+BACKUP_DIR = os.environ.get('POS_BACKUP_DIR', 'backups')
+KEEP = int(os.environ.get('POS_BACKUP_KEEP', 14))
+COMPRESS = os.environ.get('POS_BACKUP_COMPRESS', '1') != '0'
+NIGHTLY_HOUR = int(os.environ.get('POS_BACKUP_HOUR', 23))   # -1 = sin respaldo nocturno
+PAGES_PER_STEP = 256    # páginas por paso (1 MB con páginas de 4 KB)
+STEP_PAUSE = 0.005      # segundos entre pasos
+MAX_RESTARTS = 3
+PREFIX = 'pos-'
+
+
+class BackupError(Exception):
+    pass
+
+
+class _FinishAtOnce(Exception):
+    """Cortar la copia por pasos (demasiados reinicios)"""
+
+
+# ========== RESPALDO ==========
+def backup_database(src='pos.db', dest_dir=BACKUP_DIR, compress=COMPRESS, keep=KEEP):
+    """✅ Copia verificada de src en dest_dir; devuelve la ruta del respaldo"""
+    os.makedirs(dest_dir, exist_ok=True)
+    name = f"{PREFIX}{datetime.now():%Y%m%d-%H%M%S}.db"
+    final = os.path.join(dest_dir, name + ('.gz' if compress else ''))
+    part = os.path.join(dest_dir, name + '.part')
+    started = time.perf_counter()
+
+    source = sqlite3.connect(f"file:{os.path.abspath(src)}?mode=ro", uri=True, timeout=30)
+    target = sqlite3.connect(part)
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+        last_remaining = remaining
+        if restarts > MAX_RESTARTS:
+            raise _FinishAtOnce()
+        time.sleep(STEP_PAUSE)  # Ceder el disco a la caja entre pasos
+
+    try:
+        try:
+            source.backup(target, pages=PAGES_PER_STEP, progress=progress)
+        except _FinishAtOnce:
+            log.debug("💾 %d reinicios por escrituras: se copia el resto en un paso", restarts)
+            source.backup(target, pages=-1)
+        check = target.execute("PRAGMA integrity_check").fetchone()[0]
+        if check != 'ok':
+            raise BackupError(f"La copia no pasó integrity_check: {check}")
+    except Exception:
+        target.close()
+        os.remove(part)
+        raise
+    finally:
+        source.close()
+    target.close()
+
+    if compress:
+        with open(part, 'rb') as raw, gzip.open(final + '.part', 'wb', compresslevel=6) as packed:
+            shutil.copyfileobj(raw, packed, 1024 * 1024)
+        os.remove(part)
+        part = final + '.part'
+    os.replace(part, final)  # El respaldo aparece completo o no aparece
+
+    log.info("💾 Respaldo %s (%.1f MB) en %.1f s", final, os.path.getsize(final) / 1e6,
+             time.perf_counter() - started)
+    rotate(dest_dir, keep)
+    return final
+
+
+def list_backups(dest_dir=BACKUP_DIR):
+    """Respaldos completos, del más nuevo al más viejo"""
+    files = glob.glob(os.path.join(dest_dir, f"{PREFIX}*.db")) + glob.glob(os.path.join(dest_dir, f"{PREFIX}*.db.gz"))
+    return sorted(files, key=os.path.basename, reverse=True)
+
+
+def rotate(dest_dir=BACKUP_DIR, keep=KEEP):
+    for path in list_backups(dest_dir)[keep:]:
+        os.remove(path)
+        log.debug("🗑️ Respaldo viejo eliminado: %s", path)
+
+
+# ========== VERIFICACIÓN Y RESTAURACIÓN ==========
+def _open_snapshot(path):
+    """Conexión a una copia sin comprimir del respaldo (y el archivo temporal a borrar, si hubo)"""
+    if not path.endswith('.gz'):
+        return sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True), None
+    fd, tmp = tempfile.mkstemp(suffix='.db')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.open(path, 'rb') as packed:
+            shutil.copyfileobj(packed, raw, 1024 * 1024)
+    except Exception:
+        os.remove(tmp)
+        raise
+    return sqlite3.connect(tmp), tmp
+
+
+def verify(path):
+    """✅ (ok, detalle): integrity_check y cantidad de filas de las tablas principales"""
+    try:
+        conn, tmp = _open_snapshot(path)
+    except (OSError, EOFError) as e:
+        return False, f"No se pudo leer: {e}"
+    try:
+        check = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if check != 'ok':
+            return False, check
+        counts = []
+        for table in ('products', 'sales', 'payments', 'shifts'):
+            try:
+                counts.append(f"{table}={conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]:,}")
+            except sqlite3.Error:
+                return False, f"Falta la tabla {table}"
+        return True, ", ".join(counts)
+    except sqlite3.DatabaseError as e:
+        return False, str(e)
+    finally:
+        conn.close()
+        if tmp:
+            os.remove(tmp)
+
+
+def restore(path, target='pos.db', dest_dir=BACKUP_DIR):
+    """✅ Verificar el respaldo y copiarlo sobre target (guardando antes una copia de target)"""
+    ok, detail = verify(path)
+    if not ok:
+        raise BackupError(f"El respaldo no es válido: {detail}")
+    safety = backup_database(target, dest_dir) if os.path.exists(target) else None
+    conn, tmp = _open_snapshot(path)
+    try:
+        # Con la API de respaldo el WAL de target queda coherente (copiar el archivo no lo haría)
+        dest = sqlite3.connect(target, timeout=30)
+        try:
+            conn.backup(dest)
+        finally:
+            dest.close()
+    finally:
+        conn.close()
+        if tmp:
+            os.remove(tmp)
+    log.info("♻️ %s restaurada desde %s (copia previa: %s)", target, path, safety)
+    return safety
+
+
+# ========== SERVICIO EN SEGUNDO PLANO ==========
+class BackupService:
+    """✅ HILO DE RESPALDOS: a pedido (cierre de turno) y cada noche"""
+
+    def __init__(self, path='pos.db', dest_dir=BACKUP_DIR, nightly_hour=NIGHTLY_HOUR):
+        self.path = path
+        self.dest_dir = dest_dir
+        self.nightly_hour = nightly_hour
+        self._requests = queue.Queue()
+        self._thread = None
+        self.last_backup = None
+        self.last_error = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="pos-backup", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._requests.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def request(self, reason="manual"):
+        """Pedir un respaldo; vuelve enseguida (la copia se hace en el hilo)"""
+        self._requests.put(reason)
+
+    def _next_nightly(self, now):
+        if self.nightly_hour < 0:
+            return None
+        at = now.replace(hour=self.nightly_hour, minute=0, second=0, microsecond=0)
+        return at if at > now else at + timedelta(days=1)
+
+    def _run(self):
+        nightly = self._next_nightly(datetime.now())
+        while True:
+            try:
+                reason = self._requests.get(timeout=60)
+            except queue.Empty:
+                if nightly is None or datetime.now() < nightly:
+                    continue  # Revisar el reloj cada minuto (la PC pudo suspenderse)
+                reason = "nocturno"
+                nightly = self._next_nightly(datetime.now())
+            if reason is None:
+                return
+            # Varios pedidos seguidos (cierres de turno casi juntos) se atienden con una sola copia
+            while not self._requests.empty():
+                if self._requests.get_nowait() is None:
+                    return
+            try:
+                log.debug("💾 Respaldo (%s) iniciado", reason)
+                self.last_backup = backup_database(self.path, self.dest_dir)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                log.error("❌ Respaldo (%s) falló: %s", reason, e)
+
+
+# ========== CONSOLA ==========
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Respaldos de la base de datos del POS")
+    parser.add_argument('--db', default='pos.db')
+    parser.add_argument('--dir', default=BACKUP_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('now', help="Hacer un respaldo ahora")
+    sub.add_parser('list', help="Listar respaldos")
+    p_verify = sub.add_parser('verify', help="Revisar un respaldo")
+    p_verify.add_argument('file')
+    p_restore = sub.add_parser('restore', help="Restaurar un respaldo (con el programa cerrado)")
+    p_restore.add_argument('file')
+    p_restore.add_argument('--yes', action='store_true', help="No pedir confirmación")
+    args = parser.parse_args(argv)
+
+    if args.command == 'now':
+        print(f"💾 {backup_database(args.db, args.dir)}")
+    elif args.command == 'list':
+        for path in list_backups(args.dir):
+            stamp = datetime.fromtimestamp(os.path.getmtime(path))
+            print(f"{stamp:%Y-%m-%d %H:%M}  {os.path.getsize(path) / 1e6:8.1f} MB  {path}")
+    elif args.command == 'verify':
+        ok, detail = verify(args.file)
+        print(f"{'✅' if ok else '❌'} {args.file}: {detail}")
+        return 0 if ok else 1
+    elif args.command == 'restore':
+        if not args.yes:
+            answer = input(f"¿Reemplazar {args.db} con {args.file}? [s/N] ").strip().lower()
+            if answer not in ('s', 'si', 'sí', 'y', 'yes'):
+                print("Cancelado.")
+                return 1
+        try:
+            safety = restore(args.file, args.db, args.dir)
+        except BackupError as e:
+            print(f"❌ {e}")
+            return 1
+        print(f"♻️ {args.db} restaurada" + (f" (copia previa en {safety})" if safety else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# barcode_decode.py - LECTURA DE CÓDIGOS DE BARRAS EN FOTOS
+"""
+Decodifica códigos de barras de una imagen (bytes) con pyzbar, usando los
+mismos pasos que test_decode.py (imagen cruda, escala de grises con
+autocontraste y binarizado), pero:
+
+- Reduce primero la foto: los códigos de barras se leen igual a ~1600 px y
+  una foto de teléfono de 12 MP tarda varias veces más. Sólo si la versión
+  reducida no da resultado se reintenta a resolución completa.
+- Corre las estrategias en paralelo en un pool de procesos y devuelve la
+  primera que encuentre algún código (las demás se cancelan o se ignoran).
+- Guarda los resultados por hash de la imagen: reenviar la misma foto no
+  vuelve a decodificar.
+
+Pillow y pyzbar son opcionales: sin ellos decode_barcodes lanza
+DecodeUnavailable y el servidor web responde con el mensaje de error.
+"""
+
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, ProcessPoolExecutor, wait
+
+from pos_logging import get_logger
+
+try:
+    from PIL import Image, ImageOps
+    from pyzbar.pyzbar import decode as zbar_decode
+except ImportError:
+    Image = ImageOps = zbar_decode = None
+
+log = get_logger(__name__)
+
+MAX_SIDE = int(os.environ.get('POS_DECODE_MAX_SIDE', 1600))   # px del lado mayor en el primer intento
+CACHE_SIZE = 256
+STRATEGIES = ('raw', 'autocontrast', 'threshold')
+WORKERS = min(len(STRATEGIES), os.cpu_count() or 1)
+
+_pool = None
+_pool_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+stats = {'decodes': 0, 'cache_hits': 0, 'full_res_retries': 0}
+
+
+class DecodeUnavailable(RuntimeError):
+    """Faltan Pillow o pyzbar"""
+
+
+# ========== ESTRATEGIAS (se ejecutan en los procesos del pool) ==========
+def _prepare(img, strategy):
+    if strategy == 'raw':
+        return img
+    gray = img.convert('L')
+    if strategy == 'autocontrast':
+        return ImageOps.autocontrast(gray)
+    # 'threshold': umbral binario (negro/blanco)
+    return gray.point(lambda x: 0 if x < 128 else 255, '1')
+
+
+def run_strategy(strategy, mode, size, pixels):
+    """Decodificar una imagen ya cargada (mode, size, bytes) con una estrategia"""
+    img = Image.frombytes(mode, size, pixels)
+    return [c.data.decode('utf-8', 'replace') for c in zbar_decode(_prepare(img, strategy))]
+
+
+# ========== PIPELINE ==========
+def load_image(data, max_side=MAX_SIDE):
+    """(imagen lista para decodificar, si fue reducida); max_side=None = resolución completa"""
+    img = Image.open(io.BytesIO(data))
+    reduced = bool(max_side) and max(img.size) > max_side
+    if reduced and img.format == 'JPEG':
+        img.draft('RGB', (max_side, max_side))  # El JPEG se decodifica ya a 1/2, 1/4 u 1/8
+    img = ImageOps.exif_transpose(img)  # Fotos de teléfono giradas por EXIF
+    if img.mode not in ('L', 'RGB'):
+        img = img.convert('RGB')
+    if reduced and max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS, reducing_gap=2.0)
+    return img, reduced
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: seguro aunque el proceso tenga hilos (servidor, Qt)
+            _pool = ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _ping():
+    return os.getpid()
+
+
+def warm_up():
+    """Arrancar los procesos del pool (e importar este módulo en ellos) antes de la primera foto"""
+    if Image is None or WORKERS < 2:
+        return
+    pool = _get_pool()
+    for f in [pool.submit(_ping) for _ in range(WORKERS)]:
+        f.result()
+
+
+def _parallel(args):
+    pool = _get_pool()
+    pending = [pool.submit(run_strategy, strategy, *args) for strategy in STRATEGIES]
+    try:
+        while pending:
+            done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+            pending = [f for f in pending if f in not_done]
+            for future in done:
+                codes = future.result()
+                if codes:
+                    return codes
+        return []
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _sequential(args):
+    for strategy in STRATEGIES:
+        codes = run_strategy(strategy, *args)
+        if codes:
+            return codes
+    return []
+
+
+def _first_success(img, parallel=True):
+    """Corre todas las estrategias en paralelo; devuelve los códigos de la primera que acierte"""
+    global _pool
+    args = (img.mode, img.size, img.tobytes())
+    if not parallel or WORKERS < 2:
+        return _sequential(args)  # Con un solo núcleo el pool sólo agrega copias de la imagen
+    try:
+        return _parallel(args)
+    except (OSError, BrokenExecutor) as e:
+        # Sin procesos disponibles: mismas estrategias, una tras otra
+        log.warning("⚠️ Pool de decodificación no disponible (%s), se usa modo secuencial", e)
+        with _pool_lock:
+            _pool = None
+        return _sequential(args)
+
+
+def decode_barcodes(data, parallel=True, unique=True):
+    """✅ Códigos encontrados en la imagen, en orden de aparición.
+
+    parallel=False corre las estrategias en este proceso (para llamarla desde
+    otro pool); unique=False conserva un código por cada etiqueta encontrada.
+    """
+    if Image is None:
+        raise DecodeUnavailable("Instale Pillow y pyzbar para leer códigos de barras")
+
+    key = hashlib.sha1(data).hexdigest()
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            stats['cache_hits'] += 1
+            codes = list(_cache[key])
+            return list(dict.fromkeys(codes)) if unique else codes
+
+    started = time.perf_counter()
+    small, reduced = load_image(data)
+    codes = _first_success(small, parallel)
+    if not codes and reduced:
+        stats['full_res_retries'] += 1
+        codes = _first_success(load_image(data, None)[0], parallel)
+    stats['decodes'] += 1
+    log.debug("🔎 Decodificación: %d códigos en %.0f ms (%dx%d)", len(codes),
+              (time.perf_counter() - started) * 1000, *small.size)
+
+    with _cache_lock:
+        _cache[key] = tuple(codes)
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return list(dict.fromkeys(codes)) if unique else codes
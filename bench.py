@@ -0,0 +1,101 @@
+# bench.py - COMPARACIÓN DE CONSULTAS ARMADAS EN CADA LLAMADA VS PREARMADAS
+"""
+Mide el costo por llamada de las búsquedas frecuentes de las facturas y
+entradas en dos estilos:
+
+- armada: session.query(...).filter(...) nueva en cada llamada (como antes)
+- prearmada: la sentencia de queries.py con sus parámetros
+
+Usa una base sintética de generate_data.py (la crea si no existe):
+
+    python bench.py                          # pos_load.db, escala small
+    python bench.py --db pos_load.db --scale medium --n 5000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, or_, select
+from sqlalchemy.orm import sessionmaker
+
+import generate_data
+import queries
+from database_setup import Product, BulkProduct
+
+
+def _time_calls(fn, args, repeat=5):
+    """Mediana de microsegundos por llamada sobre varias pasadas"""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for a in args:
+            fn(a)
+        runs.append((time.perf_counter() - started) / len(args) * 1e6)
+    return statistics.median(runs)
+
+
+def cases(s):
+    """(nombre, armada, prearmada) para cada búsqueda frecuente"""
+    return [
+        ("producto por código",
+         lambda code: s.query(Product).filter_by(code=code).first(),
+         lambda code: s.scalars(queries.PRODUCT_BY_CODE, {'code': code}).first()),
+        ("granel por código",
+         lambda code: s.query(BulkProduct).filter_by(code=code).first(),
+         lambda code: s.scalars(queries.BULK_BY_CODE, {'code': code}).first()),
+        ("fila de catálogo",
+         lambda code: s.execute(select(Product.id, Product.code, Product.name, Product.price)
+                                .where(Product.code == code)).first(),
+         lambda code: s.execute(queries.PRODUCT_ROW_BY_CODE, {'code': code}).first()),
+        ("código parcial",
+         lambda text: s.query(Product).filter(Product.code.ilike(f"%{text}%")).first(),
+         lambda text: s.scalars(queries.PRODUCT_CODE_LIKE, queries.like(text)).first()),
+        ("autocompletado entradas",
+         lambda text: s.query(Product).filter(
+             or_(Product.code.ilike(f"%{text}%"), Product.name.ilike(f"%{text}%"))).limit(10).all(),
+         lambda text: s.execute(queries.PRODUCT_SUGGEST, queries.like(text)).all()),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Costo por llamada de las consultas frecuentes")
+    parser.add_argument('--db', default='pos_load.db')
+    parser.add_argument('--scale', choices=sorted(generate_data.SCALES), default='small')
+    parser.add_argument('--n', type=int, default=2000, help="Llamadas por pasada")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"🔄 Generando {args.db} (escala {args.scale})...")
+        generate_data.generate(args.db, scale=args.scale)
+
+    s = sessionmaker(bind=create_engine(f"sqlite:///{args.db}"))()
+    rng = random.Random(1)
+    codes = [c for (c,) in s.execute(select(Product.code))]
+    bulk_codes = [c for (c,) in s.execute(select(BulkProduct.code))] or codes
+    sample = {
+        "producto por código": [rng.choice(codes) for _ in range(args.n)],
+        "granel por código": [rng.choice(bulk_codes) for _ in range(args.n)],
+        "fila de catálogo": [rng.choice(codes) for _ in range(args.n)],
+        # Las búsquedas parciales recorren la tabla: menos llamadas
+        "código parcial": [rng.choice(codes)[-6:] for _ in range(args.n // 10)],
+        "autocompletado entradas": [rng.choice(codes)[-5:] for _ in range(args.n // 10)],
+    }
+
+    print(f"\n{'consulta':<26} {'armada µs':>10} {'prearmada µs':>13} {'ahorro':>8}")
+    for name, built, prebuilt in cases(s):
+        data = sample[name]
+        built(data[0]), prebuilt(data[0])  # Calentar el caché de compilación de SQLAlchemy
+        s.expunge_all()
+        before = _time_calls(built, data)
+        s.expunge_all()  # Mismo punto de partida: sin objetos ya cargados en la sesión
+        after = _time_calls(prebuilt, data)
+        print(f"{name:<26} {before:10.1f} {after:13.1f} {(before - after) / before:8.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
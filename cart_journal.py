@@ -0,0 +1,180 @@
+# cart_journal.py - DIARIO DE CARRITOS ABIERTOS
+"""
+Cada factura abierta escribe sus cambios en un archivo propio de sólo-agregar
+(carts/cliente_1.jsonl, ...) para poder recuperar el carrito si el programa
+se cierra de golpe antes de confirmar la venta.
+
+- append() sólo serializa la operación y la agrega a una lista en memoria
+  (microsegundos); un hilo de fondo escribe y hace fsync por lotes cada
+  FLUSH_INTERVAL segundos.
+- clear() trunca el archivo al confirmar o cancelar la venta.
+- replay() reconstruye las filas leyendo el archivo; una última línea
+  incompleta (corte durante la escritura) se ignora. No usa la base de datos.
+
+Operaciones: {"op": "add", "row": [...]}, {"op": "set", "i": fila, "row": [...]},
+{"op": "del", "i": fila}.
+"""
+
+import atexit
+import json
+import os
+import re
+import threading
+
+from pos_logging import get_logger
+
+log = get_logger(__name__)
+
+CART_DIR = os.environ.get('POS_CART_DIR', 'carts')
+FLUSH_INTERVAL = 0.2  # segundos
+
+_journals = []
+_registry_lock = threading.Lock()
+_wake = threading.Event()
+_writer = None
+
+
+def _file_name(lane):
+    return re.sub(r"[^a-z0-9]+", "_", lane.lower()).strip("_") + ".jsonl"
+
+
+class CartJournal:
+    """✅ DIARIO DE UNA FACTURA: agregar es barato, el disco se toca en segundo plano"""
+
+    def __init__(self, path):
+        self.path = path
+        self._pending = []
+        self._buf_lock = threading.Lock()   # protege _pending (nunca espera al disco)
+        self._io_lock = threading.Lock()    # serializa escrituras y truncados
+        self._file = None
+
+    @classmethod
+    def for_lane(cls, lane, directory=None):
+        """Diario de la factura con ese nombre, registrado en el hilo escritor"""
+        directory = directory or CART_DIR
+        os.makedirs(directory, exist_ok=True)
+        journal = cls(os.path.join(directory, _file_name(lane)))
+        with _registry_lock:
+            _journals.append(journal)
+        _start_writer()
+        return journal
+
+    # ========== ESCRITURA ==========
+    def append(self, op, **data):
+        data['op'] = op
+        line = json.dumps(data, ensure_ascii=False, separators=(',', ':')) + "\n"
+        with self._buf_lock:
+            self._pending.append(line)
+
+    def flush(self):
+        """Escribir lo pendiente y hacer fsync (lo llama el hilo escritor)"""
+        with self._io_lock:
+            with self._buf_lock:
+                lines, self._pending = self._pending, []
+            if not lines:
+                return
+            f = self._open()
+            f.write("".join(lines).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self):
+        """Vaciar el diario (venta confirmada o cancelada)"""
+        with self._io_lock:
+            with self._buf_lock:
+                self._pending = []
+            f = self._open()
+            if f.tell():
+                f.truncate(0)
+                f.seek(0)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def rewrite(self, rows):
+        """Compactar el diario con las filas actuales (después de restaurar)"""
+        with self._io_lock:
+            with self._buf_lock:
+                self._pending = []
+            f = self._open()
+            f.truncate(0)
+            f.seek(0)
+            f.write("".join(json.dumps({'row': row, 'op': 'add'}, ensure_ascii=False,
+                                       separators=(',', ':')) + "\n" for row in rows).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        return self._file
+
+    def close(self):
+        self.flush()
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ========== RECUPERACIÓN ==========
+    def replay(self):
+        """Filas del carrito según el diario (lista de listas)"""
+        rows = []
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return rows
+
+        for n, raw in enumerate(data.split(b"\n")):
+            if not raw.strip():
+                continue
+            try:
+                entry = json.loads(raw)
+                op = entry['op']
+                if op == 'add':
+                    rows.append(entry['row'])
+                elif op == 'set':
+                    rows[entry['i']] = entry['row']
+                elif op == 'del':
+                    del rows[entry['i']]
+            except (ValueError, KeyError, IndexError) as e:
+                # Normalmente la última línea cortada por el cierre abrupto
+                log.warning("⚠️ Diario %s: línea %d ignorada (%s)", self.path, n + 1, e)
+        return rows
+
+
+def _run_writer():
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        flush_all()
+
+
+def _start_writer():
+    global _writer
+    with _registry_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run_writer, name="pos-cart-journal", daemon=True)
+            _writer.start()
+            atexit.register(flush_all)
+
+
+def flush_all():
+    with _registry_lock:
+        journals = list(_journals)
+    for journal in journals:
+        try:
+            journal.flush()
+        except OSError as e:
+            log.error("❌ Error escribiendo diario %s: %s", journal.path, e)
+
+
+def saved_lanes(directory=None):
+    """Nombres de archivo de los diarios con contenido (carritos por recuperar)"""
+    directory = directory or CART_DIR
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(n for n in names if n.endswith(".jsonl")
+                  and os.path.getsize(os.path.join(directory, n)) > 0)
@@ -0,0 +1,227 @@
+# catalog.py - ÍNDICE EN MEMORIA DE PRODUCTOS
+"""
+Índice código -> producto para búsquedas O(1) desde las pestañas de venta,
+y el motor de autocompletado que comparten todas las facturas abiertas.
+
+Se carga una sola vez (una consulta por tabla) y se invalida automáticamente
+cuando una sesión de SQLAlchemy de este proceso hace flush de cambios en el
+código, nombre o precio de un Product o BulkProduct, o ejecuta un INSERT,
+UPDATE o DELETE en lote sobre esas tablas. Si un código no está en
+el índice se consulta la base (columna única indexada) y se agrega, así que
+los productos creados por otros procesos también se encuentran.
+"""
+
+import bisect
+import threading
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from db import session
+from database_setup import Product, BulkProduct
+import queries
+from pos_logging import get_logger
+
+log = get_logger(__name__)
+
+# kind: 'product' (inventario normal) o 'bulk' (a granel, precio por kg)
+CatalogEntry = namedtuple('CatalogEntry', 'kind id code name price')
+
+_WATCHED_ATTRS = ('code', 'name', 'price')
+
+
+def _entry(kind, row):
+    return CatalogEntry(kind, row.id, row.code, row.name, row.price)
+
+
+class ProductCatalog:
+    """✅ CATÁLOGO COMPARTIDO: diccionario por código, en minúsculas"""
+
+    def __init__(self):
+        self._by_code = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.generation = 0  # Cambia con cada invalidación (para índices derivados)
+
+    def _load(self):
+        by_code = {}
+        for row in session.execute(select(BulkProduct.id, BulkProduct.code, BulkProduct.name, BulkProduct.price)):
+            by_code[row.code.lower()] = _entry('bulk', row)
+        # Los productos normales tienen prioridad si un código coincide en ambas tablas
+        for row in session.execute(select(Product.id, Product.code, Product.name, Product.price)):
+            by_code[row.code.lower()] = _entry('product', row)
+        self.loads += 1
+        log.debug("📚 Catálogo cargado: %d códigos", len(by_code))
+        return by_code
+
+    def _index(self):
+        index = self._by_code
+        if index is None:
+            with self._lock:
+                if self._by_code is None:
+                    self._by_code = self._load()
+                index = self._by_code
+        return index
+
+    def lookup(self, code):
+        """Producto con ese código exacto (sin distinguir mayúsculas) o None"""
+        if not code:
+            return None
+        key = code.lower()
+        index = self._index()
+        entry = index.get(key)
+        if entry is None:
+            entry = self._fetch(code)
+            if entry is not None:
+                index[key] = entry
+        return entry
+
+    def entries(self):
+        """Todas las entradas del índice (carga el catálogo si hace falta)"""
+        return list(self._index().values())
+
+    def _fetch(self, code):
+        """Respaldo para códigos que aún no están en el índice"""
+        row = session.execute(queries.PRODUCT_ROW_BY_CODE, {'code': code}).first()
+        if row:
+            return _entry('product', row)
+        row = session.execute(queries.BULK_ROW_BY_CODE, {'code': code}).first()
+        return _entry('bulk', row) if row else None
+
+    def invalidate(self):
+        """Descartar el índice; se recarga en la próxima búsqueda"""
+        self._by_code = None
+        self.generation += 1
+
+
+class CompletionEngine:
+    """✅ AUTOCOMPLETADO COMPARTIDO: sugerencias desde el catálogo, sin consultas SQL
+
+    Mantiene las mismas prioridades que tenía cada factura: código exacto,
+    códigos que empiezan con el texto y, si sobra espacio, nombres que lo contienen.
+    """
+
+    def __init__(self, source, cache_size=256):
+        self.source = source
+        self.cache_size = cache_size
+        self._generation = None
+        self._keys = {}    # kind -> códigos en minúsculas, ordenados
+        self._codes = {}   # kind -> entradas en el mismo orden que _keys
+        self._names = []   # productos normales: (nombre en minúsculas, entrada)
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _ensure(self):
+        if self._generation == self.source.generation:
+            return
+        entries = self.source.entries()
+        self._generation = self.source.generation
+        for kind in ('product', 'bulk'):
+            pairs = sorted(((e.code.lower(), e) for e in entries if e.kind == kind), key=lambda t: t[0])
+            self._keys[kind] = [k for k, _ in pairs]
+            self._codes[kind] = [e for _, e in pairs]
+        self._names = [(e.name.lower(), e) for e in self._codes['product']]
+        self._cache.clear()
+
+    @staticmethod
+    def _label(entry):
+        if entry.kind == 'bulk':
+            return f"{entry.code} - {entry.name} (A GRANEL)"
+        return f"{entry.code} - {entry.name}"
+
+    def _by_code(self, kind, key, limit):
+        """(exacto, códigos que empiezan con key) por búsqueda binaria"""
+        keys, codes = self._keys[kind], self._codes[kind]
+        i = bisect.bisect_left(keys, key)
+        exact = None
+        if i < len(keys) and keys[i] == key:
+            exact = codes[i]
+            i += 1
+        partial = []
+        while i < len(keys) and len(partial) < limit and keys[i].startswith(key):
+            partial.append(codes[i])
+            i += 1
+        return exact, partial
+
+    def suggest(self, text, limit=10):
+        """Lista de sugerencias "código - nombre" para el texto escrito"""
+        key = text.lower()
+        self._ensure()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        matches = {kind: self._by_code(kind, key, 3) for kind in ('product', 'bulk')}
+        suggestions = []
+        # 🔥 PRIORIDAD 1: Códigos exactos primero
+        for kind in ('product', 'bulk'):
+            if matches[kind][0] is not None:
+                suggestions.append(self._label(matches[kind][0]))
+        # 🔥 PRIORIDAD 2: Códigos parciales
+        for kind in ('product', 'bulk'):
+            suggestions.extend(self._label(e) for e in matches[kind][1])
+        # 🔥 PRIORIDAD 3: Nombres (solo si hay espacio)
+        if len(suggestions) < 8:
+            found = 0
+            for name, e in self._names:
+                if key in name:
+                    label = self._label(e)
+                    if label not in suggestions:
+                        suggestions.append(label)
+                    found += 1
+                    if found == 2:
+                        break
+
+        result = suggestions[:limit]
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+
+catalog = ProductCatalog()
+completions = CompletionEngine(catalog)
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_on_change(flush_session, flush_context):
+    """Invalidar sólo si cambió algo que el catálogo guarda (no por cambios de stock)"""
+    for obj in flush_session.new | flush_session.deleted:
+        if isinstance(obj, (Product, BulkProduct)):
+            catalog.invalidate()
+            return
+    for obj in flush_session.dirty:
+        if isinstance(obj, (Product, BulkProduct)):
+            attrs = inspect(obj).attrs
+            if any(attrs[name].history.has_changes() for name in _WATCHED_ATTRS):
+                catalog.invalidate()
+                return
+
+
+_CATALOG_TABLES = {Product.__tablename__, BulkProduct.__tablename__}
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _invalidate_on_bulk(orm_execute_state):
+    """Los INSERT/UPDATE/DELETE en lote (query(...).delete(), update(Product)) no pasan por el flush"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    statement = orm_execute_state.statement
+    table = getattr(statement, 'table', None)
+    if table is None or table.name not in _CATALOG_TABLES:
+        return
+    if orm_execute_state.is_update:
+        # Columnas que asigna el UPDATE (.values() o la lista de filas por id); si no se sabe, invalidar
+        values = getattr(statement, '_values', None) or {}
+        columns = {getattr(key, 'key', key) for key in values}
+        params = orm_execute_state.parameters
+        for row in params if isinstance(params, list) else [params or {}]:
+            columns.update(row)
+        if columns and not columns & set(_WATCHED_ATTRS):
+            return  # Sólo stock o proveedor: el catálogo no los guarda
+    catalog.invalidate()
@@ -0,0 +1,170 @@
+# change_feed.py - AVISOS DE CAMBIOS DE STOCK, ENTRADAS Y VENTAS
+"""
+Vigila la base SQLite y avisa a los suscriptores qué cambió, para que las
+pantallas se actualicen por partes en vez de recargar tablas completas.
+
+Funciona entre procesos (la caja de escritorio y el servidor web escriben en
+la misma pos.db): un hilo revisa PRAGMA data_version en su propia conexión
+cada POLL_INTERVAL segundos. El valor sólo cambia cuando OTRA conexión hace
+commit, así que revisar cuesta una consulta trivial y sólo se leen los
+cambios cuando los hay:
+
+- entradas y ventas nuevas por id (id > último visto)
+- stock: los productos de product_changes con seq mayor al último visto.
+  Triggers sobre products llenan esa tabla en cada cambio de stock (ver
+  database_setup.py y migrations.py), así que cada aviso lee sólo lo que
+  cambió y no todo el catálogo.
+
+Eventos (diccionarios, serializables a JSON):
+    {'type': 'stock', 'products': [{'id', 'code', 'name', 'stock'}, ...]}
+    {'type': 'entries', 'entries': [{'id', 'date', 'code', 'name', 'quantity', 'provider'}, ...]}
+    {'type': 'sales', 'sales': [{'id', 'date', 'items', 'total'}, ...]}
+
+Los suscriptores se llaman desde el hilo vigilante: deben pasar el evento a
+su propio hilo (call_soon_threadsafe, señales de Qt).
+"""
+
+import os
+import sqlite3
+import threading
+from collections import deque
+
+from pos_logging import get_logger
+
+log = get_logger(__name__)
+
+POLL_INTERVAL = float(os.environ.get('POS_FEED_INTERVAL', 0.5))  # segundos
+HISTORY_SIZE = 200  # eventos recientes para clientes que se reconectan
+
+
+class ChangeFeed:
+    """✅ VIGILANTE DE LA BASE: un hilo, una conexión de sólo lectura"""
+
+    def __init__(self, path='pos.db', interval=POLL_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+        self._version = None
+        self._last_change = 0
+        self._last_entry = 0
+        self._last_sale = 0
+        self.last_id = 0
+        self.history = deque(maxlen=HISTORY_SIZE)   # (id, evento)
+        self.polls = 0
+
+    # ========== SUSCRIPCIONES ==========
+    def subscribe(self, callback):
+        """callback(event_id, evento) para cada cambio; devuelve la función para desuscribirse"""
+        with self._lock:
+            self._subscribers.append(callback)
+        return lambda: self.unsubscribe(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def since(self, event_id):
+        """Eventos posteriores a event_id que siguen en el historial"""
+        with self._lock:
+            return [(i, e) for i, e in self.history if i > event_id]
+
+    def publish(self, event):
+        with self._lock:
+            self.last_id += 1
+            event_id = self.last_id
+            self.history.append((event_id, event))
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event_id, event)
+            except Exception as e:
+                log.error("❌ Error en suscriptor de cambios: %s", e)
+
+    # ========== VIGILANCIA ==========
+    def start(self):
+        if self._thread is None:
+            self._open()
+            self._thread = threading.Thread(target=self._run, name="pos-change-feed", daemon=True)
+            self._thread.start()
+            log.debug("📡 Vigilando cambios en %s cada %.1f s", self.path, self.interval)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 4)
+            self._thread = None
+
+    def _open(self):
+        uri = f"file:{os.path.abspath(self.path)}?mode=ro"
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=5)
+        self._version = self._data_version()
+        # Punto de partida: lo que ya existe no se anuncia
+        self._last_change = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM product_changes").fetchone()[0]
+        self._last_entry = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM entries").fetchone()[0]
+        self._last_sale = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM sales").fetchone()[0]
+
+    def _data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except sqlite3.Error as e:
+                log.warning("⚠️ No se pudieron leer los cambios: %s", e)
+
+    def poll(self):
+        """Revisar una vez; publica los eventos que haya (también se puede llamar a mano)"""
+        self.polls += 1
+        version = self._data_version()
+        if version == self._version:
+            return
+        self._version = version
+        conn = self._conn
+
+        # Una sola transacción de lectura: entradas, ventas y stock de la misma foto de la base
+        conn.execute("BEGIN")
+        try:
+            entries, sales, stock = self._read_changes(conn)
+        finally:
+            conn.execute("COMMIT")
+
+        if stock:
+            self._last_change = stock[-1][0]
+            self.publish({'type': 'stock', 'products': [
+                {'id': pid, 'code': code, 'name': name, 'stock': qty} for _, pid, code, name, qty in stock]})
+        if entries:
+            self._last_entry = entries[-1][0]
+            self.publish({'type': 'entries', 'entries': [
+                {'id': eid, 'date': str(day), 'code': code, 'name': name, 'quantity': qty, 'provider': provider}
+                for eid, day, code, name, qty, provider in entries]})
+        if sales:
+            self._last_sale = sales[-1][0]
+            self.publish({'type': 'sales', 'sales': [
+                {'id': sid, 'date': str(day), 'items': n, 'total': round(total, 2)}
+                for sid, day, n, total in sales]})
+
+    def _read_changes(self, conn):
+        entries = conn.execute(
+            "SELECT e.id, e.date, p.code, p.name, e.quantity, v.name FROM entries e "
+            "JOIN products p ON p.id = e.product_id LEFT JOIN providers v ON v.id = e.provider_id "
+            "WHERE e.id > ? ORDER BY e.id", (self._last_entry,)
+        ).fetchall()
+        sales = conn.execute(
+            "SELECT s.id, s.date, COUNT(i.id), COALESCE(SUM(i.quantity * i.price), 0) FROM sales s "
+            "LEFT JOIN sale_items i ON i.sale_id = s.id WHERE s.id > ? GROUP BY s.id ORDER BY s.id",
+            (self._last_sale,)
+        ).fetchall()
+        # seq indexado: sólo las filas nuevas, sin importar el tamaño del catálogo
+        stock = conn.execute(
+            "SELECT c.seq, p.id, p.code, p.name, p.stock FROM product_changes c "
+            "JOIN products p ON p.id = c.product_id WHERE c.seq > ? ORDER BY c.seq",
+            (self._last_change,)
+        ).fetchall()
+        return entries, sales, stock
@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, create_engine
+    Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, Index, DDL, create_engine, event
 )
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 
@@ -35,19 +35,35 @@ class BulkProduct(Base):
 class Sale(Base):
     __tablename__ = 'sales'
     id = Column(Integer, primary_key=True)
-    date = Column(Date, nullable=False)
+    date = Column(Date, nullable=False, index=True)  # Reportes por rango (date_ranges.py)
     items = relationship("SaleItem", back_populates="sale")
 
 class SaleItem(Base):
     __tablename__ = 'sale_items'
     id = Column(Integer, primary_key=True)
-    sale_id = Column(Integer, ForeignKey('sales.id'))
+    sale_id = Column(Integer, ForeignKey('sales.id'), index=True)
     product_id = Column(Integer, ForeignKey('products.id'))
     quantity = Column(Float, nullable=False)
     price = Column(Float, nullable=False)
     sale = relationship("Sale", back_populates="items")
     product = relationship("Product")
 
+# 🆕 TOTALES DIARIOS DE LAS VENTAS ARCHIVADAS (archive.py): quedan en la base
+# principal para que los reportes de esos días no tengan que abrir el archivo
+class SaleDay(Base):
+    __tablename__ = 'sale_days'
+    date = Column(Date, primary_key=True)
+    sales = Column(Integer, nullable=False, default=0)
+    items = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0)
+
+# 🆕 PRODUCTOS CON STOCK NUEVO (change_feed.py): una fila por producto con el número
+# de su último cambio. La llenan triggers, así que incluye lo que escribe cualquier proceso
+class ProductChange(Base):
+    __tablename__ = 'product_changes'
+    product_id = Column(Integer, primary_key=True)
+    seq = Column(Integer, nullable=False, index=True)
+
 class Entry(Base):
     __tablename__ = 'entries'
     id = Column(Integer, primary_key=True)
@@ -60,6 +76,8 @@ class Entry(Base):
 
 class Payment(Base):
     __tablename__ = 'payments'
+    # Sumas por tipo y rango de fechas sin leer la tabla (índice que cubre la consulta)
+    __table_args__ = (Index('ix_payments_kind_date', 'is_provider', 'date', 'amount'),)
     id = Column(Integer, primary_key=True)
     date = Column(DateTime, nullable=False)
     amount = Column(Float, nullable=False)
@@ -71,7 +89,7 @@ class Shift(Base):
     id = Column(Integer, primary_key=True)
     user = Column(String, nullable=False)
     start = Column(DateTime, nullable=False)
-    end = Column(DateTime)
+    end = Column(DateTime, index=True)
 
 class Balance(Base):
     __tablename__ = 'balances'
@@ -85,28 +103,133 @@ class Balance(Base):
 
 DailyBalance = Balance
 
+# 🆕 TOTALES POR MES Y POR AÑO: los mantienen triggers sobre balances, así que
+# siempre coinciden con los registros diarios (también si escribe otro proceso)
+class BalanceMonth(Base):
+    __tablename__ = 'balance_months'
+    month = Column(String, primary_key=True)   # 'YYYY-MM'
+    year = Column(Integer, nullable=False, index=True)
+    days = Column(Integer, nullable=False, default=0)
+    total_sales = Column(Float, default=0)
+    total_entries = Column(Float, default=0)
+    total_payments = Column(Float, default=0)
+    balance = Column(Float, default=0)
+
+class BalanceYear(Base):
+    __tablename__ = 'balance_years'
+    year = Column(Integer, primary_key=True)
+    days = Column(Integer, nullable=False, default=0)
+    total_sales = Column(Float, default=0)
+    total_entries = Column(Float, default=0)
+    total_payments = Column(Float, default=0)
+    balance = Column(Float, default=0)
+
+_ROLLUP_TOTALS = ('total_sales', 'total_entries', 'total_payments', 'balance')
+_ROLLUP_LEVELS = (
+    ('balance_months', 'month', "substr({row}.date, 1, 7)", ", year", ", CAST(substr({row}.date, 1, 4) AS INTEGER)"),
+    ('balance_years', 'year', "CAST(substr({row}.date, 1, 4) AS INTEGER)", "", ""),
+)
+
+def _rollup_add(row):
+    """Sumar la fila diaria (NEW) a su mes y su año"""
+    stmts = []
+    for table, key, expr, extra_col, extra_val in _ROLLUP_LEVELS:
+        cols = ", ".join(_ROLLUP_TOTALS)
+        vals = ", ".join(f"COALESCE({row}.{c}, 0)" for c in _ROLLUP_TOTALS)
+        sets = ", ".join(f"{c} = {c} + excluded.{c}" for c in _ROLLUP_TOTALS)
+        stmts.append(
+            f"INSERT INTO {table} ({key}{extra_col}, days, {cols}) "
+            f"VALUES ({expr.format(row=row)}{extra_val.format(row=row)}, 1, {vals}) "
+            f"ON CONFLICT({key}) DO UPDATE SET days = days + 1, {sets};"
+        )
+    return "\n".join(stmts)
+
+def _rollup_remove(row):
+    """Restar la fila diaria (OLD) de su mes y su año; los periodos vacíos se borran"""
+    stmts = []
+    for table, key, expr, _, _ in _ROLLUP_LEVELS:
+        sets = ", ".join(f"{c} = {c} - COALESCE({row}.{c}, 0)" for c in _ROLLUP_TOTALS)
+        stmts.append(f"UPDATE {table} SET days = days - 1, {sets} WHERE {key} = {expr.format(row=row)};")
+        stmts.append(f"DELETE FROM {table} WHERE {key} = {expr.format(row=row)} AND days <= 0;")
+    return "\n".join(stmts)
+
+def rebuild_rollups_sql():
+    """Recalcular los totales desde cero a partir de balances"""
+    sums = ", ".join(f"COALESCE(SUM({c}), 0)" for c in _ROLLUP_TOTALS)
+    cols = ", ".join(_ROLLUP_TOTALS)
+    return [
+        "DELETE FROM balance_months",
+        "DELETE FROM balance_years",
+        f"INSERT INTO balance_months (month, year, days, {cols}) "
+        f"SELECT substr(date, 1, 7), CAST(substr(date, 1, 4) AS INTEGER), COUNT(*), {sums} "
+        f"FROM balances GROUP BY substr(date, 1, 7)",
+        f"INSERT INTO balance_years (year, days, {cols}) "
+        f"SELECT CAST(substr(date, 1, 4) AS INTEGER), COUNT(*), {sums} "
+        f"FROM balances GROUP BY substr(date, 1, 4)",
+    ]
+
+_ROLLUP_DDL = [
+    f"CREATE TRIGGER IF NOT EXISTS balances_rollup_ins AFTER INSERT ON balances BEGIN\n{_rollup_add('NEW')}\nEND",
+    f"CREATE TRIGGER IF NOT EXISTS balances_rollup_del AFTER DELETE ON balances BEGIN\n{_rollup_remove('OLD')}\nEND",
+    f"CREATE TRIGGER IF NOT EXISTS balances_rollup_upd AFTER UPDATE ON balances BEGIN\n"
+    f"{_rollup_remove('OLD')}\n{_rollup_add('NEW')}\nEND",
+]
+
+# Al crear la tabla de años (después de balances y balance_months): triggers y carga inicial
+for _stmt in _ROLLUP_DDL + rebuild_rollups_sql():
+    event.listen(BalanceYear.__table__, 'after_create', DDL(_stmt))
+
+_NEXT_CHANGE = ("INSERT OR REPLACE INTO product_changes (product_id, seq) "
+                "VALUES (NEW.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM product_changes));")
+_PRODUCT_CHANGES_DDL = [
+    f"CREATE TRIGGER IF NOT EXISTS products_stock_ins AFTER INSERT ON products BEGIN\n{_NEXT_CHANGE}\nEND",
+    f"CREATE TRIGGER IF NOT EXISTS products_stock_upd AFTER UPDATE OF stock ON products "
+    f"WHEN OLD.stock IS NOT NEW.stock BEGIN\n{_NEXT_CHANGE}\nEND",
+    "CREATE TRIGGER IF NOT EXISTS products_stock_del AFTER DELETE ON products BEGIN\n"
+    "DELETE FROM product_changes WHERE product_id = OLD.id;\nEND",
+]
+
+# Los triggers son ON products: se crean con esa tabla (product_changes sólo se lee al dispararse)
+for _stmt in _PRODUCT_CHANGES_DDL:
+    event.listen(Product.__table__, 'after_create', DDL(_stmt))
+
+def ensure_indexes(engine):
+    """Crear los índices que falten en tablas ya existentes (create_all sólo los crea con la tabla)"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+def ensure_rollups(conn):
+    """Crear los triggers de totales que falten; si faltaba alguno, recalcular los totales"""
+    existing = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    if {'balances_rollup_ins', 'balances_rollup_del', 'balances_rollup_upd'} <= existing:
+        return
+    for stmt in _ROLLUP_DDL + rebuild_rollups_sql():
+        conn.exec_driver_sql(stmt)
+
+def ensure_product_changes(conn):
+    """Tabla y triggers de product_changes en bases que ya existían"""
+    ProductChange.__table__.create(conn, checkfirst=True)
+    for stmt in _PRODUCT_CHANGES_DDL:
+        conn.exec_driver_sql(stmt)
+
 def init_db(path='pos.db'):
-    """Inicializa la base de datos con la nueva estructura"""
+    """Inicializa la base de datos con la nueva estructura (migraciones en migrations.py)"""
+    import migrations  # migrations importa este módulo
+    migrations.migrate(path)
     engine = create_engine(f'sqlite:///{path}')
-    Base.metadata.create_all(engine, checkfirst=True)
     Session = sessionmaker(bind=engine)
     global session
     session = Session()
-    
-    # 🆕 MIGRACIÓN: Agregar columna provider_id si no existe
-    try:
-        # Intentar agregar la columna si no existe
-        engine.execute('ALTER TABLE products ADD COLUMN provider_id INTEGER')
-        print("✅ Columna provider_id agregada exitosamente")
-    except:
-        # La columna ya existe, no hacer nada
-        pass
 
 def reset_db(path='pos.db'):
     """Reinicia la base de datos completamente"""
+    import migrations
     engine = create_engine(f'sqlite:///{path}')
     Base.metadata.drop_all(engine)
-    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA user_version = 0")
+    migrations.migrate(path)
     Session = sessionmaker(bind=engine)
     global session
     session = Session()
@@ -0,0 +1,75 @@
+# date_ranges.py - VENTANAS DE FECHA PARA REPORTES
+"""
+Convierte día, semana, mes, año o turno en un rango semiabierto
+[inicio, fin) y lo aplica a una columna como `col >= inicio AND col < fin`.
+
+Comparar la columna directamente (en vez de func.date(col) == d) permite que
+SQLite use los índices de fecha (ver database_setup.py): el costo depende del
+tamaño de la ventana y no de todo el historial.
+
+    from date_ranges import day, month, within
+    session.query(...).filter(within(Sale.date, day(d)))
+"""
+
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import DateTime, and_
+
+# end=None: sin límite superior (turno todavía abierto)
+Window = namedtuple('Window', 'start end')
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def day(d):
+    d = _as_date(d)
+    return Window(d, d + timedelta(days=1))
+
+
+def week(d):
+    """Semana de lunes a domingo que contiene d"""
+    d = _as_date(d)
+    monday = d - timedelta(days=d.weekday())
+    return Window(monday, monday + timedelta(days=7))
+
+
+def month(d):
+    d = _as_date(d)
+    first = d.replace(day=1)
+    following = date(first.year + (first.month == 12), first.month % 12 + 1, 1)
+    return Window(first, following)
+
+
+def year(d):
+    d = _as_date(d)
+    return Window(date(d.year, 1, 1), date(d.year + 1, 1, 1))
+
+
+def shift(start, end=None):
+    """Turno de caja: desde start hasta end (None = sigue abierto)"""
+    return Window(start, end)
+
+
+def _bound_for(column, value, upper):
+    """Adaptar el límite al tipo de la columna (Date o DateTime)"""
+    if isinstance(column.type, DateTime):
+        if not isinstance(value, datetime):
+            value = datetime.combine(value, time.min)
+        return value
+    if isinstance(value, datetime):
+        # Columna Date con límite a media jornada: incluir el día completo del límite superior
+        if upper and value.time() != time.min:
+            return value.date() + timedelta(days=1)
+        return value.date()
+    return value
+
+
+def within(column, window):
+    """✅ Condición sargable column ∈ [start, end)"""
+    start = _bound_for(column, window.start, upper=False)
+    if window.end is None:
+        return column >= start
+    return and_(column >= start, column < _bound_for(column, window.end, upper=True))
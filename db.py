@@ -1,13 +1,45 @@
 # db.py
 
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+import archive
+import query_cache
 from database_setup import Base, Product  # ajusta el nombre si tu modelo está en otro módulo
 
 # Conecta con pos.db (SQLite)
 engine = create_engine('sqlite:///pos.db', echo=False)
 Base.metadata.bind = engine
 
+READ_POOL_SIZE = int(os.environ.get('POS_READ_POOL', 2))
+
+# Lecturas pesadas (historiales, exportaciones) con su propio pool, ver reports.py
+read_engine = create_engine('sqlite:///pos.db', echo=False, pool_size=READ_POOL_SIZE, max_overflow=0,
+                            connect_args={'check_same_thread': False, 'timeout': 15})
+
+@event.listens_for(engine, 'connect')
+def _wal(dbapi_conn, record):
+    # Con WAL los lectores no bloquean el commit de una venta (queda guardado en el archivo)
+    dbapi_conn.execute("PRAGMA journal_mode=WAL")
+
+@event.listens_for(read_engine, 'connect')
+def _read_only(dbapi_conn, record):
+    dbapi_conn.execute("PRAGMA query_only=ON")
+
+# Ventas de meses cerrados en pos_archive.db, adjunto en sólo lectura (ver archive.py)
+archive.attach(engine)
+archive.attach(read_engine)
+
+# Instrumentación de consultas opcional (POS_SQL_STATS=1), ver query_stats.py
+if os.environ.get('POS_SQL_STATS'):
+    import query_stats
+    query_stats.install(engine)
+    query_stats.install(read_engine)
+
 # Crea sesión
 Session = sessionmaker(bind=engine)
 session = Session()
+ReadSession = sessionmaker(bind=read_engine)
+
+# Caché de resultados invalidado por tabla (ver query_cache.py)
+query_cache.install(session)
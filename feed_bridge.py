@@ -0,0 +1,40 @@
+# feed_bridge.py - AVISOS DE change_feed COMO SEÑALES DE QT
+"""
+Las pestañas de escritorio se conectan a estas señales para actualizar sólo
+las filas que cambiaron (stock, entradas nuevas, ventas) sin recargar tablas,
+también cuando el cambio viene del servidor web o de otra caja.
+"""
+
+from PySide6.QtCore import QObject, Signal
+
+from change_feed import ChangeFeed
+
+
+class ChangeFeedBridge(QObject):
+    """✅ PUENTE A QT: los eventos llegan en el hilo de la interfaz"""
+
+    stockChanged = Signal(list)    # [{'id', 'code', 'name', 'stock'}]
+    entriesAdded = Signal(list)    # [{'id', 'date', 'code', 'name', 'quantity', 'provider'}]
+    salesAdded = Signal(list)      # [{'id', 'date', 'items', 'total'}]
+
+    def __init__(self, path='pos.db', parent=None):
+        super().__init__(parent)
+        self.feed = ChangeFeed(path)
+        self.feed.subscribe(self._on_event)
+
+    def start(self):
+        self.feed.start()
+        return self
+
+    def stop(self):
+        self.feed.stop()
+
+    def _on_event(self, event_id, event):
+        # Se llama desde el hilo vigilante: Qt encola la señal hacia el hilo de cada receptor
+        kind = event['type']
+        if kind == 'stock':
+            self.stockChanged.emit(event['products'])
+        elif kind == 'entries':
+            self.entriesAdded.emit(event['entries'])
+        elif kind == 'sales':
+            self.salesAdded.emit(event['sales'])
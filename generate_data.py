@@ -0,0 +1,360 @@
+# generate_data.py - GENERADOR DE DATOS SINTÉTICOS
+"""
+Genera una base de datos pos.db sintética con volumen realista para pruebas
+de carga y de escala.
+
+Produce proveedores, productos (con distribución por proveedor), productos a
+granel, años de historial de ventas (Sale/SaleItem) con tamaños de canasta y
+estacionalidad por hora, entradas, pagos a proveedores y generales, turnos y
+balances diarios. Todo respeta los modelos de database_setup.py.
+
+La inserción se hace con sqlite3 + executemany por lotes dentro de una sola
+transacción, por lo que se alcanzan cientos de miles de filas por segundo.
+Con la misma semilla (y la misma --end-date) el resultado es idéntico.
+
+Uso:
+    python generate_data.py --db pos_load.db --scale medium --seed 42
+"""
+
+import argparse
+import math
+import os
+import random
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+import migrations
+from scanner import ean13_check_digit
+
+# Formatos que usa SQLAlchemy para Date y DateTime en SQLite
+DATE_FMT = "%Y-%m-%d"
+DATETIME_FMT = "%Y-%m-%d %H:%M:%S.%f"
+
+BATCH_SIZE = 50_000
+
+# Último día del historial por defecto: fijo para que la misma semilla dé la misma base cualquier día
+END_DATE = date(2024, 12, 31)
+
+# Presets de volumen: productos, proveedores, granel, años, ventas diarias promedio
+SCALES = {
+    'small':  dict(products=2_000,  providers=20,  bulk=20,  years=1, sales_per_day=120),
+    'medium': dict(products=15_000, providers=60,  bulk=40,  years=3, sales_per_day=350),
+    'large':  dict(products=60_000, providers=150, bulk=80,  years=5, sales_per_day=900),
+}
+
+# Peso relativo de ventas por hora (7:00 a 21:00), picos a mediodía y a la salida del trabajo
+HOURLY_WEIGHTS = {
+    7: 3, 8: 5, 9: 6, 10: 7, 11: 9, 12: 12, 13: 10, 14: 7,
+    15: 6, 16: 7, 17: 10, 18: 12, 19: 9, 20: 5, 21: 2,
+}
+
+# Factor por día de la semana (lunes=0)
+WEEKDAY_FACTORS = [0.85, 0.9, 0.9, 0.95, 1.15, 1.35, 1.0]
+
+PROVIDER_PREFIXES = ["Distribuidora", "Importaciones", "Comercial", "Mayorista", "Productos", "Almacén"]
+PROVIDER_NAMES = ["del Valle", "Central", "La Sabana", "Tico", "San José", "El Roble",
+                  "Las Palmas", "Nacional", "Occidente", "La Montaña", "Pacífico", "Caribe"]
+PRODUCT_WORDS = ["Arroz", "Frijoles", "Aceite", "Azúcar", "Café", "Leche", "Galletas", "Jabón",
+                 "Detergente", "Atún", "Pasta", "Salsa", "Refresco", "Jugo", "Cereal", "Harina",
+                 "Sal", "Papel", "Cloro", "Mantequilla", "Queso", "Natilla", "Yogurt", "Pan"]
+PRODUCT_VARIANTS = ["Premium", "Light", "Familiar", "Clásico", "Integral", "Original", "Extra", "Mini"]
+PRODUCT_SIZES = ["250g", "500g", "1kg", "2kg", "355ml", "600ml", "1L", "2L", "3 unid", "6 unid"]
+BULK_WORDS = ["Tomate", "Papa", "Cebolla", "Chile dulce", "Zanahoria", "Banano", "Manzana",
+              "Naranja", "Queso tierno", "Jamón", "Frijol a granel", "Arroz a granel"]
+GENERIC_CATEGORIES = [("Electricidad", 45_000), ("Agua", 12_000), ("Internet", 25_000),
+                      ("Alquiler", 350_000), ("Limpieza", 8_000), ("Transporte", 15_000),
+                      ("Mantenimiento", 30_000)]
+
+
+def round_price(value):
+    """Redondea al múltiplo de 5 más cercano (como en caja)"""
+    return max(5, int(round(value / 5.0)) * 5)
+
+
+def weighted_choice_table(weights):
+    """Tabla acumulada para usar con bisect vía random.choices(cum_weights=...)"""
+    acc, cum = 0.0, []
+    for w in weights:
+        acc += w
+        cum.append(acc)
+    return cum
+
+
+class DataGenerator:
+    """✅ GENERADOR DETERMINISTA: misma semilla, mismos datos"""
+
+    def __init__(self, path, seed=42, products=15_000, providers=60, bulk=40,
+                 years=3, sales_per_day=350, end_date=None):
+        self.path = path
+        self.rng = random.Random(seed)
+        self.n_products = products
+        self.n_providers = providers
+        self.n_bulk = bulk
+        self.years = years
+        self.sales_per_day = sales_per_day
+        self.end_date = end_date or END_DATE
+        self.start_date = self.end_date - timedelta(days=365 * years)
+        self.counts = {}
+
+    # ========== UTILIDADES DE INSERCIÓN ==========
+    def _insert(self, conn, table, columns, rows):
+        """Inserta un iterable de tuplas en lotes con executemany"""
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        batch = []
+        total = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                conn.executemany(sql, batch)
+                total += len(batch)
+                batch.clear()
+        if batch:
+            conn.executemany(sql, batch)
+            total += len(batch)
+        self.counts[table] = self.counts.get(table, 0) + total
+        return total
+
+    # ========== CATÁLOGO ==========
+    def _providers(self):
+        rng = self.rng
+        self.provider_names = []
+        seen = set()
+        for i in range(1, self.n_providers + 1):
+            name = f"{rng.choice(PROVIDER_PREFIXES)} {rng.choice(PROVIDER_NAMES)}"
+            if name in seen:
+                name = f"{name} {i}"
+            seen.add(name)
+            self.provider_names.append(name)
+            contact = f"{rng.randint(2000, 8999)}-{rng.randint(1000, 9999)}"
+            yield (i, name, contact)
+
+    def _products(self):
+        """Productos con distribución Zipf por proveedor (pocos proveedores surten mucho)"""
+        rng = self.rng
+        provider_cum = weighted_choice_table([1.0 / (r ** 1.1) for r in range(1, self.n_providers + 1)])
+        provider_ids = list(range(1, self.n_providers + 1))
+        self.product_prices = [0.0] * (self.n_products + 1)
+        self.product_provider = [None] * (self.n_products + 1)
+        self.provider_products = {pid: [] for pid in provider_ids}
+        used_codes = set()
+
+        for i in range(1, self.n_products + 1):
+            while True:
+                base = "74" + "".join(str(rng.randint(0, 9)) for _ in range(10))
+                code = base + ean13_check_digit(base)
+                if code not in used_codes:
+                    used_codes.add(code)
+                    break
+            name = f"{rng.choice(PRODUCT_WORDS)} {rng.choice(PRODUCT_VARIANTS)} {rng.choice(PRODUCT_SIZES)}"
+            price = round_price(math.exp(rng.gauss(7.0, 0.8)))  # mediana ~₡1,100
+            stock = rng.randint(0, 120)
+            # ~8% de productos sin proveedor asignado (como en datos reales migrados)
+            provider_id = None if rng.random() < 0.08 else rng.choices(provider_ids, cum_weights=provider_cum)[0]
+            self.product_prices[i] = float(price)
+            self.product_provider[i] = provider_id
+            if provider_id:
+                self.provider_products[provider_id].append(i)
+            yield (i, code, name, float(price), stock, provider_id)
+
+    def _bulk_products(self):
+        rng = self.rng
+        for i in range(1, self.n_bulk + 1):
+            # Códigos PLU numéricos de 5 dígitos, como los de las balanzas
+            code = f"{i:05d}"
+            word = BULK_WORDS[(i - 1) % len(BULK_WORDS)]
+            name = word if i <= len(BULK_WORDS) else f"{word} {i}"
+            price = round_price(rng.uniform(600, 6500))
+            yield (i, code, name, float(price))
+
+    # ========== HISTORIAL ==========
+    def _days(self):
+        d = self.start_date
+        while d <= self.end_date:
+            yield d
+            d += timedelta(days=1)
+
+    def _generate_history(self, conn):
+        """Genera ventas, entradas, pagos, turnos y balances día por día"""
+        rng = self.rng
+        hours = list(HOURLY_WEIGHTS)
+        hour_cum = weighted_choice_table(HOURLY_WEIGHTS.values())
+        # Popularidad Zipf de productos para las canastas
+        product_cum = weighted_choice_table([1.0 / (r ** 0.9) for r in range(1, self.n_products + 1)])
+        product_ids = list(range(1, self.n_products + 1))
+        prices = self.product_prices
+
+        sales, items, entries, payments, shifts, balances = [], [], [], [], [], []
+        sale_id = item_id = entry_id = payment_id = shift_id = balance_id = 0
+
+        def flush(force=False):
+            for table, cols, rows in (
+                ('sales', ('id', 'date'), sales),
+                ('sale_items', ('id', 'sale_id', 'product_id', 'quantity', 'price'), items),
+                ('entries', ('id', 'provider_id', 'date', 'product_id', 'quantity'), entries),
+                ('payments', ('id', 'date', 'amount', 'category', 'is_provider'), payments),
+                ('shifts', ('id', 'user', 'start', 'end'), shifts),
+                ('balances', ('id', 'date', 'total_sales', 'total_entries', 'total_payments',
+                              'total_providers', 'balance'), balances),
+            ):
+                if rows and (force or len(rows) >= BATCH_SIZE):
+                    self._insert(conn, table, cols, rows)
+                    rows.clear()
+
+        for d in self._days():
+            day_str = d.strftime(DATE_FMT)
+            factor = WEEKDAY_FACTORS[d.weekday()] * rng.uniform(0.8, 1.2)
+            n_sales = max(1, int(self.sales_per_day * factor))
+
+            # Horas de las ventas ordenadas: los ids crecen a lo largo del día
+            sale_hours = sorted(rng.choices(hours, cum_weights=hour_cum, k=n_sales))
+            day_sales = 0.0
+            shift_sales = [0.0, 0.0]
+
+            for hour in sale_hours:
+                sale_id += 1
+                sales.append((sale_id, day_str))
+                sale_total = 0.0
+                # Canasta log-normal: mediana ~3 artículos, cola larga hasta 40
+                basket = min(40, max(1, int(round(math.exp(rng.gauss(1.1, 0.7))))))
+                for pid in rng.choices(product_ids, cum_weights=product_cum, k=basket):
+                    item_id += 1
+                    qty = 1.0 if rng.random() < 0.8 else float(rng.randint(2, 6))
+                    price = prices[pid]
+                    items.append((item_id, sale_id, pid, qty, price))
+                    sale_total += qty * price
+                # ~12% de las canastas llevan un producto a granel o un monto directo
+                if rng.random() < 0.12:
+                    item_id += 1
+                    qty = round(rng.uniform(0.2, 2.5), 3)
+                    price = float(round_price(rng.uniform(600, 6500)))
+                    items.append((item_id, sale_id, None, qty, price))
+                    sale_total += qty * price
+                day_sales += sale_total
+                shift_sales[0 if hour < 14 else 1] += sale_total
+
+            # Entradas: algunas entregas de proveedores al día, con su pago
+            day_providers = 0.0
+            for _ in range(rng.randint(0, 3)):
+                prov_id = rng.randint(1, self.n_providers)
+                catalog = self.provider_products.get(prov_id) or []
+                if not catalog:
+                    continue
+                delivered = rng.sample(catalog, min(len(catalog), rng.randint(5, 30)))
+                cost = 0.0
+                for pid in delivered:
+                    entry_id += 1
+                    qty = rng.choice((6, 12, 12, 24, 24, 48))
+                    entries.append((entry_id, prov_id, day_str, pid, qty))
+                    cost += qty * prices[pid] * 0.7
+                payment_id += 1
+                ts = datetime(d.year, d.month, d.day, rng.randint(8, 16), rng.randint(0, 59), rng.randint(0, 59))
+                amount = float(round_price(cost))
+                payments.append((payment_id, ts.strftime(DATETIME_FMT), amount,
+                                 self.provider_names[prov_id - 1], 1))
+                day_providers += amount
+
+            # Pagos generales: servicios y gastos operativos
+            day_generic = 0.0
+            for category, typical in GENERIC_CATEGORIES:
+                monthly = category == "Alquiler"
+                if (monthly and d.day != 1) or (not monthly and rng.random() > 0.06):
+                    continue
+                payment_id += 1
+                ts = datetime(d.year, d.month, d.day, rng.randint(9, 18), rng.randint(0, 59), rng.randint(0, 59))
+                amount = float(round_price(typical * rng.uniform(0.7, 1.3)))
+                payments.append((payment_id, ts.strftime(DATETIME_FMT), amount, category, 0))
+                day_generic += amount
+
+            # Turnos: mañana y tarde, con el formato caja,plata,sinpes,dataf,ventas,total de CajaTab
+            for n, (start_h, end_h) in enumerate(((7, 14), (14, 21))):
+                shift_id += 1
+                ventas = shift_sales[n]
+                caja = float(round_price(ventas * rng.uniform(0.45, 0.6)))
+                plata = 50_000.0
+                sinpes = float(round_price(ventas * rng.uniform(0.15, 0.25)))
+                dataf = float(round_price(ventas * rng.uniform(0.2, 0.3)))
+                total = caja + plata - sinpes - dataf + ventas
+                start = datetime(d.year, d.month, d.day, start_h, 0, 0)
+                end = datetime(d.year, d.month, d.day, end_h, rng.randint(0, 45), 0)
+                shifts.append((shift_id, f"{caja},{plata},{sinpes},{dataf},{ventas},{total}",
+                               start.strftime(DATETIME_FMT), end.strftime(DATETIME_FMT)))
+
+            # Balance diario como lo guarda BalanceTab
+            balance_id += 1
+            balances.append((balance_id, day_str, float(int(day_sales)), float(int(day_providers)),
+                             float(int(day_generic)), 0.0, float(int(day_sales - day_providers - day_generic))))
+
+            flush()
+        flush(force=True)
+
+    # ========== PUNTO DE ENTRADA ==========
+    def run(self):
+        """Crea el esquema con las migraciones (como el programa) y carga los datos con sqlite3"""
+        migrations.migrate(self.path)
+
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=MEMORY")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA cache_size=-200000")
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN")
+            self._insert(conn, 'providers', ('id', 'name', 'contact'), self._providers())
+            self._insert(conn, 'products', ('id', 'code', 'name', 'price', 'stock', 'provider_id'),
+                         self._products())
+            self._insert(conn, 'bulk_products', ('id', 'code', 'name', 'price'), self._bulk_products())
+            self._generate_history(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        self.elapsed = time.perf_counter() - started
+        return self.counts
+
+
+def generate(path, seed=42, scale='medium', force=False, **overrides):
+    """✅ API para herramientas de benchmark y carga: genera y devuelve conteos por tabla"""
+    if os.path.exists(path):
+        if not force:
+            raise FileExistsError(f"{path} ya existe (use force=True para reemplazarlo)")
+        os.remove(path)
+    params = dict(SCALES[scale])
+    params.update({k: v for k, v in overrides.items() if v is not None})
+    gen = DataGenerator(path, seed=seed, **params)
+    counts = gen.run()
+    return counts, gen.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera una base de datos POS sintética")
+    parser.add_argument('--db', default='pos_load.db', help="Archivo de salida (no use su pos.db real)")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='medium')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--products', type=int)
+    parser.add_argument('--providers', type=int)
+    parser.add_argument('--bulk', type=int)
+    parser.add_argument('--years', type=int)
+    parser.add_argument('--sales-per-day', type=int, dest='sales_per_day')
+    parser.add_argument('--end-date', type=date.fromisoformat, dest='end_date',
+                        help=f"Último día del historial (YYYY-MM-DD), por defecto {END_DATE}")
+    parser.add_argument('--force', action='store_true', help="Reemplazar el archivo si existe")
+    args = parser.parse_args()
+
+    print(f"🔄 Generando {args.db} (escala {args.scale}, semilla {args.seed})...")
+    counts, elapsed = generate(
+        args.db, seed=args.seed, scale=args.scale, force=args.force,
+        products=args.products, providers=args.providers, bulk=args.bulk,
+        years=args.years, sales_per_day=args.sales_per_day, end_date=args.end_date,
+    )
+    total = sum(counts.values())
+    print(f"\n📊 Filas generadas:")
+    for table, n in counts.items():
+        print(f"   • {table}: {n:,}")
+    print(f"\n✅ {total:,} filas en {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} filas/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# ingest_folder.py - INGRESO DE MERCADERÍA DESDE UNA CARPETA DE FOTOS
+"""
+Lee todas las fotos (y PDF) de una carpeta de entrega usando todos los
+núcleos de la PC, junta los códigos detectados en un solo resumen para
+revisar (como templates/review.html) y lo aplica como un solo lote de
+entradas (stock_entries.apply_entries).
+
+    python ingest_folder.py entregas/hoy
+    python ingest_folder.py entregas/hoy --provider 3 --yes
+    python ingest_folder.py entregas/ --watch        # procesa lo que vaya llegando
+
+Cada etiqueta detectada cuenta como una unidad. Los archivos procesados se
+mueven a <carpeta>/procesadas/. Los PDF requieren PyMuPDF (fitz).
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from database_setup import Product, Provider
+from barcode_decode import decode_barcodes
+from invoice_extract import iter_pages
+from stock_entries import apply_entries
+from pos_logging import get_logger
+
+log = get_logger("ingest_folder")
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff')
+DONE_DIR = 'procesadas'
+WATCH_INTERVAL = 3  # segundos entre revisiones de la carpeta
+
+
+# ========== TRABAJO DE CADA PROCESO ==========
+def scan_file(path):
+    """(ruta, códigos con repetición, error) para una foto o PDF"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        codes = []
+        for page in iter_pages(data):
+            # Las estrategias corren aquí mismo: el paralelismo es entre archivos
+            codes.extend(decode_barcodes(page, parallel=False, unique=False))
+        return path, codes, None
+    except Exception as e:
+        return path, [], str(e)
+
+
+def list_files(folder):
+    names = sorted(os.listdir(folder))
+    return [os.path.join(folder, n) for n in names
+            if n.lower().endswith(IMAGE_EXTENSIONS + ('.pdf',)) and os.path.isfile(os.path.join(folder, n))]
+
+
+# ========== LOTE ==========
+def scan_folder(files, workers):
+    """Decodificar los archivos en paralelo; Counter de códigos y archivos por código"""
+    counts = Counter()
+    sources = defaultdict(list)
+    errors = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(scan_file, path) for path in files]
+        for done, future in enumerate(as_completed(futures), 1):
+            path, codes, error = future.result()
+            if error:
+                errors.append((path, error))
+            for code in codes:
+                counts[code] += 1
+                sources[code].append(os.path.basename(path))
+            print(f"\r🔎 {done}/{len(files)} archivos", end="", flush=True)
+    print()
+    log.info("🔎 %d archivos en %.1f s con %d procesos: %d códigos distintos",
+             len(files), time.perf_counter() - started, workers, len(counts))
+    return counts, sources, errors
+
+
+def build_review(s, counts):
+    """Filas como las de review.html (qty, name, code, curr_stock) y códigos desconocidos"""
+    products = {p.code: p for p in s.scalars(select(Product).where(Product.code.in_(list(counts))))}
+    items, unknown = [], []
+    for code, qty in counts.most_common():
+        product = products.get(code)
+        if product is None:
+            unknown.append((code, qty))
+        else:
+            items.append({'qty': qty, 'name': product.name, 'code': code, 'curr_stock': product.stock})
+    return items, unknown
+
+
+def print_review(items, unknown, errors, sources):
+    print(f"\n{'Cant':>6}  {'Código':<15} {'Stock':>7}  Nombre")
+    for it in items:
+        print(f"{it['qty']:>6}  {it['code']:<15} {it['curr_stock']:>7}  {it['name']}")
+    if unknown:
+        print("\n⚠️ Códigos sin producto registrado (no se aplican):")
+        for code, qty in unknown:
+            print(f"{qty:>6}  {code:<15} en {', '.join(sorted(set(sources[code])))}")
+    for path, error in errors:
+        print(f"❌ {os.path.basename(path)}: {error}")
+
+
+def move_done(files, folder):
+    target = os.path.join(folder, DONE_DIR)
+    os.makedirs(target, exist_ok=True)
+    for path in files:
+        shutil.move(path, os.path.join(target, os.path.basename(path)))
+
+
+def ingest(files, folder, Session, args):
+    counts, sources, errors = scan_folder(files, args.workers)
+    with Session() as s:
+        items, unknown = build_review(s, counts)
+        print_review(items, unknown, errors, sources)
+        if not items:
+            print("Nada que aplicar.")
+            return
+        total = sum(it['qty'] for it in items)
+        if not args.yes:
+            answer = input(f"\n¿Aplicar {len(items)} productos ({total} unidades)? [s/N] ").strip().lower()
+            if answer not in ('s', 'si', 'sí', 'y', 'yes'):
+                print("Cancelado.")
+                return
+        results = apply_entries(s, [{'code': it['code'], 'quantity': it['qty']} for it in items],
+                                provider_id=args.provider)
+    applied = sum(1 for r in results if r['success'])
+    print(f"✅ {applied} productos actualizados, {total} unidades ingresadas")
+    if not args.keep:
+        move_done([f for f in files if f not in dict(errors)], folder)
+
+
+def watch(folder, Session, args):
+    """Procesar los archivos nuevos cuando dejan de crecer (copias desde el teléfono)"""
+    sizes = {}
+    seen = set()  # Archivos con error o cancelados: no se reintentan
+    print(f"👀 Vigilando {folder} (Ctrl+C para salir)")
+    while True:
+        ready = []
+        for path in list_files(folder):
+            if path in seen:
+                continue
+            size = os.path.getsize(path)
+            if sizes.get(path) == size:
+                ready.append(path)
+            sizes[path] = size
+        if ready:
+            ingest(ready, folder, Session, args)
+            for path in ready:
+                sizes.pop(path, None)
+                if os.path.exists(path):
+                    seen.add(path)
+        time.sleep(WATCH_INTERVAL)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingreso de mercadería desde una carpeta de fotos o PDF")
+    parser.add_argument('folder')
+    parser.add_argument('--db', default='pos.db')
+    parser.add_argument('--provider', type=int, default=None, help="ID del proveedor de la entrega")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--watch', action='store_true', help="Seguir vigilando la carpeta")
+    parser.add_argument('--yes', action='store_true', help="Aplicar sin preguntar")
+    parser.add_argument('--keep', action='store_true', help=f"No mover los archivos a {DONE_DIR}/")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        parser.error(f"No existe la carpeta {args.folder}")
+    Session = sessionmaker(bind=create_engine(f"sqlite:///{args.db}"))
+    if args.provider is not None:
+        # Se guarda en entries y products: sólo el id de un proveedor que exista (como /entries/batch)
+        with Session() as s:
+            if args.provider <= 0 or s.get(Provider, args.provider) is None:
+                parser.error(f"No existe el proveedor {args.provider}")
+
+    try:
+        if args.watch:
+            watch(args.folder, Session, args)
+        else:
+            files = list_files(args.folder)
+            if not files:
+                print("No hay fotos ni PDF en la carpeta.")
+                return 0
+            ingest(files, args.folder, Session, args)
+    except KeyboardInterrupt:
+        print("\n🛑 Detenido")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
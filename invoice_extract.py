@@ -0,0 +1,283 @@
+# invoice_extract.py - ARTÍCULOS DE UNA FACTURA A PARTIR DE SU FOTO
+"""
+Convierte la foto (o PDF) de una factura de proveedor en líneas candidatas
+para templates/review.html, sin servicios externos:
+
+1. Preparación: orientación EXIF, escala de grises, autocontraste y
+   binarizado con umbral de Otsu.
+2. Códigos de barras de la página (barcode_decode).
+3. Renglones de texto por perfil de proyección horizontal (filas con tinta)
+   y cada renglón al reconocedor de texto local configurado.
+4. Cada renglón se interpreta como "cantidad  [código]  descripción" y se
+   busca en el catálogo: primero por código exacto y si no por parecido del
+   nombre con un índice de trigramas en memoria.
+
+Los reconocedores se registran con register_recognizer(nombre, función);
+POS_OCR_ENGINE elige cuál usar ('tesseract' por defecto, requiere pytesseract
+y el programa tesseract; 'none' = sólo códigos de barras).
+Los PDF se leen página por página con PyMuPDF (opcional).
+"""
+
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from barcode_decode import decode_barcodes, load_image, DecodeUnavailable
+from pos_logging import get_logger
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+log = get_logger(__name__)
+
+OCR_ENGINE = os.environ.get('POS_OCR_ENGINE', 'tesseract')
+OCR_LANG = os.environ.get('POS_OCR_LANG', 'spa')
+OCR_MAX_SIDE = 2400     # px: suficiente para texto de factura impresa
+PDF_DPI = 200
+INK_MIN = 4             # tinta promedio (0-255) para considerar que una fila tiene texto
+MIN_LINE_PX = 8         # renglones más bajos son ruido o líneas de tabla
+LINE_GAP_PX = 2         # huecos menores dentro de un renglón se unen
+LINE_PAD_PX = 3
+MIN_SCORE = 0.45        # parecido mínimo (Dice de trigramas) para aceptar un nombre
+
+_recognizers = {}
+
+
+# ========== RECONOCEDORES DE TEXTO ==========
+def register_recognizer(name, fn):
+    """Registrar fn(imagen de un renglón) -> texto bajo ese nombre"""
+    _recognizers[name] = fn
+
+
+def get_recognizer(name=None):
+    """Reconocedor configurado o None (sólo se usan los códigos de barras)"""
+    name = name or OCR_ENGINE
+    if name == 'none':
+        return None
+    fn = _recognizers.get(name)
+    if fn is None:
+        log.warning("⚠️ Reconocedor de texto '%s' no disponible; sólo se leen códigos de barras", name)
+    return fn
+
+
+try:
+    import pytesseract
+
+    def _tesseract(line_img):
+        # psm 7: la imagen es un solo renglón de texto
+        return pytesseract.image_to_string(line_img, lang=OCR_LANG, config='--psm 7')
+
+    register_recognizer('tesseract', _tesseract)
+except ImportError:
+    pytesseract = None
+
+
+# ========== PÁGINAS ==========
+def iter_pages(data, dpi=PDF_DPI):
+    """Páginas del archivo como imágenes (bytes), una a la vez"""
+    if not data.startswith(b'%PDF'):
+        yield data
+        return
+    if fitz is None:
+        raise DecodeUnavailable("Instale PyMuPDF para leer PDF")
+    with fitz.open(stream=data, filetype='pdf') as doc:
+        for page in doc:
+            yield page.get_pixmap(dpi=dpi).tobytes('png')
+
+
+# ========== PREPARACIÓN Y SEGMENTACIÓN ==========
+def otsu_threshold(gray):
+    """Umbral que mejor separa tinta y papel según el histograma"""
+    hist = gray.histogram()[:256]
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_bg = weight_bg = 0
+    best, threshold = -1.0, 128
+    for i, h in enumerate(hist):
+        weight_bg += h
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += i * h
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold
+
+
+def preprocess(img):
+    """Imagen binarizada en modo 'L' (texto negro sobre blanco)"""
+    gray = ImageOps.autocontrast(img.convert('L'), cutoff=1)
+    t = otsu_threshold(gray)
+    return gray.point(lambda x: 255 if x > t else 0)
+
+
+def segment_lines(binary):
+    """Bandas (arriba, abajo) con texto, por perfil de proyección horizontal"""
+    width, height = binary.size
+    # Reducir a una columna promedia cada fila: tinta por fila sin recorrer píxeles en Python
+    profile = ImageOps.invert(binary).resize((1, height), Image.BOX).getdata()
+    bands = []
+    start = None
+    for y, ink in enumerate(profile):
+        if ink >= INK_MIN:
+            if start is None:
+                start = y
+        elif start is not None:
+            bands.append([start, y])
+            start = None
+    if start is not None:
+        bands.append([start, height])
+
+    merged = []
+    for band in bands:
+        if merged and band[0] - merged[-1][1] <= LINE_GAP_PX:
+            merged[-1][1] = band[1]
+        else:
+            merged.append(band)
+    return [(max(0, top - LINE_PAD_PX), min(height, bottom + LINE_PAD_PX))
+            for top, bottom in merged if bottom - top >= MIN_LINE_PX]
+
+
+def recognize_lines(img, recognizer):
+    """Texto de cada renglón de la página"""
+    binary = preprocess(img)
+    texts = []
+    for top, bottom in segment_lines(binary):
+        text = recognizer(binary.crop((0, top, binary.width, bottom))).strip()
+        if text:
+            texts.append(text)
+    return texts
+
+
+# ========== INTERPRETACIÓN ==========
+_CODE = re.compile(r"\b\d{8,14}\b")
+_QTY = re.compile(r"^\s*(\d{1,4})(?:[.,]0+)?\s*(?:x|und?|unid|uds?)?\b", re.IGNORECASE)
+_AMOUNT = re.compile(r"[₡$¢]?\s*\d[\d.,]*\s*$")
+
+
+def parse_line(text):
+    """(cantidad o None, código o None, descripción) de un renglón"""
+    code_match = _CODE.search(text)
+    code = code_match.group() if code_match else None
+    if code_match:
+        text = text[:code_match.start()] + " " + text[code_match.end():]
+    qty = None
+    m = _QTY.match(text)
+    if m:
+        qty = int(m.group(1))
+        text = text[m.end():]
+    # Quitar precios y totales al final del renglón
+    while True:
+        stripped = _AMOUNT.sub("", text).rstrip()
+        if stripped == text.rstrip():
+            break
+        text = stripped
+    return qty if qty else None, code, " ".join(text.split())
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductMatcher:
+    """✅ ÍNDICE DE TRIGRAMAS: nombre leído de la factura -> producto más parecido"""
+
+    def __init__(self, rows):
+        """rows: (id, code, name) de todos los productos"""
+        self.by_code = {}
+        self._names = []
+        self._sizes = []
+        postings = defaultdict(list)
+        for pid, code, name in rows:
+            entry = (pid, code, name)
+            self.by_code[code] = entry
+            grams = trigrams(normalize(name))
+            for gram in grams:
+                postings[gram].append(len(self._names))
+            self._names.append(entry)
+            self._sizes.append(len(grams))
+        self._postings = dict(postings)
+
+    def __len__(self):
+        return len(self._names)
+
+    def match(self, text, min_score=MIN_SCORE):
+        """(id, code, name, parecido) del mejor candidato o None"""
+        grams = trigrams(normalize(text))
+        if not grams:
+            return None
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        best, best_score = None, min_score
+        for i, n in shared.items():
+            score = 2 * n / (len(grams) + self._sizes[i])
+            if score > best_score:
+                best, best_score = i, score
+        if best is None:
+            return None
+        return self._names[best] + (round(best_score, 2),)
+
+
+# ========== PÁGINA COMPLETA ==========
+def extract_page(data, recognizer=None):
+    """{'codes': códigos de barras (uno por etiqueta), 'lines': textos de los renglones}"""
+    if Image is None:
+        raise DecodeUnavailable("Instale Pillow y pyzbar para leer facturas")
+    codes = decode_barcodes(data, unique=False)
+    lines = recognize_lines(load_image(data, OCR_MAX_SIDE)[0], recognizer) if recognizer else []
+    return {'codes': codes, 'lines': lines}
+
+
+def page_items(page, matcher):
+    """Líneas para review.html {'qty', 'name', 'code', 'score'} sin repetir código"""
+    items = {}
+    order = []
+
+    def add(key, qty, name, code, score):
+        if key in items:
+            items[key]['qty'] += qty
+        else:
+            items[key] = {'qty': qty, 'name': name, 'code': code, 'score': score}
+            order.append(key)
+
+    for text in page['lines']:
+        qty, code, description = parse_line(text)
+        if code in matcher.by_code:
+            _, code, name = matcher.by_code[code]
+            add(code, qty or 1, name, code, 1.0)
+            continue
+        found = matcher.match(description) if description else None
+        if found:
+            _, code, name, score = found
+            add(code, qty or 1, name, code, score)
+        elif qty and description:
+            # Sin coincidencia: se muestra lo leído para corregirlo a mano
+            add(("?", description), qty, description, '', 0.0)
+
+    # Códigos de barras que no aparecieron en el texto: una unidad por etiqueta
+    for code, count in Counter(page['codes']).items():
+        if code not in items:
+            entry = matcher.by_code.get(code)
+            add(code, count, entry[2] if entry else '', code, 1.0 if entry else 0.0)
+    return [items[key] for key in order]
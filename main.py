@@ -1,19 +1,31 @@
+import os
+import re
 import sys
 from PySide6.QtWidgets import QApplication, QMainWindow, QTabWidget
 from PySide6.QtGui import QIcon, QKeySequence, QShortcut
 from PySide6.QtCore import Qt
 from database_setup import init_db
+from pos_logging import get_logger
+from cart_journal import saved_lanes
+from feed_bridge import ChangeFeedBridge
+from backup import BackupService
+import maintenance
 from modules import (
     InventoryTab, FacturaTab, EntradasTab,
     ProveedoresTab, PagosTab, CajaTab, BalanceTab, AgranelTab
 )
 
+log = get_logger("main")
+
+# Cantidad de facturas (carriles de venta) abiertas al iniciar; Ctrl+N agrega otra
+SALE_LANES = max(1, int(os.environ.get('POS_SALE_LANES', 2)))
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         
         # Configuración básica de la ventana
-        self.setWindowTitle("POS Py - Dual Factura")
+        self.setWindowTitle("POS Py - Multi Factura")
         self.resize(950, 650)
         
         # Configurar ícono
@@ -35,11 +47,9 @@ class MainWindow(QMainWindow):
         """✅ CONFIGURAR TODAS LAS PESTAÑAS CON NUMERACIÓN"""
         
         # ========== CREAR INSTANCIAS ==========
-        self.factura1 = FacturaTab()
-        self.factura1.setObjectName("Cliente 1")
-        
-        self.factura2 = FacturaTab() 
-        self.factura2.setObjectName("Cliente 2")
+        # Todas las facturas comparten el catálogo y el autocompletado (catalog.py),
+        # así que abrir más carriles no multiplica las consultas
+        self.facturas = []
         
         self.inventory = InventoryTab()
         self.entradas_tab = EntradasTab()
@@ -50,60 +60,82 @@ class MainWindow(QMainWindow):
         self.agranel_tab = AgranelTab()
         
         # ========== AGREGAR PESTAÑAS NUMERADAS ==========
-        self.tabs.addTab(self.factura1,    "1. Cliente 1")
-        self.tabs.addTab(self.factura2,    "2. Cliente 2")
-        self.tabs.addTab(self.inventory,   "3. Inventario")
-        self.tabs.addTab(self.agranel_tab, "4. A granel")
-        self.tabs.addTab(self.entradas_tab,"5. Entradas")
-        self.tabs.addTab(self.proveedores, "6. Proveedores")
-        self.tabs.addTab(self.pagos_tab,   "7. Pagos")
-        self.tabs.addTab(self.caja_tab,    "8. Caja")
-        self.tabs.addTab(self.balance_tab, "9. Balance")
-        
-        # Configurar tooltip con información de atajos
-        shortcuts_info = (
-            "⌨️ Atajos de teclado disponibles:\n\n"
-            "F1 o Ctrl+1 → Cliente 1\n"
-            "F2 o Ctrl+2 → Cliente 2\n"
-            "F3 o Ctrl+3 → Inventario\n"
-            "F4 o Ctrl+4 → A granel\n"
-            "F5 o Ctrl+5 → Entradas\n"
-            "F6 o Ctrl+6 → Proveedores\n"
-            "F7 o Ctrl+7 → Pagos\n"
-            "F8 o Ctrl+8 → Caja\n"
-            "F9 o Ctrl+9 → Balance\n\n"
-            "Tecla Del → Eliminar elemento seleccionado"
-        )
-        self.tabs.setToolTip(shortcuts_info)
+        self.tabs.addTab(self.inventory,   "Inventario")
+        self.tabs.addTab(self.agranel_tab, "A granel")
+        self.tabs.addTab(self.entradas_tab,"Entradas")
+        self.tabs.addTab(self.proveedores, "Proveedores")
+        self.tabs.addTab(self.pagos_tab,   "Pagos")
+        self.tabs.addTab(self.caja_tab,    "Caja")
+        self.tabs.addTab(self.balance_tab, "Balance")
+        
+        # Abrir también las facturas extra que quedaron con carrito pendiente
+        pending = [int(m.group(1)) for m in map(re.compile(r"cliente_(\d+)\.jsonl$").match, saved_lanes()) if m]
+        for _ in range(max([SALE_LANES] + pending)):
+            self.add_sale_lane(renumber=False)
+        self.renumber_tabs()
+        self.tabs.setCurrentIndex(0)
+        
+    def add_sale_lane(self, renumber=True):
+        """✅ NUEVA FACTURA: se inserta después de la última factura existente"""
+        name = f"Cliente {len(self.facturas) + 1}"
+        factura = FacturaTab(name)
+        
+        index = len(self.facturas)
+        self.facturas.append(factura)
+        self.tabs.insertTab(index, factura, name)
+        
+        # Las conexiones se hacen aquí para que las facturas agregadas con Ctrl+N también queden conectadas
+        factura.saleDone.connect(self.balance_tab.on_sale)
+        factura.saleDone.connect(self.caja_tab.on_sale)
+        # El stock del inventario se actualiza con los avisos de change_feed (setup_connections)
+        
+        if renumber:
+            self.renumber_tabs()
+            self.switch_to_tab(index)
+        return factura
+        
+    def renumber_tabs(self):
+        """✅ NUMERAR PESTAÑAS Y ACTUALIZAR EL TOOLTIP DE ATAJOS"""
+        lines = ["⌨️ Atajos de teclado disponibles:\n"]
+        for i in range(self.tabs.count()):
+            name = self.tabs.widget(i).objectName() if i < len(self.facturas) else self.tabs.tabText(i).split(". ", 1)[-1]
+            self.tabs.setTabText(i, f"{i + 1}. {name}" if i < 9 else name)
+            if i < 9:
+                lines.append(f"F{i + 1} o Ctrl+{i + 1} → {name}")
+        lines.append("Ctrl+N → Nueva factura")
+        lines.append("\nTecla Del → Eliminar elemento seleccionado")
+        self.tabs.setToolTip("\n".join(lines))
         
     def setup_connections(self):
         """✅ CONFIGURAR CONEXIONES ENTRE PESTAÑAS"""
         
-        # Conexiones para ambas facturas
-        for factura in [self.factura1, self.factura2]:
-            factura.saleDone.connect(self.balance_tab.on_sale)
-            factura.saleDone.connect(self.caja_tab.on_sale)
-            factura.saleDone.connect(self.inventory.load)
+        # Las facturas se conectan al crearse (add_sale_lane)
         
         # Conectar señal de pagos a Caja
         self.proveedores.providerDone.connect(self.caja_tab.on_provider_payment)
         self.pagos_tab.paymentDone.connect(self.caja_tab.on_generic_payment)
+        self.pagos_tab.paymentsImported.connect(self.caja_tab.on_payments_imported)
+        
+        # Cambios de stock y entradas nuevas (de esta caja, de otra o del servidor web)
+        self.live = ChangeFeedBridge('pos.db', self)
+        self.live.stockChanged.connect(self.inventory.update_stock)
+        self.live.stockChanged.connect(self.entradas_tab.on_stock_changed)
+        self.live.entriesAdded.connect(self.entradas_tab.on_entries_added)
+        self.live.start()
+        
+        # Respaldo en segundo plano al cerrar cada turno y cada noche (backup.py)
+        self.backups = BackupService('pos.db').start()
+        self.caja_tab.shiftClosed.connect(lambda: self.backups.request("cierre de turno"))
+        
+        # ANALYZE, incremental_vacuum y quick_check cuando no hay ventas (maintenance.py)
+        maintenance.start('pos.db')
         
     def setup_keyboard_shortcuts(self):
         """✅ CONFIGURAR ATAJOS DE TECLADO GLOBALES"""
         
-        # Lista de atajos F1-F9 y Ctrl+1-9
-        shortcuts_data = [
-            ("F1", "Ctrl+1", 0),   # Cliente 1
-            ("F2", "Ctrl+2", 1),   # Cliente 2
-            ("F3", "Ctrl+3", 2),   # Inventario
-            ("F4", "Ctrl+4", 3),   # A granel
-            ("F5", "Ctrl+5", 4),   # Entradas
-            ("F6", "Ctrl+6", 5),   # Proveedores
-            ("F7", "Ctrl+7", 6),   # Pagos
-            ("F8", "Ctrl+8", 7),   # Caja
-            ("F9", "Ctrl+9", 8),   # Balance
-        ]
+        # Lista de atajos F1-F9 y Ctrl+1-9: siguen la posición de la pestaña
+        # (con más de dos facturas las demás pestañas se corren)
+        shortcuts_data = [(f"F{i + 1}", f"Ctrl+{i + 1}", i) for i in range(9)]
         
         # Crear atajos para cada pestaña
         for f_key, ctrl_key, tab_index in shortcuts_data:
@@ -121,6 +153,10 @@ class MainWindow(QMainWindow):
     def setup_additional_shortcuts(self):
         """✅ ATAJOS ADICIONALES ÚTILES"""
         
+        # Ctrl+N → Nueva factura
+        new_lane_shortcut = QShortcut(QKeySequence("Ctrl+N"), self)
+        new_lane_shortcut.activated.connect(self.add_sale_lane)
+        
         # Ctrl+Tab → Siguiente pestaña
         next_tab_shortcut = QShortcut(QKeySequence("Ctrl+Tab"), self)
         next_tab_shortcut.activated.connect(self.next_tab)
@@ -142,7 +178,7 @@ class MainWindow(QMainWindow):
         if 0 <= index < self.tabs.count():
             self.tabs.setCurrentIndex(index)
             current_tab_name = self.tabs.tabText(index)
-            print(f"📋 Cambiando a: {current_tab_name}")
+            log.debug("📋 Cambiando a: %s", current_tab_name)
             
     def next_tab(self):
         """✅ IR A LA SIGUIENTE PESTAÑA"""
@@ -0,0 +1,245 @@
+# maintenance.py - MANTENIMIENTO DE pos.db EN LOS RATOS LIBRES
+"""
+Tareas que SQLite no hace solo y que conviene correr cuando no hay ventas:
+
+- Estadísticas del planificador: PRAGMA optimize cada OPTIMIZE_EVERY y
+  ANALYZE completo después de cambios masivos (importar productos o pagos,
+  limpiar obsoletos), que avisan con mark_dirty().
+- Espacio libre: con auto_vacuum=INCREMENTAL las páginas que dejan los
+  borrados grandes se devuelven al disco de a VACUUM_STEP_PAGES con
+  PRAGMA incremental_vacuum. Una base creada sin ese modo se convierte una
+  vez con un VACUUM completo, que bloquea las escrituras mientras dura: eso
+  sólo lo hace `python maintenance.py` (con el programa cerrado); con el
+  programa abierto se avisa en el log que está pendiente.
+- PRAGMA quick_check una vez por día.
+
+Un hilo revisa cada CHECK_INTERVAL segundos PRAGMA data_version: si otra
+conexión hizo commit (una venta, una entrada) la base no está libre. Las
+tareas sólo corren tras IDLE_SECONDS sin cambios y los pasos de vacuum se
+detienen si aparece actividad. Antes y después de cada tarea se registran el
+tamaño del archivo, las páginas libres y la latencia de unas consultas de
+prueba.
+
+    python maintenance.py            # correr todo ahora, incluida la conversión (con el programa cerrado)
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from pos_logging import get_logger
+
+log = get_logger("maintenance")
+
+IDLE_SECONDS = float(os.environ.get('POS_MAINT_IDLE', 120))
+CHECK_INTERVAL = 15
+OPTIMIZE_EVERY = 6 * 3600
+QUICK_CHECK_EVERY = 24 * 3600
+VACUUM_STEP_PAGES = 256
+VACUUM_MIN_FREE_PAGES = 1024    # no vale la pena por menos (4 MB con páginas de 4 KB)
+VACUUM_STEP_PAUSE = 0.05
+
+# Consultas de prueba: cada una representa una lectura frecuente de la caja
+PROBES = (
+    ("producto por código", "SELECT id, name, price, stock FROM products "
+                            "WHERE code = (SELECT code FROM products ORDER BY id DESC LIMIT 1)"),
+    ("ventas de la semana", "SELECT COALESCE(SUM(i.quantity * i.price), 0) FROM sales s "
+                            "JOIN sale_items i ON i.sale_id = s.id WHERE s.date >= date('now', '-7 day')"),
+    ("pagos del mes", "SELECT COALESCE(SUM(amount), 0) FROM payments "
+                      "WHERE is_provider = 0 AND date >= date('now', '-30 day')"),
+)
+
+
+class MaintenanceScheduler:
+    """✅ MANTENIMIENTO EN SEGUNDO PLANO: sólo cuando la base está quieta"""
+
+    def __init__(self, path='pos.db', idle_seconds=IDLE_SECONDS, convert=False):
+        self.path = path
+        self.idle_seconds = idle_seconds
+        self.convert = convert      # ¿Se permite el VACUUM completo de la conversión?
+        self._conversion_noted = False
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._dirty = []            # motivos de cambios masivos pendientes
+        self._version = None
+        self._last_activity = time.monotonic()
+        self.last_run = {}          # tarea -> time.monotonic() de la última vez
+
+    # ========== AVISOS ==========
+    def mark_dirty(self, reason):
+        """Hubo un cambio masivo: ANALYZE y vacuum en el próximo rato libre"""
+        with self._lock:
+            self._dirty.append(reason)
+
+    # ========== HILO ==========
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="pos-maintenance", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        return self._conn
+
+    def _run(self):
+        while not self._stop.wait(CHECK_INTERVAL):
+            try:
+                if self._idle():
+                    self.run_due()
+            except sqlite3.Error as e:
+                # Base ocupada o bloqueada: se reintenta en el próximo rato libre
+                log.warning("⚠️ Mantenimiento postergado: %s", e)
+
+    def _idle(self):
+        version = self._connect().execute("PRAGMA data_version").fetchone()[0]
+        if version != self._version:
+            self._version = version
+            self._last_activity = time.monotonic()
+            return False
+        return time.monotonic() - self._last_activity >= self.idle_seconds
+
+    def _busy(self):
+        """¿Otra conexión escribió desde la última revisión?"""
+        return self._conn.execute("PRAGMA data_version").fetchone()[0] != self._version
+
+    def _due(self, task, every):
+        last = self.last_run.get(task)
+        return last is None or time.monotonic() - last >= every
+
+    # ========== TAREAS ==========
+    def run_due(self, force=False):
+        """Correr las tareas pendientes; force=True corre todas"""
+        conn = self._connect()
+        self._version = conn.execute("PRAGMA data_version").fetchone()[0]  # Base para _busy()
+        with self._lock:
+            dirty, self._dirty = self._dirty, []
+
+        if dirty or force:
+            self._task('analyze', "ANALYZE", lambda: conn.execute("ANALYZE"), dirty)
+        elif self._due('optimize', OPTIMIZE_EVERY):
+            self._task('optimize', "PRAGMA optimize", lambda: conn.execute("PRAGMA optimize"))
+
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if free >= VACUUM_MIN_FREE_PAGES or (force and free):
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                self._task('vacuum', f"incremental_vacuum ({free:,} páginas libres)", self._incremental_vacuum)
+            elif self.convert:
+                self._task('vacuum', "conversión a auto_vacuum=INCREMENTAL", self._enable_incremental)
+            elif not self._conversion_noted:
+                # El VACUUM bloquearía las ventas más que su busy timeout: no con el programa abierto
+                self._conversion_noted = True
+                log.warning("⚠️ %s tiene %s páginas libres y no usa auto_vacuum=INCREMENTAL: "
+                            "cerrar el programa y correr `python maintenance.py` para convertirla", self.path, f"{free:,}")
+
+        if force or self._due('quick_check', QUICK_CHECK_EVERY):
+            self._quick_check()
+
+    def _task(self, name, label, fn, reasons=()):
+        before = self.metrics()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        after = self.metrics()
+        self.last_run[name] = time.monotonic()
+        if name == 'analyze':
+            self.last_run['optimize'] = self.last_run[name]
+        log.info("🧹 %s en %.2f s%s | archivo %.1f → %.1f MB, libres %s → %s | %s",
+                 label, elapsed, f" (por: {', '.join(reasons)})" if reasons else "",
+                 before['size'] / 1e6, after['size'] / 1e6, f"{before['free_pages']:,}", f"{after['free_pages']:,}",
+                 ", ".join(f"{probe} {before['probes'][probe]:.2f} → {after['probes'][probe]:.2f} ms"
+                           for probe in after['probes'] if probe in before['probes']))
+
+    def _incremental_vacuum(self):
+        """Devolver páginas libres de a pasos; se detiene si la caja vuelve a escribir"""
+        conn = self._conn
+        while not self._stop.is_set():
+            if conn.execute("PRAGMA freelist_count").fetchone()[0] == 0:
+                break
+            # executescript avanza la sentencia hasta el final: execute() libera una sola página
+            conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES});")
+            if self._busy():
+                log.debug("🧹 incremental_vacuum interrumpido por actividad")
+                break
+            time.sleep(VACUUM_STEP_PAUSE)
+        # Con WAL las páginas liberadas llegan al archivo en el checkpoint
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    def _enable_incremental(self):
+        conn = self._conn
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")  # Necesario una vez para cambiar el modo de una base existente
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    def _quick_check(self):
+        started = time.perf_counter()
+        rows = [r[0] for r in self._conn.execute("PRAGMA quick_check").fetchall()]
+        self.last_run['quick_check'] = time.monotonic()
+        if rows == ['ok']:
+            log.info("🩺 quick_check ok en %.2f s", time.perf_counter() - started)
+        else:
+            log.error("❌ quick_check encontró problemas: %s", "; ".join(rows[:10]))
+        return rows
+
+    # ========== MÉTRICAS ==========
+    def metrics(self):
+        """{'size': bytes (con WAL), 'free_pages', 'probes': {consulta: ms}}"""
+        conn = self._connect()
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + '-wal') if os.path.exists(p))
+        probes = {}
+        for name, sql in PROBES:
+            best = None
+            for _ in range(3):
+                started = time.perf_counter()
+                try:
+                    conn.execute(sql).fetchall()
+                except sqlite3.OperationalError:
+                    break  # Tabla que todavía no existe
+                ms = (time.perf_counter() - started) * 1000
+                best = ms if best is None else min(best, ms)
+            if best is not None:
+                probes[name] = best
+        return {'size': size, 'free_pages': conn.execute("PRAGMA freelist_count").fetchone()[0], 'probes': probes}
+
+
+scheduler = None
+
+
+def start(path='pos.db'):
+    """✅ Iniciar el mantenimiento de la aplicación (main.py)"""
+    global scheduler
+    if scheduler is None:
+        scheduler = MaintenanceScheduler(path).start()
+    return scheduler
+
+
+def mark_dirty(reason):
+    """Avisar un cambio masivo (no hace nada si el mantenimiento no está corriendo)"""
+    if scheduler is not None:
+        scheduler.mark_dirty(reason)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantenimiento de la base de datos del POS")
+    parser.add_argument('--db', default='pos.db')
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        parser.error(f"No existe {args.db}")
+    MaintenanceScheduler(args.db, convert=True).run_due(force=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,14 @@
 # migration_script.py - VERSIÓN CORREGIDA
 """
 Script para migrar tu base de datos existente a la nueva estructura.
-EJECUTAR SOLO UNA VEZ antes de usar las nuevas funcionalidades.
+El programa ya migra el esquema solo al iniciar (migrations.py); este script
+lo hace sin abrirlo y además crea proveedores de ejemplo.
 """
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from database_setup import Base, Product, Provider, init_db
+from database_setup import Product, Provider
+import migrations
 import os
 
 def migrate_database():
@@ -19,23 +21,11 @@ def migrate_database():
     Session = sessionmaker(bind=engine)
     session = Session()
     
-    # 2. Verificar si la columna provider_id existe y agregarla si no
-    try:
-        with engine.connect() as conn:
-            conn.execute(text('ALTER TABLE products ADD COLUMN provider_id INTEGER'))
-            conn.commit()
-        print("✅ Columna provider_id agregada exitosamente")
-    except Exception as e:
-        if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
-            print("ℹ️ Columna provider_id ya existe")
-        else:
-            print(f"⚠️ Error al agregar columna: {e}")
-    
-    # 3. Crear las tablas si no existen (especialmente la tabla providers)
-    Base.metadata.create_all(engine, checkfirst=True)
-    print("✅ Tablas verificadas/creadas")
+    # 2. Llevar el esquema a la última versión (columna provider_id, tablas, índices...)
+    version = migrations.migrate('pos.db')
+    print(f"✅ Esquema en la versión {version} (ver migrations.py)")
     
-    # 4. Crear algunos proveedores de ejemplo si no existen
+    # 3. Crear algunos proveedores de ejemplo si no existen
     if session.query(Provider).count() == 0:
         proveedores_ejemplo = [
             Provider(name="Proveedor General", contact=""),
@@ -52,7 +42,7 @@ def migrate_database():
     else:
         print("ℹ️ Ya existen proveedores en la base de datos")
     
-    # 5. Mostrar estadísticas
+    # 4. Mostrar estadísticas
     total_products = session.query(Product).count()
     
     # Contar productos con proveedor (verificando si la columna existe)
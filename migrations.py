@@ -0,0 +1,115 @@
+# migrations.py - MIGRACIONES DEL ESQUEMA CON VERSIÓN
+"""
+El esquema de pos.db lleva su versión en PRAGMA user_version. Al iniciar,
+migrate() lee ese número: si ya es LATEST no hace nada más (nada de
+ALTER TABLE de prueba ni de revisar tablas en cada arranque).
+
+Si la base está atrasada, corre en orden los pasos que faltan. Cada paso:
+
+- es idempotente: una base anterior a este sistema (user_version = 0) puede
+  tener ya parte de los cambios, así que cada paso revisa antes de cambiar;
+- corre en su propia transacción (BEGIN IMMEDIATE) junto con el nuevo
+  user_version, así que una migración interrumpida se retoma donde quedó y
+  dos procesos que arrancan juntos (caja y servidor web) no la repiten.
+
+Para cambiar el esquema se agrega un paso al final de MIGRATIONS, nunca se
+modifica uno ya publicado.
+
+    python migrations.py            # migrar pos.db y mostrar la versión
+"""
+
+import argparse
+import sys
+
+from sqlalchemy import create_engine
+
+from database_setup import Base, ensure_indexes, ensure_product_changes, ensure_rollups
+from pos_logging import get_logger
+
+log = get_logger("migrations")
+
+
+# ========== PASOS ==========
+def _auto_vacuum(conn):
+    """Bases nuevas con auto_vacuum=INCREMENTAL (las existentes las convierte maintenance.py)"""
+    # Sólo tiene efecto antes de crear la primera tabla; después requiere un VACUUM completo
+    if conn.exec_driver_sql("SELECT COUNT(*) FROM sqlite_master").scalar() == 0:
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+
+
+def _create_tables(conn):
+    """Tablas que falten (balance_months/years traen sus triggers y carga inicial, ver database_setup.py)"""
+    Base.metadata.create_all(conn, checkfirst=True)
+
+
+def _provider_column(conn):
+    """products.provider_id en bases anteriores a los proveedores"""
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(products)")}
+    if 'provider_id' not in columns:
+        conn.exec_driver_sql("ALTER TABLE products ADD COLUMN provider_id INTEGER REFERENCES providers(id)")
+
+
+MIGRATIONS = [
+    (1, "auto_vacuum incremental", _auto_vacuum),
+    (2, "tablas", _create_tables),
+    (3, "products.provider_id", _provider_column),
+    (4, "índices", ensure_indexes),
+    (5, "triggers de totales por mes y año", ensure_rollups),
+    (6, "product_changes para los avisos de stock", ensure_product_changes),
+]
+LATEST = MIGRATIONS[-1][0]
+
+# PRAGMA auto_vacuum no tiene efecto dentro de una transacción: se corre antes del BEGIN
+OUTSIDE_TRANSACTION = {_auto_vacuum}
+
+
+# ========== EJECUCIÓN ==========
+def version(conn):
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(path='pos.db'):
+    """✅ Llevar la base a LATEST; devuelve la versión final"""
+    # Sin transacciones implícitas del módulo sqlite3: cada paso abre la suya
+    engine = create_engine(f'sqlite:///{path}', connect_args={'isolation_level': None})
+    try:
+        with engine.connect() as conn:
+            current = version(conn)
+            if current >= LATEST:
+                return current  # Caso normal al iniciar: una sola lectura
+
+            for number, label, step in MIGRATIONS:
+                if number <= current:
+                    continue
+                if step in OUTSIDE_TRANSACTION:
+                    step(conn)
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+                try:
+                    # Otro proceso pudo haber migrado mientras esperábamos el bloqueo
+                    if version(conn) >= number:
+                        conn.exec_driver_sql("COMMIT")
+                        continue
+                    if step not in OUTSIDE_TRANSACTION:
+                        step(conn)
+                    conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+                    conn.exec_driver_sql("COMMIT")
+                except Exception:
+                    conn.exec_driver_sql("ROLLBACK")
+                    log.error("❌ Migración %d (%s) falló", number, label)
+                    raise
+                log.info("🔄 Migración %d: %s", number, label)
+            return version(conn)
+    finally:
+        engine.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de la base de datos del POS")
+    parser.add_argument('--db', default='pos.db')
+    args = parser.parse_args(argv)
+    print(f"✅ {args.db}: versión {migrate(args.db)} (última {LATEST})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
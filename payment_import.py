@@ -0,0 +1,158 @@
+# payment_import.py - IMPORTACIÓN MASIVA DE PAGOS GENERALES DESDE CSV
+"""
+Lógica de PagosTab.import_csv sin Qt, pensada para archivos grandes:
+
+- El formato de fecha se detecta una vez por archivo con las primeras filas;
+  después cada fecha se lee con un camino rápido (datetime.fromisoformat o
+  una expresión regular compilada) en vez de probar cinco strptime por fila.
+  Una fila que no calza con el formato detectado se prueba con todos.
+- Todas las filas se insertan con un solo INSERT executemany, en la misma
+  transacción que borra los pagos anteriores.
+"""
+
+import csv
+import re
+import unicodedata
+from datetime import datetime
+
+from sqlalchemy import delete, insert
+
+from database_setup import Payment
+import maintenance
+from pos_logging import get_logger
+
+log = get_logger(__name__)
+
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d",
+                "%d/%m/%Y %H:%M:%S", "%d/%m/%Y", "%d/%m/%y")
+SAMPLE_ROWS = 20
+
+_DMY = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{2}|\d{4})(?:\s+(\d{1,2}):(\d{2})(?::(\d{2}))?)?$")
+_AMOUNT_CHARS = re.compile(r"[^0-9.,]")
+
+
+def _parse_iso(text):
+    return datetime.fromisoformat(text)
+
+
+def _parse_dmy(text):
+    m = _DMY.match(text)
+    if not m:
+        raise ValueError(text)
+    day, month, year, hour, minute, second = m.groups()
+    year = int(year)
+    if year < 100:
+        year += 2000 if year < 69 else 1900  # Misma regla que %y
+    return datetime(year, int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0))
+
+
+def _parse_any(text):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(text)
+
+
+def detect_date_parser(samples):
+    """Función de lectura rápida para las fechas del archivo (según las primeras filas)"""
+    samples = [s for s in samples if s]
+    for parser in (_parse_iso, _parse_dmy):
+        try:
+            for s in samples:
+                parser(s)
+            return parser
+        except ValueError:
+            continue
+    return _parse_any
+
+
+def parse_amount(raw):
+    """Monto con separadores de miles o decimales ("25.000,50", "25000") o None"""
+    clean = _AMOUNT_CHARS.sub("", raw)
+    if clean.count(',') > 0 and clean.count('.') > 1:
+        clean = clean.replace('.', '')
+    try:
+        return float(clean.replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def _column(norm, keys, default):
+    for i, h in enumerate(norm):
+        if any(k in h for k in keys):
+            return i
+    return default
+
+
+def read_payments_csv(path):
+    """✅ Filas válidas del archivo como diccionarios para insertar, y cuántas se omitieron"""
+    with open(path, mode='r', encoding='utf-8-sig', newline='') as f:
+        # Detectar delimitador automáticamente
+        sample = f.read(8192)
+        f.seek(0)
+        counts = {d: sample.count(d) for d in (';', ',', '\t')}
+        reader = csv.reader(f, delimiter=max(counts, key=counts.get))
+        headers = next(reader, None)
+        if headers is None:
+            return [], 0
+        body = list(reader)
+
+    # Detectar columnas automáticamente
+    norm = [unicodedata.normalize('NFKD', h).encode('ascii', 'ignore').decode('ascii').lower() for h in headers]
+    date_i = _column(norm, ('fecha', 'date'), 0)
+    concept_i = _column(norm, ('concepto', 'desc', 'descr', 'concept'), 1)
+    amt_i = _column(norm, ('monto', 'amount', 'amt'), 2)
+    width = max(date_i, concept_i, amt_i)
+
+    parse_date = detect_date_parser([row[date_i].strip() for row in body[:SAMPLE_ROWS] if len(row) > width])
+    log.debug("📥 Importación de pagos: %d filas, fechas con %s", len(body), parse_date.__name__)
+
+    rows = []
+    skipped = 0
+    for row_num, row in enumerate(body, 2):  # Empezar en fila 2
+        if len(row) <= width:
+            skipped += 1
+            continue
+        raw_date = row[date_i].strip()
+        try:
+            dt = parse_date(raw_date)
+        except ValueError:
+            try:
+                dt = _parse_any(raw_date)
+            except ValueError:
+                log.warning("⚠️ Fila %s: fecha inválida '%s'", row_num, raw_date)
+                skipped += 1
+                continue
+        concept = row[concept_i].strip()
+        if not concept:
+            log.warning("⚠️ Fila %s: concepto vacío", row_num)
+            skipped += 1
+            continue
+        amt = parse_amount(row[amt_i])
+        if amt is None:
+            log.warning("⚠️ Fila %s: monto inválido '%s'", row_num, row[amt_i])
+            skipped += 1
+            continue
+        if amt <= 0:
+            skipped += 1
+            continue
+        rows.append({'date': dt, 'amount': amt, 'category': concept, 'is_provider': False})
+    return rows, skipped
+
+
+def replace_payments(s, rows):
+    """✅ Reemplazar los pagos generales por rows en una sola transacción; devuelve (cantidad, total)"""
+    try:
+        s.execute(delete(Payment).where(Payment.is_provider == 0).execution_options(synchronize_session=False))
+        if rows:
+            s.execute(insert(Payment), rows)
+        s.commit()
+    except Exception:
+        s.rollback()
+        raise
+    maintenance.mark_dirty("importación de pagos")
+    total = sum(r['amount'] for r in rows)
+    log.info("📥 %d pagos importados (₡%s)", len(rows), f"{total:,.0f}")
+    return len(rows), total
@@ -0,0 +1,168 @@
+# pos_logging.py - REGISTRO ESTRUCTURADO CON NIVELES
+"""
+Capa de logging para la aplicación, en reemplazo de print().
+
+- Formato perezoso: los mensajes se pasan como plantilla + argumentos
+  (log.debug("Total: %d", total)) y sólo se formatean si el nivel está activo.
+- Control por nivel con POS_LOG_LEVEL (DEBUG, INFO, WARNING, ERROR). Con el
+  nivel por defecto (INFO) las llamadas debug de las rutas calientes no cuestan
+  más que una comparación.
+- Anillo en memoria: emit() sólo agrega el registro a un deque acotado; un hilo
+  de fondo formatea y escribe a consola/archivo. Nunca se bloquea la interfaz
+  por E/S de consola (lenta en Windows con emojis). Si el anillo se llena se
+  descartan los registros más antiguos y el hilo de fondo avisa cuántos.
+- Campos estructurados opcionales: log.info("Venta", extra=fields(total=1500))
+  agrega " total=1500" al final de la línea.
+
+POS_LOG_FILE=pos.log agrega además un archivo rotativo.
+"""
+
+import atexit
+import logging
+import os
+import sys
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+LOG_LEVEL = os.environ.get('POS_LOG_LEVEL', 'INFO').upper()
+LOG_FILE = os.environ.get('POS_LOG_FILE', '')
+RING_CAPACITY = 5000
+FLUSH_INTERVAL = 0.5  # segundos
+
+_ROOT_NAME = 'pos'
+_handler = None
+_lock = threading.Lock()
+
+
+def fields(**kwargs):
+    """Campos estructurados para extra=: log.info("msg", extra=fields(a=1))"""
+    return {'fields': kwargs}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Línea de texto legible con los campos clave=valor al final"""
+
+    def format(self, record):
+        line = super().format(record)
+        extra = getattr(record, 'fields', None)
+        if extra:
+            line += " " + " ".join(f"{k}={v!r}" if isinstance(v, str) else f"{k}={v}"
+                                   for k, v in extra.items())
+        return line
+
+
+class RingBufferHandler(logging.Handler):
+    """✅ ANILLO EN MEMORIA: encola registros y los vacía desde un hilo de fondo"""
+
+    def __init__(self, targets, capacity=RING_CAPACITY, interval=FLUSH_INTERVAL):
+        super().__init__()
+        self.targets = list(targets)
+        self.pending = deque(maxlen=capacity)
+        self.recent = deque(maxlen=capacity)
+        self.dropped = 0
+        self._reported = 0  # dropped ya avisado
+        self.interval = interval
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="pos-log-flush", daemon=True)
+        self._thread.start()
+
+    def emit(self, record):
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+        self.pending.append(record)
+        self.recent.append(record)
+        if record.levelno >= logging.WARNING:
+            self._wake.set()  # Errores y advertencias salen sin esperar el intervalo
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        dropped = self.dropped
+        if dropped > self._reported:
+            # Directo a los destinos: por el anillo el aviso también podría perderse
+            self._write(logging.makeLogRecord({
+                'name': f'{_ROOT_NAME}.logging', 'levelno': logging.WARNING,
+                'levelname': 'WARNING',
+                'msg': "⚠️ Anillo de logs lleno: %d registros descartados (%d en total)",
+                'args': (dropped - self._reported, dropped)}))
+            self._reported = dropped
+        while True:
+            try:
+                record = self.pending.popleft()
+            except IndexError:
+                break
+            self._write(record)
+        for target in self.targets:
+            target.flush()
+
+    def _write(self, record):
+        for target in self.targets:
+            if record.levelno >= target.level:
+                target.handle(record)
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self.flush()
+        for target in self.targets:
+            target.close()
+        super().close()
+
+
+def _console_stream():
+    """stderr que reemplaza caracteres no representables (consolas Windows sin UTF-8)"""
+    try:
+        return open(sys.stderr.fileno(), 'w', encoding=sys.stderr.encoding or 'utf-8',
+                    errors='replace', closefd=False, buffering=1)
+    except (AttributeError, OSError, ValueError):
+        return sys.stderr
+
+
+def setup(level=None, log_file=None):
+    """Configura el logger raíz 'pos' una sola vez (idempotente)"""
+    global _handler
+    with _lock:
+        root = logging.getLogger(_ROOT_NAME)
+        if _handler is not None:
+            if level:
+                root.setLevel(level.upper())
+            return root
+
+        formatter = StructuredFormatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s",
+                                        "%H:%M:%S")
+        console = logging.StreamHandler(_console_stream())
+        console.setFormatter(formatter)
+        targets = [console]
+
+        path = log_file if log_file is not None else LOG_FILE
+        if path:
+            file_handler = RotatingFileHandler(path, maxBytes=2_000_000, backupCount=3, encoding='utf-8')
+            file_handler.setFormatter(formatter)
+            targets.append(file_handler)
+
+        _handler = RingBufferHandler(targets)
+        root.addHandler(_handler)
+        root.setLevel((level or LOG_LEVEL).upper())
+        root.propagate = False
+        atexit.register(_handler.close)
+        return root
+
+
+def get_logger(name):
+    """Logger hijo de 'pos' para un módulo: log = get_logger(__name__)"""
+    setup()
+    return logging.getLogger(f"{_ROOT_NAME}.{name}")
+
+
+def recent_records(n=100):
+    """Últimos n registros (ya formateados) del anillo, para diagnóstico"""
+    if _handler is None:
+        return []
+    records = list(_handler.recent)[-n:]
+    return [_handler.targets[0].format(r) for r in records]
@@ -0,0 +1,50 @@
+# queries.py - CONSULTAS FRECUENTES PREARMADAS
+"""
+Sentencias de las búsquedas que corren en cada escaneo o tecla (facturas,
+entradas, catálogo), armadas UNA vez al importar el módulo con bindparam.
+
+Armar session.query(...).filter(...) en cada llamada cuesta en Python:
+construir los objetos de la consulta y calcular su clave para el caché de
+compilación de SQLAlchemy. Una sentencia prearmada se reutiliza tal cual
+(su clave queda memorizada) y sólo cambian los parámetros:
+
+    prod = session.scalars(queries.PRODUCT_BY_CODE, {'code': code}).first()
+
+`python bench.py` compara ambos estilos.
+"""
+
+from sqlalchemy import bindparam, or_, select
+
+from database_setup import Product, BulkProduct
+
+# ========== POR CÓDIGO EXACTO (objetos del ORM) ==========
+PRODUCT_BY_CODE = select(Product).where(Product.code == bindparam('code')).limit(1)
+BULK_BY_CODE = select(BulkProduct).where(BulkProduct.code == bindparam('code')).limit(1)
+
+# ========== POR CÓDIGO EXACTO (sólo columnas, para el catálogo en memoria) ==========
+PRODUCT_ROW_BY_CODE = (
+    select(Product.id, Product.code, Product.name, Product.price)
+    .where(Product.code == bindparam('code'))
+)
+BULK_ROW_BY_CODE = (
+    select(BulkProduct.id, BulkProduct.code, BulkProduct.name, BulkProduct.price)
+    .where(BulkProduct.code == bindparam('code'))
+)
+
+# ========== BÚSQUEDA PARCIAL (pattern = '%texto%') ==========
+PRODUCT_CODE_LIKE = select(Product).where(Product.code.ilike(bindparam('pattern'))).limit(1)
+BULK_CODE_LIKE = select(BulkProduct).where(BulkProduct.code.ilike(bindparam('pattern'))).limit(1)
+PRODUCT_NAME_LIKE = select(Product).where(Product.name.ilike(bindparam('pattern'))).limit(1)
+BULK_NAME_LIKE = select(BulkProduct).where(BulkProduct.name.ilike(bindparam('pattern'))).limit(1)
+
+# Autocompletado de entradas: "código - nombre" de hasta 10 productos
+PRODUCT_SUGGEST = (
+    select(Product.code, Product.name)
+    .where(or_(Product.code.ilike(bindparam('pattern')), Product.name.ilike(bindparam('pattern'))))
+    .limit(10)
+)
+
+
+def like(text):
+    """Patrón para las búsquedas parciales"""
+    return {'pattern': f"%{text}%"}
@@ -0,0 +1,204 @@
+# query_cache.py - CACHÉ DE RESULTADOS DE CONSULTAS POR VERSIÓN DE TABLA
+"""
+Guarda el resultado de consultas que se repiten mucho (totales del día,
+listas de proveedores) y lo invalida sólo cuando cambia alguna de las
+tablas que leen.
+
+- Cada tabla tiene un contador de versión. La sesión lo incrementa al hacer
+  flush (after_flush), al ejecutar INSERT/UPDATE/DELETE masivos
+  (do_orm_execute) y otra vez en commit o rollback.
+- Cada resultado se guarda con la foto de las versiones de sus tablas: si
+  alguna cambió, es un fallo y se vuelve a consultar.
+- Los cambios de OTRAS conexiones (servidor web, ingest_folder.py) no pasan
+  por la sesión: se detectan con PRAGMA data_version y vacían todo el caché.
+- Tamaño limitado con desalojo LRU y contadores de aciertos/fallos.
+
+Las pestañas lo activan por función, declarando qué tablas lee:
+
+    @cached_query('sales', 'sale_items')
+    def _sales_total(self, d):
+        ...
+
+Los argumentos forman parte de la clave (deben ser hashables). El resultado
+debe ser un valor simple (números, tuplas), no objetos del ORM: esos expiran
+con cada commit. POS_QUERY_CACHE=0 lo desactiva.
+"""
+
+import functools
+import os
+import threading
+from collections import OrderedDict, defaultdict
+
+from sqlalchemy import event
+
+from pos_logging import get_logger
+
+log = get_logger(__name__)
+
+MAX_ENTRIES = int(os.environ.get('POS_QUERY_CACHE', 512))
+
+# Tablas que los triggers modifican al escribir en otra (database_setup._ROLLUP_DDL)
+DERIVED_TABLES = {
+    'balances': ('balance_months', 'balance_years'),
+}
+
+_PENDING = 'query_cache_tables'
+
+
+class QueryCache:
+    """✅ CACHÉ LRU DE RESULTADOS, INVALIDADO POR TABLA"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # clave -> (versiones, resultado)
+        self._versions = defaultdict(int)
+        self._epoch = 0                 # sube con cambios de otras conexiones: invalida todo
+        self._data_versions = {}        # id(conexión DBAPI) -> último PRAGMA data_version
+        self._lock = threading.RLock()
+        self._session = None
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self.evictions = 0
+
+    # ========== VERSIONES ==========
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] += 1
+                for derived in DERIVED_TABLES.get(table, ()):
+                    self._versions[derived] += 1
+
+    def _snapshot(self, tables):
+        return (self._epoch,) + tuple(self._versions[t] for t in tables)
+
+    def _check_external(self):
+        """Vaciar si otra conexión hizo commit desde la última consulta"""
+        if self._session is None:
+            return
+        try:
+            conn = self._session.connection()
+            version = conn.exec_driver_sql("PRAGMA data_version").scalar()
+        except Exception:
+            return
+        key = id(conn.connection.dbapi_connection)
+        with self._lock:
+            previous = self._data_versions.get(key)
+            self._data_versions[key] = version
+            if previous != version:
+                self._epoch += 1
+
+    # ========== RESULTADOS ==========
+    def get_or_compute(self, name, key, tables, compute):
+        if self.max_entries <= 0:
+            return compute()
+        self._check_external()
+        with self._lock:
+            snapshot = self._snapshot(tables)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == snapshot:
+                self._entries.move_to_end(key)
+                self.hits[name] += 1
+                return entry[1]
+            self.misses[name] += 1
+
+        result = compute()
+
+        with self._lock:
+            # Si la sesión escribió mientras se calculaba, el resultado ya nació viejo
+            if self._snapshot(tables) == snapshot:
+                self._entries[key] = (snapshot, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ========== EVENTOS DE LA SESIÓN ==========
+    def install(self, session):
+        """Escuchar los cambios de la sesión (o sessionmaker) de la aplicación"""
+        self._session = session
+        event.listen(session, 'after_flush', self._after_flush)
+        event.listen(session, 'do_orm_execute', self._on_execute)
+        event.listen(session, 'after_commit', self._after_end)
+        event.listen(session, 'after_rollback', self._after_end)
+        return self
+
+    def _touch(self, session, tables):
+        if tables:
+            self.bump(tables)
+            session.info.setdefault(_PENDING, set()).update(tables)
+
+    def _after_flush(self, session, flush_context):
+        tables = set()
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            mapper = getattr(obj, '__mapper__', None)
+            if mapper is not None:
+                tables.update(t.name for t in mapper.tables)
+        self._touch(session, tables)
+
+    def _on_execute(self, orm_execute_state):
+        # insert(Model) / update / delete masivos no pasan por flush
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            table = getattr(orm_execute_state.statement, 'table', None)
+            if table is not None:
+                self._touch(orm_execute_state.session, {table.name})
+
+    def _after_end(self, session):
+        # Lo leído entre el flush y el fin de la transacción puede no valer (rollback)
+        self.bump(session.info.pop(_PENDING, ()))
+
+    # ========== MÉTRICAS ==========
+    def stats(self):
+        with self._lock:
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+            return {
+                'entries': len(self._entries),
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                'evictions': self.evictions,
+            }
+
+    def report(self):
+        """Texto con aciertos y fallos por consulta"""
+        with self._lock:
+            names = sorted(set(self.hits) | set(self.misses),
+                           key=lambda n: self.hits[n] + self.misses[n], reverse=True)
+            lines = [f"{'aciertos':>9} {'fallos':>7}  consulta"]
+            for name in names:
+                lines.append(f"{self.hits[name]:9d} {self.misses[name]:7d}  {name}")
+        s = self.stats()
+        lines.append(f"{len(self)} en caché, {s['hit_rate']:.0%} de aciertos, {s['evictions']} desalojos")
+        return "\n".join(lines)
+
+
+cache = QueryCache()
+
+
+def cached_query(*tables):
+    """✅ Decorador: guardar el resultado de la función según sus argumentos y las tablas que lee"""
+    tables = tuple(sorted(tables))
+
+    def decorate(fn):
+        name = fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            return cache.get_or_compute(name, key, tables, lambda: fn(*args, **kwargs))
+
+        wrapper.tables = tables
+        return wrapper
+
+    return decorate
+
+
+def install(session):
+    return cache.install(session)
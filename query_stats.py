@@ -0,0 +1,225 @@
+# query_stats.py - INSTRUMENTACIÓN OPCIONAL DE CONSULTAS SQL
+"""
+Mide el tiempo de cada sentencia SQL usando los eventos de SQLAlchemy
+before_cursor_execute / after_cursor_execute.
+
+- Histograma de latencia por sentencia, etiquetado con la pestaña y el método
+  que la originó (por ejemplo FacturaTab.add_line).
+- Detección de patrones N+1: la misma forma de sentencia repetida muchas
+  veces dentro de una sola acción de la interfaz.
+- Log rotativo de consultas lentas con la salida de EXPLAIN QUERY PLAN.
+
+Se activa con la variable de entorno POS_SQL_STATS=1 (ver db.py). Sin ella
+no se registra ningún evento y el costo es cero.
+"""
+
+import atexit
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+SLOW_QUERY_MS = float(os.environ.get('POS_SLOW_QUERY_MS', 50))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('POS_N_PLUS_ONE', 5))
+SLOW_LOG_PATH = os.environ.get('POS_SLOW_LOG', 'slow_queries.log')
+
+# Límites superiores de los cubos del histograma, en milisegundos
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, float('inf'))
+
+# Directorios cuyo código se considera "de la aplicación" para etiquetar llamadas
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_THIS_FILE = os.path.abspath(__file__)
+
+_WS_RE = re.compile(r"\s+")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def statement_shape(statement):
+    """Normaliza una sentencia: espacios, listas IN y literales, para agrupar repeticiones"""
+    shape = _WS_RE.sub(" ", statement).strip()
+    shape = _IN_LIST_RE.sub("(?...)", shape)
+    return _LITERAL_RE.sub("?", shape)
+
+
+def caller_tag():
+    """Busca en la pila el primer método de la app (pestañas, main, etc.)"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename != _THIS_FILE and filename.startswith(_APP_DIR) and "site-packages" not in filename:
+            owner = frame.f_locals.get('self')
+            name = frame.f_code.co_name
+            if owner is not None:
+                return f"{type(owner).__name__}.{name}"
+            return f"{os.path.splitext(os.path.basename(filename))[0]}.{name}"
+        frame = frame.f_back
+    return "?"
+
+
+class StatementStats:
+    """Histograma y agregados de una forma de sentencia para una etiqueta"""
+    __slots__ = ('count', 'total_ms', 'max_ms', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def add(self, ms):
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        for i, limit in enumerate(BUCKETS_MS):
+            if ms <= limit:
+                self.buckets[i] += 1
+                break
+
+    def percentile(self, pct):
+        """Percentil aproximado: límite superior del cubo que lo contiene"""
+        target = self.count * pct / 100.0
+        acc = 0
+        for i, n in enumerate(self.buckets):
+            acc += n
+            if acc >= target:
+                return min(BUCKETS_MS[i], self.max_ms)
+        return self.max_ms
+
+
+class QueryStats:
+    """✅ RECOLECTOR DE ESTADÍSTICAS: se conecta a un engine de SQLAlchemy"""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, n_plus_one=N_PLUS_ONE_THRESHOLD,
+                 slow_log_path=SLOW_LOG_PATH):
+        self.slow_ms = slow_ms
+        self.n_plus_one = n_plus_one
+        self.stats = defaultdict(StatementStats)   # (tag, shape) -> StatementStats
+        self.n_plus_one_hits = defaultdict(int)     # (tag, shape) -> veces detectado
+        self._lock = threading.Lock()
+        self._action = {}                           # shape -> repeticiones en la acción actual
+        self._action_flagged = set()
+        self._action_open = False
+        self._end_scheduled = False
+        self._last_ts = 0.0
+
+        self.slow_log = logging.getLogger('pos.slow_sql')
+        self.slow_log.propagate = False
+        if slow_log_path and not self.slow_log.handlers:
+            handler = RotatingFileHandler(slow_log_path, maxBytes=1_000_000, backupCount=5,
+                                          encoding='utf-8')
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.slow_log.addHandler(handler)
+            self.slow_log.setLevel(logging.INFO)
+
+    # ========== EVENTOS ==========
+    def install(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+        return self
+
+    def uninstall(self, engine):
+        event.remove(engine, 'before_cursor_execute', self._before)
+        event.remove(engine, 'after_cursor_execute', self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_start'].pop()
+        ms = (time.perf_counter() - started) * 1000.0
+        tag = caller_tag()
+        shape = statement_shape(statement)
+        key = (tag, shape)
+
+        with self._lock:
+            self.stats[key].add(ms)
+            self._track_action(key)
+
+        if ms >= self.slow_ms:
+            self._log_slow(cursor, statement, parameters, executemany, tag, ms)
+
+    # ========== DETECCIÓN N+1 ==========
+    def _track_action(self, key):
+        """Una acción de UI = una vuelta del event loop de Qt (o una ráfaga sin pausas)"""
+        now = time.perf_counter()
+        if not self._action_open or (not self._end_scheduled and now - self._last_ts > 0.1):
+            self._action.clear()
+            self._action_flagged.clear()
+            self._action_open = True
+            self._end_scheduled = self._schedule_action_end()
+        self._last_ts = now
+
+        shape = key[1]
+        self._action[shape] = self._action.get(shape, 0) + 1
+        if self._action[shape] >= self.n_plus_one and shape not in self._action_flagged:
+            self._action_flagged.add(shape)
+            self.n_plus_one_hits[key] += 1
+            self.slow_log.warning("N+1 probable en %s: %d× %s", key[0], self._action[shape], shape[:200])
+
+    def _schedule_action_end(self):
+        """Programa el cierre de la acción cuando Qt vuelva al event loop; False si no hay Qt"""
+        try:
+            from PySide6.QtCore import QCoreApplication, QThread, QTimer
+        except ImportError:
+            return False
+        app = QCoreApplication.instance()
+        if app is None or QThread.currentThread() != app.thread():
+            return False
+        QTimer.singleShot(0, self._end_action)
+        return True
+
+    def _end_action(self):
+        with self._lock:
+            self._end_scheduled = False
+            self._action_open = False
+
+    # ========== LOG DE CONSULTAS LENTAS ==========
+    def _log_slow(self, cursor, statement, parameters, executemany, tag, ms):
+        plan = ""
+        if not executemany and statement.lstrip()[:6].upper().startswith(("SELECT", "WITH")):
+            try:
+                rows = cursor.connection.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+                plan = "\n".join(f"    {r[-1]}" for r in rows)
+            except Exception as e:
+                plan = f"    (EXPLAIN falló: {e})"
+        self.slow_log.info("%.1f ms en %s\n  %s\n  params=%r\n%s",
+                           ms, tag, _WS_RE.sub(" ", statement).strip(),
+                           parameters if not executemany else f"{len(parameters)} filas", plan)
+
+    # ========== REPORTE ==========
+    def report(self, limit=30):
+        """Texto con las sentencias que más tiempo total consumen"""
+        with self._lock:
+            items = sorted(self.stats.items(), key=lambda kv: kv[1].total_ms, reverse=True)[:limit]
+            lines = [f"{'total ms':>10} {'n':>7} {'p50':>7} {'p95':>7} {'max':>8}  origen / sentencia"]
+            for (tag, shape), st in items:
+                flag = " ⚠️N+1" if self.n_plus_one_hits.get((tag, shape)) else ""
+                lines.append(f"{st.total_ms:10.1f} {st.count:7d} {st.percentile(50):7.2f} "
+                             f"{st.percentile(95):7.2f} {st.max_ms:8.2f}  {tag}{flag}")
+                lines.append(f"{'':45}{shape[:110]}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.n_plus_one_hits.clear()
+
+
+stats = None
+
+
+def install(engine, **kwargs):
+    """✅ Activa la instrumentación en el engine y muestra el reporte al salir"""
+    global stats
+    if stats is None:
+        stats = QueryStats(**kwargs)
+        atexit.register(lambda: print(f"\n📊 ESTADÍSTICAS SQL\n{stats.report()}"))
+    return stats.install(engine)
@@ -0,0 +1,94 @@
+# reports.py - LECTURAS PESADAS EN HILOS APARTE
+"""
+Historiales, totales por turno y exportaciones CSV leen mucho. En db.session
+comparten conexión y transacción con las ventas: mientras leen, la interfaz
+se congela y el commit de finish_sale espera detrás de ellas.
+
+run() ejecuta la función en un hilo del pool de lectura con su propia sesión
+(db.ReadSession: conexiones con query_only sobre pos.db en WAL, así que no
+frenan a quien escribe) y entrega el resultado en el hilo de la interfaz:
+
+    reports.run('caja.historial', self._history_rows, on_done=self._show_history)
+
+La función recibe la sesión como primer argumento y devuelve datos listos
+para mostrar (tuplas, dicts u objetos ya cargados: la sesión se cierra al
+terminar). Si se vuelve a pedir la misma clave antes de que termine, sólo se
+entrega el resultado más nuevo.
+
+read() hace lo mismo sin hilo, para lecturas cortas que la interfaz necesita
+enseguida (expandir un mes, contar filas antes de exportar).
+"""
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from db import READ_POOL_SIZE, ReadSession
+from pos_logging import get_logger
+
+log = get_logger("reports")
+
+_pool = None
+_latest = {}    # clave -> último trabajo pedido
+_running = set()    # Referencias a los trabajos hasta que entregan su resultado
+
+
+class _Signals(QObject):
+    done = Signal(object)
+    failed = Signal(str)
+
+
+class _Job(QRunnable):
+    def __init__(self, key, fn, args):
+        super().__init__()
+        self.setAutoDelete(False)   # Lo libera Python cuando se entrega el resultado
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.signals = _Signals()   # Creado en el hilo de la interfaz: las señales llegan ahí
+
+    def run(self):
+        try:
+            result = read(self.fn, *self.args)
+        except Exception as e:
+            log.error("❌ Reporte %s falló: %s", self.key, e)
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.done.emit(result)
+
+
+def pool():
+    global _pool
+    if _pool is None:
+        _pool = QThreadPool()
+        _pool.setMaxThreadCount(READ_POOL_SIZE)
+    return _pool
+
+
+def read(fn, *args):
+    """Ejecutar fn(sesión, *args) con una sesión de lectura y cerrarla"""
+    with ReadSession() as s:
+        return fn(s, *args)
+
+
+def run(key, fn, *args, on_done=None, on_error=None):
+    """✅ Ejecutar fn(sesión, *args) en el pool de lectura; on_done(resultado) en la interfaz"""
+    job = _Job(key, fn, args)
+    _latest[key] = job
+    _running.add(job)
+
+    def finish(callback, value):
+        _running.discard(job)
+        if _latest.get(key) is not job:
+            return  # Hay un pedido más nuevo de lo mismo
+        del _latest[key]
+        if callback is not None:
+            callback(value)
+
+    job.signals.done.connect(lambda result: finish(on_done, result))
+    job.signals.failed.connect(lambda message: finish(on_error, message))
+    pool().start(job)
+    return job
+
+
+def wait(msecs=-1):
+    """Esperar a que terminen los reportes en curso (True si terminaron)"""
+    return pool().waitForDone(msecs)
@@ -0,0 +1,119 @@
+# scanner.py - DETECCIÓN DE LECTOR DE CÓDIGOS DE BARRAS
+"""
+Los lectores USB se presentan como teclado (HID): "escriben" el código entero
+en unos pocos milisegundos y terminan con Enter. Una persona rara vez teclea
+con menos de ~50 ms entre teclas, así que el intervalo entre pulsaciones basta
+para distinguir un escaneo de la escritura normal.
+
+ScanBurstDetector no depende de Qt: la pestaña le avisa de cada tecla y al
+presionar Enter pregunta si el texto completo llegó en una ráfaga. También
+acumula la latencia de cada escaneo (primera tecla -> línea agregada).
+
+parse_scale_label reconoce las etiquetas de balanza (EAN-13 con prefijo 2x)
+que traen el PLU del producto a granel y el peso o el precio impresos.
+"""
+
+import os
+import time
+from collections import deque, namedtuple
+
+SCAN_MAX_GAP_MS = float(os.environ.get('POS_SCAN_GAP_MS', 35))
+SCAN_MIN_CHARS = int(os.environ.get('POS_SCAN_MIN_CHARS', 4))
+LATENCY_SAMPLES = 500
+
+# Etiquetas de balanza (EAN-13 de uso interno, prefijo 2x): 2 dígitos de prefijo,
+# 5 del PLU (código del BulkProduct), 5 del valor y el verificador.
+# Según el prefijo el valor es el precio en colones o el peso en gramos.
+SCALE_PRICE_PREFIXES = tuple(os.environ.get('POS_SCALE_PRICE_PREFIXES', '20,21,22').split(','))
+SCALE_WEIGHT_PREFIXES = tuple(os.environ.get('POS_SCALE_WEIGHT_PREFIXES', '23,24,25,26,27,28,29').split(','))
+
+# mode: 'price' (value en colones) o 'weight' (value en gramos)
+ScaleLabel = namedtuple('ScaleLabel', 'plu mode value')
+
+
+def ean13_check_digit(digits12):
+    """Dígito verificador EAN-13 para 12 dígitos"""
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits12))
+    return str((10 - total % 10) % 10)
+
+
+def parse_scale_label(text):
+    """✅ ETIQUETA DE BALANZA: ScaleLabel si text es un EAN-13 2x válido, si no None"""
+    if len(text) != 13 or not text.isdigit() or text[0] != '2':
+        return None
+    prefix = text[:2]
+    if prefix in SCALE_PRICE_PREFIXES:
+        mode = 'price'
+    elif prefix in SCALE_WEIGHT_PREFIXES:
+        mode = 'weight'
+    else:
+        return None
+    if ean13_check_digit(text[:12]) != text[12]:
+        return None
+    return ScaleLabel(text[2:7], mode, int(text[7:12]))
+
+
+class ScanBurstDetector:
+    """✅ DETECTOR DE RÁFAGAS: teclas con menos de max_gap_ms entre sí"""
+
+    def __init__(self, max_gap_ms=SCAN_MAX_GAP_MS, min_chars=SCAN_MIN_CHARS):
+        self.max_gap = max_gap_ms / 1000.0
+        self.min_chars = min_chars
+        self.run = 0              # teclas consecutivas dentro de la ráfaga actual
+        self.burst_start = 0.0    # momento de la primera tecla de la ráfaga
+        self.last_key = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # ms por escaneo
+        self.scans = 0
+
+    def key(self, now=None):
+        """Registrar una tecla imprimible; devuelve True si estamos dentro de una ráfaga"""
+        now = time.perf_counter() if now is None else now
+        if self.run and now - self.last_key <= self.max_gap:
+            self.run += 1
+        else:
+            self.run = 1
+            self.burst_start = now
+        self.last_key = now
+        return self.in_burst
+
+    @property
+    def in_burst(self):
+        return self.run >= self.min_chars
+
+    def finish(self, text_length, now=None):
+        """Al presionar Enter: (es_escaneo, inicio) y reinicia el estado.
+
+        Es escaneo si todo el texto llegó en la ráfaga y el Enter vino pegado a ella.
+        """
+        now = time.perf_counter() if now is None else now
+        is_scan = (self.in_burst and self.run >= text_length
+                   and now - self.last_key <= self.max_gap * 3)
+        started = self.burst_start
+        self.reset()
+        return is_scan, started
+
+    def reset(self):
+        self.run = 0
+
+    # ========== LATENCIA ==========
+    def record_scan(self, started, now=None):
+        """Guardar la latencia de un escaneo; devuelve los milisegundos"""
+        now = time.perf_counter() if now is None else now
+        ms = (now - started) * 1000.0
+        self.latencies.append(ms)
+        self.scans += 1
+        return ms
+
+    def latency_summary(self):
+        """Resumen de las últimas latencias de escaneo (ms)"""
+        if not self.latencies:
+            return {'scans': self.scans, 'avg': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+        ordered = sorted(self.latencies)
+        n = len(ordered)
+        return {
+            'scans': self.scans,
+            'avg': sum(ordered) / n,
+            'p50': ordered[n // 2],
+            'p95': ordered[min(n - 1, int(n * 0.95))],
+            'max': ordered[-1],
+        }
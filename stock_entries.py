@@ -0,0 +1,120 @@
+# stock_entries.py - APLICAR ENTRADAS DE MERCADERÍA EN LOTE
+"""
+Lógica compartida por EntradasTab.finish y el servidor web (/entries/batch):
+valida una lista de líneas y la aplica en una sola transacción.
+
+- Una consulta para encontrar todos los productos (por id o por código).
+- Las líneas repetidas del mismo producto se suman antes de escribir.
+- Una pasada de UPDATE (executemany) para el stock y un INSERT en lote para
+  las entradas.
+- Resultado por línea: éxito con el stock nuevo, o el motivo del rechazo.
+- all_or_nothing=True (/entries/batch): si alguna línea es inválida no se
+  aplica ninguna, así el cliente puede corregir y reenviar el lote completo
+  sin duplicar las que ya habían entrado.
+"""
+
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import bindparam, insert, or_, select, update
+
+from database_setup import Product, Entry
+from pos_logging import get_logger
+
+log = get_logger(__name__)
+
+_stock_update = (
+    update(Product.__table__)
+    .where(Product.__table__.c.id == bindparam('pid'))
+    .values(stock=Product.__table__.c.stock + bindparam('qty'))
+)
+
+
+def _quantity(value):
+    try:
+        qty = int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    return qty if qty > 0 else None
+
+
+def apply_entries(s, lines, provider_id=None, entry_date=None, all_or_nothing=False):
+    """✅ Aplica las líneas [{'product_id' o 'code', 'quantity'}] y hace commit.
+
+    Las líneas inválidas no detienen a las demás, salvo con all_or_nothing:
+    entonces las válidas vuelven con 'skipped': True y no se escribe nada.
+    Devuelve una lista de resultados en el mismo orden: {'index', 'success',
+    'product_id', 'code', 'quantity', 'new_stock'} o {'index', 'success': False, 'error'}.
+    """
+    results = [None] * len(lines)
+    parsed = []
+    for i, line in enumerate(lines):
+        qty = _quantity(line.get('quantity'))
+        product_id = line.get('product_id')
+        code = str(line.get('code') or '').strip()
+        if qty is None:
+            results[i] = {'index': i, 'success': False, 'error': 'Cantidad inválida'}
+        elif product_id in (None, '') and not code:
+            results[i] = {'index': i, 'success': False, 'error': 'Falta el producto'}
+        else:
+            try:
+                parsed.append((i, int(product_id) if product_id not in (None, '') else None, code, qty))
+            except (TypeError, ValueError):
+                results[i] = {'index': i, 'success': False, 'error': 'Producto inválido'}
+
+    if not parsed:
+        return results
+
+    ids = {pid for _, pid, _, _ in parsed if pid is not None}
+    codes = {code for _, pid, code, _ in parsed if pid is None}
+    found = s.execute(
+        select(Product.id, Product.code, Product.provider_id)
+        .where(or_(Product.id.in_(ids), Product.code.in_(codes)))
+    ).all()
+    by_id = {row.id: row for row in found}
+    by_code = {row.code: row for row in found}
+
+    per_product = defaultdict(int)
+    accepted = []
+    for i, pid, code, qty in parsed:
+        row = by_id.get(pid) if pid is not None else by_code.get(code)
+        if row is None:
+            results[i] = {'index': i, 'success': False, 'error': 'Producto no existe'}
+            continue
+        per_product[row.id] += qty
+        accepted.append((i, row, qty))
+
+    if not accepted:
+        return results
+    if all_or_nothing and len(accepted) < len(lines):
+        for i, _, _ in accepted:
+            results[i] = {'index': i, 'success': False, 'skipped': True,
+                          'error': 'No aplicada: el lote tiene líneas con errores'}
+        return results
+
+    try:
+        today = entry_date or date.today()
+        # Por s.execute (no la conexión): query_cache y el catálogo ven el UPDATE en do_orm_execute
+        s.execute(_stock_update, [{'pid': pid, 'qty': qty} for pid, qty in per_product.items()])
+        s.execute(insert(Entry), [
+            {'provider_id': provider_id, 'date': today, 'product_id': row.id, 'quantity': qty}
+            for _, row, qty in accepted
+        ])
+        # ✅ Asignar proveedor a los productos que no lo tienen
+        if provider_id:
+            orphans = [row.id for row in found if row.provider_id is None and row.id in per_product]
+            if orphans:
+                s.execute(update(Product).where(Product.id.in_(orphans)).values(provider_id=provider_id)
+                          .execution_options(synchronize_session=False))
+        new_stock = dict(s.execute(select(Product.id, Product.stock).where(Product.id.in_(per_product))).all())
+        s.commit()
+    except Exception:
+        s.rollback()
+        raise
+
+    for i, row, qty in accepted:
+        results[i] = {'index': i, 'success': True, 'product_id': row.id, 'code': row.code,
+                      'quantity': qty, 'new_stock': new_stock.get(row.id)}
+    log.info("📦 %d entradas aplicadas (%d productos, %d unidades)",
+             len(accepted), len(per_product), sum(per_product.values()))
+    return results
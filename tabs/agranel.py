@@ -9,6 +9,9 @@ from PySide6.QtGui import QFont
 from PySide6.QtCore import Qt, QTimer
 from db import session
 from database_setup import BulkProduct
+from pos_logging import get_logger
+
+log = get_logger(__name__)
 
 class AgranelTab(QWidget):
     def __init__(self):
@@ -231,7 +234,7 @@ class AgranelTab(QWidget):
                 self.table.setItem(r, 2, price_item)
                 
         except Exception as e:
-            print(f"❌ Error cargando productos a granel: {e}")
+            log.error("❌ Error cargando productos a granel: %s", e)
             QMessageBox.warning(self, "Error", f"Error cargando productos: {str(e)}")
 
     def show_dialog(self, prod=None):
@@ -418,7 +421,7 @@ class AgranelTab(QWidget):
                 QMessageBox.information(self, "Producto Eliminado", 
                                        f"✅ Producto eliminado correctamente\n\n{product_info}")
                 self.load()
-                print(f"✅ Producto a granel eliminado: {product_info}")
+                log.info("✅ Producto a granel eliminado: %s", product_info)
             else:
                 QMessageBox.warning(self, "Producto No Encontrado", 
                                    "El producto no se encontró en la base de datos")
@@ -1,17 +1,23 @@
 # tabs/balance.py - VERSIÓN CON DISEÑO CONSISTENTE
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QDateEdit,
-    QTableWidget, QTableWidgetItem, QPushButton, QAbstractItemView,
+    QTreeWidget, QTreeWidgetItem, QPushButton, QAbstractItemView,
     QFileDialog, QMessageBox, QHeaderView, QGroupBox, QGridLayout
 )
 from PySide6.QtCore import Qt, QDate, QEvent
 from PySide6.QtGui import QFont, QColor
 from db import session
-from database_setup import Balance, Sale, SaleItem, Payment
+from database_setup import Balance, BalanceMonth, BalanceYear, Sale, SaleItem, SaleDay, Payment
 from datetime import datetime
 from sqlalchemy import func
+from date_ranges import day, month, within
+from query_cache import cached_query
+import reports
 import csv
 import re
+from pos_logging import get_logger
+
+log = get_logger(__name__)
 
 class BalanceTab(QWidget):
     def __init__(self):
@@ -202,28 +208,28 @@ class BalanceTab(QWidget):
         history_title.setStyleSheet("font-size: 16px; font-weight: bold; color: #333; margin: 20px 0 10px 0;")
         self.layout().addWidget(history_title)
 
-        # ========== TABLA CON DISEÑO CONSISTENTE ==========
-        self.table = QTableWidget(0, 5)
-        self.table.setHorizontalHeaderLabels([
-            "Fecha", "Ventas", "Pagos Proveedores", "Pagos Generales", "Saldo Neto"
+        # ========== ÁRBOL AÑO > MES > DÍA ==========
+        # Años y meses salen de balance_years / balance_months (mantenidas por triggers);
+        # los hijos se cargan al expandir, así que abrir años de historial es instantáneo
+        self.tree = QTreeWidget()
+        self.tree.setColumnCount(6)
+        self.tree.setHeaderLabels([
+            "Período", "Ventas", "Pagos Proveedores", "Pagos Generales", "Saldo Neto", "Ventas vs. año anterior"
         ])
 
         # Configuración de columnas
-        header = self.table.horizontalHeader()
-        header.setSectionResizeMode(0, QHeaderView.ResizeToContents)  # Fecha
-        header.setSectionResizeMode(1, QHeaderView.Stretch)          # Ventas
-        header.setSectionResizeMode(2, QHeaderView.Stretch)          # Proveedores
-        header.setSectionResizeMode(3, QHeaderView.Stretch)          # Pagos
-        header.setSectionResizeMode(4, QHeaderView.Stretch)          # Saldo
+        header = self.tree.header()
+        header.setSectionResizeMode(0, QHeaderView.ResizeToContents)  # Período
+        for col in range(1, 6):
+            header.setSectionResizeMode(col, QHeaderView.Stretch)
 
         # Estilo consistente con otras pestañas
-        self.table.setAlternatingRowColors(True)
-        self.table.setStyleSheet(
+        self.tree.setAlternatingRowColors(True)
+        self.tree.setStyleSheet(
             """
-            QTableWidget {
+            QTreeWidget {
                 background-color: white;
                 alternate-background-color: #F8F9FA;
-                gridline-color: #DEE2E6;
                 border: 1px solid #DEE2E6;
                 font-size: 14px;
                 color: #212529;
@@ -237,11 +243,11 @@ class BalanceTab(QWidget):
                 border: none;
                 border-right: 1px solid #6C757D;
             }
-            QTableWidget::item {
+            QTreeWidget::item {
                 padding: 8px;
                 border-bottom: 1px solid #E9ECEF;
             }
-            QTableWidget::item:selected {
+            QTreeWidget::item:selected {
                 background-color: #E3F2FD;
                 color: #1976D2;
             }
@@ -249,19 +255,18 @@ class BalanceTab(QWidget):
         )
 
         # Configuración de edición y selección
-        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.table.installEventFilter(self)
+        self.tree.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.tree.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.tree.installEventFilter(self)
+        self.tree.itemExpanded.connect(self._load_children)
         
         # Fuente optimizada
         table_font = QFont()
         table_font.setPointSize(14)
-        self.table.setFont(table_font)
-        self.table.verticalHeader().setDefaultSectionSize(40)
-        self.table.verticalHeader().setVisible(False)
-        self.table.horizontalHeader().setHighlightSections(False)
+        self.tree.setFont(table_font)
+        self.tree.header().setHighlightSections(False)
 
-        self.layout().addWidget(self.table)
+        self.layout().addWidget(self.tree)
 
         # ========== CONEXIONES ==========
         self.btn_save.clicked.connect(self._save_record)
@@ -269,39 +274,42 @@ class BalanceTab(QWidget):
         self.btn_export.clicked.connect(self._export_csv)
 
         # ========== INICIALIZACIÓN ==========
-        Balance.__table__.create(session.bind, checkfirst=True)
         self._recompute()
         self._load_history()
 
+    @cached_query('sales', 'sale_items', 'sale_days')
+    def _sales_total(self, d):
+        """Ventas del día (en caché hasta que cambien las ventas)"""
+        hot = (
+            session.query(func.coalesce(func.sum(SaleItem.price * SaleItem.quantity), 0))
+                   .select_from(SaleItem)
+                   .join(Sale, SaleItem.sale_id == Sale.id)
+                   .filter(within(Sale.date, day(d)))
+                   .scalar() or 0
+        )
+        # Días archivados (archive.py): el total quedó en sale_days
+        archived = session.query(SaleDay.total).filter(SaleDay.date == d).scalar() or 0
+        return hot + archived
+
+    @cached_query('payments')
+    def _payments_total(self, d, is_provider):
+        """Pagos del día a proveedores o generales (en caché hasta que cambien los pagos)"""
+        return (
+            session.query(func.coalesce(func.sum(Payment.amount), 0))
+                   .filter(within(Payment.date, day(d)),
+                           Payment.is_provider == is_provider)
+                   .scalar() or 0
+        )
+
     def _recompute(self):
         """✅ Recalcular métricas del día seleccionado"""
         try:
             d = self.date_edit.date().toPython()
 
-            # Calcular ventas del día
-            ventas = (
-                session.query(func.coalesce(func.sum(SaleItem.price * SaleItem.quantity), 0))
-                       .select_from(SaleItem)
-                       .join(Sale, SaleItem.sale_id == Sale.id)
-                       .filter(func.date(Sale.date) == d)
-                       .scalar() or 0
-            )
-
-            # Calcular pagos a proveedores del día
-            compras = (
-                session.query(func.coalesce(func.sum(Payment.amount), 0))
-                       .filter(func.date(Payment.date) == d,
-                               Payment.is_provider == True)
-                       .scalar() or 0
-            )
-
-            # Calcular pagos generales del día
-            pagos = (
-                session.query(func.coalesce(func.sum(Payment.amount), 0))
-                       .filter(func.date(Payment.date) == d,
-                               Payment.is_provider == False)
-                       .scalar() or 0
-            )
+            # Después de una venta sólo se vuelven a consultar las ventas; los pagos salen del caché
+            ventas = self._sales_total(d)
+            compras = self._payments_total(d, True)
+            pagos = self._payments_total(d, False)
 
             # Calcular saldo neto
             saldo = ventas - compras - pagos
@@ -324,7 +332,7 @@ class BalanceTab(QWidget):
             self.lbl_balance.setText(f"₡{int(saldo):,}")
 
         except Exception as e:
-            print(f"❌ Error recalculando métricas: {e}")
+            log.error("❌ Error recalculando métricas: %s", e)
 
     def on_sale(self, ventas, compras, pagos, saldo):
         """✅ Callback cuando se realiza una venta"""
@@ -375,51 +383,141 @@ class BalanceTab(QWidget):
                                    f"📅 Fecha: {d.strftime('%Y-%m-%d')}\n" +
                                    f"💰 Saldo: ₡{int(saldo):,}")
             
-            self._load_history()
-            print(f"✅ Registro de balance guardado: {d.strftime('%Y-%m-%d')}")
+            self._load_history(focus=d)
+            log.info("✅ Registro de balance guardado: %s", d.strftime('%Y-%m-%d'))
 
         except Exception as e:
             session.rollback()
             QMessageBox.critical(self, "Error", f"Error guardando registro: {str(e)}")
 
-    def _load_history(self):
-        """✅ Cargar historial con resaltado visual"""
-        self.table.setRowCount(0)
+    def _load_history(self, focus=None):
+        """✅ Cargar los años (y expandir el año y mes de focus, si se indica) en un hilo de lectura"""
+        reports.run('balance.historial', self._history_years,
+                    on_done=lambda years: self._show_history(years, focus),
+                    on_error=lambda message: log.error("❌ Error cargando historial: %s", message))
+
+    @staticmethod
+    def _history_years(s):
+        """Años con sus totales (se ejecuta en el pool de lectura)"""
+        return s.query(BalanceYear).order_by(BalanceYear.year.desc()).all()
+
+    def _show_history(self, years, focus=None):
+        """Llenar el árbol con los años de _history_years"""
+        self.tree.clear()
+        by_year = {y.year: y for y in years}
+        for y in years:
+            item = QTreeWidgetItem(self.tree)
+            self._fill_item(item, str(y.year), y, by_year.get(y.year - 1))
+            item.setData(0, Qt.UserRole, ('year', y.year))
+            QTreeWidgetItem(item)  # Hijo provisorio: muestra la flecha de expandir
+
+        if focus:
+            for i in range(self.tree.topLevelItemCount()):
+                year_item = self.tree.topLevelItem(i)
+                if year_item.data(0, Qt.UserRole) == ('year', focus.year):
+                    year_item.setExpanded(True)
+                    for j in range(year_item.childCount()):
+                        month_item = year_item.child(j)
+                        if month_item.data(0, Qt.UserRole) == ('month', focus.strftime("%Y-%m")):
+                            month_item.setExpanded(True)
+
+    def _load_children(self, item):
+        """✅ Cargar meses de un año o días de un mes la primera vez que se expande"""
+        if item.childCount() != 1 or item.child(0).data(0, Qt.UserRole) is not None:
+            return  # Ya cargado
+        item.takeChild(0)
+        kind, key = item.data(0, Qt.UserRole)
         try:
-            records = session.query(Balance).order_by(Balance.date.desc()).all()
-            
-            for rec in records:
-                row = self.table.rowCount()
-                self.table.insertRow(row)
-                
-                # Crear items con formato
-                date_item = QTableWidgetItem(rec.date.strftime("%Y-%m-%d"))
-                sales_item = QTableWidgetItem(f"₡{int(rec.total_sales):,}")
-                entries_item = QTableWidgetItem(f"₡{int(rec.total_entries):,}")
-                payments_item = QTableWidgetItem(f"₡{int(rec.total_payments):,}")
-                balance_item = QTableWidgetItem(f"₡{int(rec.balance):,}")
-                
-                # Resaltar saldo según si es positivo o negativo
-                if rec.balance >= 0:
-                    balance_item.setBackground(QColor("#E8F5E8"))  # Verde claro
-                    balance_item.setForeground(QColor("#2E7D2E"))  # Verde oscuro
-                else:
-                    balance_item.setBackground(QColor("#FFEBEE"))  # Rojo claro
-                    balance_item.setForeground(QColor("#C62828"))  # Rojo oscuro
-                
-                # Resaltar ventas altas
-                if rec.total_sales > 100000:  # Más de 100k
-                    sales_item.setBackground(QColor("#E8F5E8"))
-                    sales_item.setForeground(QColor("#2E7D2E"))
-                
-                self.table.setItem(row, 0, date_item)
-                self.table.setItem(row, 1, sales_item)
-                self.table.setItem(row, 2, entries_item)
-                self.table.setItem(row, 3, payments_item)
-                self.table.setItem(row, 4, balance_item)
-
+            # Consultas cortas sobre los totales: sesión de lectura, pero sin hilo
+            if kind == 'year':
+                # Meses del año y del anterior (para comparar) en una sola consulta
+                months = reports.read(lambda s: s.query(BalanceMonth)
+                                      .filter(BalanceMonth.year.in_([key, key - 1]))
+                                      .order_by(BalanceMonth.month.desc()).all())
+                by_month = {m.month: m for m in months}
+                for m in months:
+                    if m.year != key:
+                        continue
+                    child = QTreeWidgetItem(item)
+                    previous = by_month.get(f"{key - 1}{m.month[4:]}")
+                    self._fill_item(child, m.month, m, previous)
+                    child.setData(0, Qt.UserRole, ('month', m.month))
+                    QTreeWidgetItem(child)
+            elif kind == 'month':
+                first = datetime.strptime(key, "%Y-%m").date()
+                days = reports.read(lambda s: s.query(Balance)
+                                    .filter(within(Balance.date, month(first)))
+                                    .order_by(Balance.date.desc()).all())
+                for rec in days:
+                    child = QTreeWidgetItem(item)
+                    self._fill_item(child, rec.date.strftime("%Y-%m-%d"), rec)
+                    child.setData(0, Qt.UserRole, ('day', rec.id))
         except Exception as e:
-            print(f"❌ Error cargando historial: {e}")
+            log.error("❌ Error cargando detalle de %s: %s", key, e)
+
+    def _fill_item(self, item, label, rec, previous=None):
+        """Textos y colores de una fila (día, mes o año)"""
+        item.setText(0, label)
+        item.setText(1, f"₡{int(rec.total_sales):,}")
+        item.setText(2, f"₡{int(rec.total_entries):,}")
+        item.setText(3, f"₡{int(rec.total_payments):,}")
+        item.setText(4, f"₡{int(rec.balance):,}")
+        for col in range(1, 6):
+            item.setTextAlignment(col, Qt.AlignRight | Qt.AlignVCenter)
+
+        # Resaltar saldo según si es positivo o negativo
+        if rec.balance >= 0:
+            item.setBackground(4, QColor("#E8F5E8"))  # Verde claro
+            item.setForeground(4, QColor("#2E7D2E"))  # Verde oscuro
+        else:
+            item.setBackground(4, QColor("#FFEBEE"))  # Rojo claro
+            item.setForeground(4, QColor("#C62828"))  # Rojo oscuro
+
+        # Resaltar ventas altas (sólo días: los totales de mes y año siempre lo serían)
+        if isinstance(rec, Balance) and rec.total_sales > 100000:  # Más de 100k
+            item.setBackground(1, QColor("#E8F5E8"))
+            item.setForeground(1, QColor("#2E7D2E"))
+
+        # Comparación con el mismo período del año anterior
+        if previous is not None and previous.total_sales:
+            change = (rec.total_sales - previous.total_sales) / previous.total_sales * 100
+            item.setText(5, f"{change:+.1f}%")
+            item.setForeground(5, QColor("#2E7D2E" if change >= 0 else "#C62828"))
+            item.setToolTip(5, f"₡{int(previous.total_sales):,} en el mismo período del año anterior")
+        else:
+            item.setText(5, "")
+            item.setToolTip(5, "")
+
+    def _refresh_totals(self, d):
+        """✅ Actualizar el año y el mes de d tras borrar un día, sin recargar el árbol
+
+        También el año y el mes siguientes: su comparación con el año anterior cambia.
+        """
+        suffix = d.strftime("-%m")
+        years = {y.year: y for y in reports.read(
+            lambda s: s.query(BalanceYear).filter(BalanceYear.year.between(d.year - 1, d.year + 1)).all())}
+        months = {m.month: m for m in reports.read(
+            lambda s: s.query(BalanceMonth).filter(
+                BalanceMonth.month.in_([f"{d.year + k}{suffix}" for k in (-1, 0, 1)])).all())}
+
+        for i in reversed(range(self.tree.topLevelItemCount())):
+            year_item = self.tree.topLevelItem(i)
+            year = year_item.data(0, Qt.UserRole)[1]
+            if year not in (d.year, d.year + 1):
+                continue
+            if year not in years:
+                self.tree.takeTopLevelItem(i)  # Año sin días
+                continue
+            self._fill_item(year_item, str(year), years[year], years.get(year - 1))
+            for j in reversed(range(year_item.childCount())):
+                month_item = year_item.child(j)
+                data = month_item.data(0, Qt.UserRole)
+                if data is None or not data[1].endswith(suffix):
+                    continue  # Hijo provisorio (año sin expandir) u otro mes
+                if data[1] not in months:
+                    year_item.takeChild(j)  # Mes sin días
+                    continue
+                self._fill_item(month_item, data[1], months[data[1]], months.get(f"{year - 1}{suffix}"))
 
     def _import_csv(self):
         """✅ Importar CSV con mejor UX y progreso"""
@@ -493,7 +591,7 @@ class BalanceTab(QWidget):
                             continue
                     
                     if not d:
-                        print(f"⚠️ Fila {row_num}: fecha inválida '{raw_date}'")
+                        log.warning("⚠️ Fila %s: fecha inválida '%s'", row_num, raw_date)
                         continue
 
                     # Función para limpiar números
@@ -509,7 +607,7 @@ class BalanceTab(QWidget):
                         p = clean_num(raw_payments)
                         b = clean_num(raw_balance)
                     except ValueError:
-                        print(f"⚠️ Fila {row_num}: valores numéricos inválidos")
+                        log.warning("⚠️ Fila %s: valores numéricos inválidos", row_num)
                         continue
 
                     # Crear registro
@@ -540,9 +638,9 @@ class BalanceTab(QWidget):
             QMessageBox.critical(self, "Error de Importación", f"Error importando CSV: {str(e)}")
 
     def _export_csv(self):
-        """✅ Exportar CSV con mejor UX"""
+        """✅ Exportar CSV con mejor UX (la lectura y escritura corren en un hilo)"""
         # Contar registros
-        count = session.query(Balance).count()
+        count = reports.read(lambda s: s.query(Balance).count())
         
         if count == 0:
             QMessageBox.information(self, "Sin Datos", "No hay registros de balance para exportar")
@@ -556,45 +654,50 @@ class BalanceTab(QWidget):
         if not path:
             return
 
-        try:
-            with open(path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f, delimiter=';')
-                writer.writerow(['Fecha', 'Ventas', 'Compras', 'Pagos', 'Saldo'])
-                
-                total_sales = total_entries = total_payments = total_balance = 0
-                
-                for rec in session.query(Balance).order_by(Balance.date.desc()).all():
-                    writer.writerow([
-                        rec.date.strftime("%Y-%m-%d"),
-                        f"{rec.total_sales:.0f}",
-                        f"{rec.total_entries:.0f}",
-                        f"{rec.total_payments:.0f}",
-                        f"{rec.balance:.0f}"
-                    ])
-                    total_sales += rec.total_sales
-                    total_entries += rec.total_entries
-                    total_payments += rec.total_payments
-                    total_balance += rec.balance
-
+        def done(result):
+            exported, total_sales, total_balance = result
             QMessageBox.information(self, "Exportación Completada", 
                                    f"✅ Exportación completada\n\n" +
                                    f"📁 Archivo: {path}\n" +
-                                   f"📊 {count:,} registros exportados\n" +
+                                   f"📊 {exported:,} registros exportados\n" +
                                    f"💰 Total ventas: ₡{total_sales:,.0f}\n" +
                                    f"📈 Balance acumulado: ₡{total_balance:,.0f}")
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error de Exportación", f"Error exportando CSV: {str(e)}")
+        reports.run('balance.exportar', self._write_csv, path, on_done=done,
+                    on_error=lambda message: QMessageBox.critical(self, "Error de Exportación",
+                                                                  f"Error exportando CSV: {message}"))
+
+    @staticmethod
+    def _write_csv(s, path):
+        """Escribir el CSV de balances; devuelve (registros, total ventas, balance acumulado)"""
+        exported = total_sales = total_balance = 0
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(['Fecha', 'Ventas', 'Compras', 'Pagos', 'Saldo'])
+
+            for rec in s.query(Balance).order_by(Balance.date.desc()).yield_per(1000):
+                writer.writerow([
+                    rec.date.strftime("%Y-%m-%d"),
+                    f"{rec.total_sales:.0f}",
+                    f"{rec.total_entries:.0f}",
+                    f"{rec.total_payments:.0f}",
+                    f"{rec.balance:.0f}"
+                ])
+                exported += 1
+                total_sales += rec.total_sales
+                total_balance += rec.balance
+        return exported, total_sales, total_balance
 
     def eventFilter(self, obj, event):
         """✅ Manejo de eventos con confirmación mejorada"""
-        if (obj is self.table and event.type() == QEvent.KeyPress and 
+        if (obj is self.tree and event.type() == QEvent.KeyPress and 
             event.key() == Qt.Key_Delete):
-            row = self.table.currentRow()
-            if row >= 0:
+            item = self.tree.currentItem()
+            data = item.data(0, Qt.UserRole) if item else None
+            if data and data[0] == 'day':
                 # Obtener información del registro
-                date_text = self.table.item(row, 0).text()
-                balance_text = self.table.item(row, 4).text()
+                date_text = item.text(0)
+                balance_text = item.text(4)
                 
                 reply = QMessageBox.question(
                     self, "Eliminar Registro de Balance", 
@@ -608,19 +711,19 @@ class BalanceTab(QWidget):
                 
                 if reply == QMessageBox.Yes:
                     try:
-                        recs = session.query(Balance).order_by(Balance.date.desc()).all()
-                        if row < len(recs):
-                            rec = recs[row]
-                            session.delete(rec)
+                        # Un solo DELETE por id y se quita sólo ese día del árbol
+                        if session.query(Balance).filter(Balance.id == data[1]).delete():
                             session.commit()
-                            self._load_history()
+                            item.parent().removeChild(item)
+                            # Los totales del mes y del año ya los corrigieron los triggers
+                            self._refresh_totals(datetime.strptime(date_text, "%Y-%m-%d").date())
                             
                             QMessageBox.information(self, "Registro Eliminado", 
                                                    "✅ Registro eliminado correctamente")
-                            print(f"✅ Registro de balance eliminado: {date_text}")
+                            log.info("✅ Registro de balance eliminado: %s", date_text)
                         
                     except Exception as e:
                         session.rollback()
                         QMessageBox.critical(self, "Error", f"Error eliminando registro: {str(e)}")
             return True
-        return super().eventFilter(obj, event)
\ No newline at end of file
+        return super().eventFilter(obj, event)
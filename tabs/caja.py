@@ -4,14 +4,21 @@ from PySide6.QtWidgets import (
     QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView, QMessageBox,
     QGroupBox, QGridLayout
 )
-from PySide6.QtCore import Qt, QEvent
+from PySide6.QtCore import Qt, QEvent, Signal
 from PySide6.QtGui import QFont
 from datetime import datetime
 from db import session
 from database_setup import Payment, Shift
 from sqlalchemy import func
+from date_ranges import shift as turno, within
+from pos_logging import get_logger
+import reports
+
+log = get_logger(__name__)
 
 class CajaTab(QWidget):
+    shiftClosed = Signal()  # Cierre guardado (main.py pide un respaldo)
+
     def __init__(self):
         super().__init__()
         self.active = False
@@ -275,90 +282,96 @@ class CajaTab(QWidget):
         self.restore_shift_state()
 
     def load_history(self):
-        """✅ Cargar historial desde la base de datos con mejor UX"""
+        """✅ Cargar historial desde la base de datos con mejor UX (en un hilo de lectura)"""
+        reports.run('caja.historial', self._history_rows,
+                    on_done=self._show_history, on_error=self._history_failed)
+
+    @staticmethod
+    def _history_rows(s):
+        """Filas del historial: se ejecuta en el pool de lectura (reports.py), no toca widgets"""
+        # Buscar turnos cerrados (que tienen fecha de fin)
+        shifts = (
+            s.query(Shift)
+            .filter(Shift.end.isnot(None))
+            .order_by(Shift.end.desc())
+            .limit(50)  # Mostrar últimos 50 cierres
+            .all()
+        )
+
+        rows = []
+        for shift in shifts:
+            # Buscar pagos a proveedores y genéricos en ese turno
+            window = turno(shift.start, shift.end)
+            prov_payments = s.query(func.coalesce(func.sum(Payment.amount), 0.0)) \
+                          .filter(
+                              Payment.is_provider == True,
+                              within(Payment.date, window)
+                          ).scalar() or 0
+            generic_payments = s.query(func.coalesce(func.sum(Payment.amount), 0.0)) \
+                             .filter(
+                                 Payment.is_provider == False,
+                                 within(Payment.date, window)
+                             ).scalar() or 0
+
+            # Parsear datos guardados en el user field (formato: caja,plata,sinpes,dataf,ventas,total)
+            user_data = shift.user.split(',') if ',' in shift.user else ['0','0','0','0','0','0']
+
+            try:
+                caja = float(user_data[0])
+                plata = float(user_data[1])
+                sinpes = float(user_data[2])
+                dataf = float(user_data[3])
+                ventas = float(user_data[4])
+                total = float(user_data[5])
+            except (ValueError, IndexError):
+                # Si hay error en los datos, usar valores por defecto
+                caja = plata = sinpes = dataf = ventas = total = 0
+
+            rows.append((shift.id, shift.end, caja, plata, sinpes, dataf, ventas, prov_payments, generic_payments, total))
+        return rows
+
+    def _show_history(self, rows):
+        """Llenar la tabla con las filas de _history_rows"""
         self.table.setRowCount(0)
-        try:
-            # Buscar turnos cerrados (que tienen fecha de fin)
-            shifts = (
-                session.query(Shift)
-                .filter(Shift.end.isnot(None))
-                .order_by(Shift.end.desc())
-                .limit(50)  # Mostrar últimos 50 cierres
-                .all()
-            )
-            
-            for shift in shifts:
-                # Calcular datos del turno
-                shift_start = shift.start
-                shift_end = shift.end
-                
-                # Buscar pagos a proveedores en ese turno
-                prov_payments = session.query(func.coalesce(func.sum(Payment.amount), 0.0)) \
-                              .filter(
-                                  Payment.is_provider == True,
-                                  Payment.date >= shift_start,
-                                  Payment.date <= shift_end
-                              ).scalar() or 0
-                
-                # Buscar pagos genéricos en ese turno
-                generic_payments = session.query(func.coalesce(func.sum(Payment.amount), 0.0)) \
-                                 .filter(
-                                     Payment.is_provider == False,
-                                     Payment.date >= shift_start,
-                                     Payment.date <= shift_end
-                                 ).scalar() or 0
-                
-                # Parsear datos guardados en el user field (formato: caja,plata,sinpes,dataf,ventas,total)
-                user_data = shift.user.split(',') if ',' in shift.user else ['0','0','0','0','0','0']
-                
-                try:
-                    caja = float(user_data[0])
-                    plata = float(user_data[1]) 
-                    sinpes = float(user_data[2])
-                    dataf = float(user_data[3])
-                    ventas = float(user_data[4])
-                    total = float(user_data[5])
-                except (ValueError, IndexError):
-                    # Si hay error en los datos, usar valores por defecto
-                    caja = plata = sinpes = dataf = ventas = total = 0
-                
-                # Insertar fila en la tabla
-                row = self.table.rowCount()
-                self.table.insertRow(row)
-                
-                # Formatear valores con colores para totales
-                vals = [
-                    shift_end.strftime("%Y-%m-%d %H:%M"),
-                    f"₡{int(caja):,}",
-                    f"₡{int(plata):,}",
-                    f"₡{int(sinpes):,}",
-                    f"₡{int(dataf):,}",
-                    f"₡{int(ventas):,}",
-                    f"₡{int(prov_payments):,}",
-                    f"₡{int(generic_payments):,}",
-                    f"₡{int(total):,}"
-                ]
-                
-                for i, v in enumerate(vals):
-                    item = QTableWidgetItem(str(v))
-                    
-                    # Resaltar columnas importantes
-                    if i == 5:  # Ventas
-                        item.setBackground(Qt.GlobalColor.green)
+        for shift_id, shift_end, caja, plata, sinpes, dataf, ventas, prov_payments, generic_payments, total in rows:
+            # Insertar fila en la tabla
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+
+            # Formatear valores con colores para totales
+            vals = [
+                shift_end.strftime("%Y-%m-%d %H:%M"),
+                f"₡{int(caja):,}",
+                f"₡{int(plata):,}",
+                f"₡{int(sinpes):,}",
+                f"₡{int(dataf):,}",
+                f"₡{int(ventas):,}",
+                f"₡{int(prov_payments):,}",
+                f"₡{int(generic_payments):,}",
+                f"₡{int(total):,}"
+            ]
+
+            for i, v in enumerate(vals):
+                item = QTableWidgetItem(str(v))
+
+                # Resaltar columnas importantes
+                if i == 5:  # Ventas
+                    item.setBackground(Qt.GlobalColor.green)
+                    item.setForeground(Qt.GlobalColor.white)
+                elif i == 8:  # Total final
+                    if total >= 0:
+                        item.setBackground(Qt.GlobalColor.blue)
                         item.setForeground(Qt.GlobalColor.white)
-                    elif i == 8:  # Total final
-                        if total >= 0:
-                            item.setBackground(Qt.GlobalColor.blue)
-                            item.setForeground(Qt.GlobalColor.white)
-                        else:
-                            item.setBackground(Qt.GlobalColor.yellow)
-                            item.setForeground(Qt.GlobalColor.black)
-                    
-                    self.table.setItem(row, i, item)
-                    
-        except Exception as e:
-            print(f"❌ Error cargando historial de caja: {e}")
-            QMessageBox.warning(self, "Error", f"Error cargando historial: {str(e)}")
+                    else:
+                        item.setBackground(Qt.GlobalColor.yellow)
+                        item.setForeground(Qt.GlobalColor.black)
+
+                self.table.setItem(row, i, item)
+            self.table.item(row, 0).setData(Qt.UserRole, shift_id)  # Identidad de la fila para borrar
+
+    def _history_failed(self, message):
+        log.error("❌ Error cargando historial de caja: %s", message)
+        QMessageBox.warning(self, "Error", f"Error cargando historial: {message}")
 
     def restore_shift_state(self):
         """✅ Restaurar estado del turno al iniciar programa"""
@@ -381,7 +394,7 @@ class CajaTab(QWidget):
                 ventas_turno = (
                     session.query(func.coalesce(func.sum(SaleItem.price * SaleItem.quantity), 0.0))
                     .join(Sale, SaleItem.sale_id == Sale.id)
-                    .filter(Sale.date >= active_shift.start.date())
+                    .filter(within(Sale.date, turno(active_shift.start)))
                     .scalar() or 0
                 )
                 
@@ -399,15 +412,15 @@ class CajaTab(QWidget):
                                        f"🕐 {turno_info}\n" +
                                        f"💰 Ventas acumuladas: ₡{ventas_turno:,.0f}")
                 
-                print(f"✅ Turno restaurado: iniciado {active_shift.start.strftime('%Y-%m-%d %H:%M:%S')}")
-                print(f"   Ventas acumuladas: ₡{ventas_turno:,.0f}")
+                log.info("✅ Turno restaurado: iniciado %s", active_shift.start.strftime('%Y-%m-%d %H:%M:%S'))
+                log.info("   Ventas acumuladas: ₡%.0f", ventas_turno)
                 
             else:
                 # No hay turno activo
-                print("ℹ️ No hay turno activo pendiente")
+                log.info("ℹ️ No hay turno activo pendiente")
                 
         except Exception as e:
-            print(f"❌ Error restaurando estado del turno: {e}")
+            log.error("❌ Error restaurando estado del turno: %s", e)
             QMessageBox.warning(self, "Error", f"Error restaurando turno: {str(e)}")
 
     def save_shift_state(self):
@@ -433,10 +446,10 @@ class CajaTab(QWidget):
                     )
                     session.add(shift_record)
                     session.commit()
-                    print(f"✅ Estado del turno guardado")
+                    log.info("✅ Estado del turno guardado")
                     
         except Exception as e:
-            print(f"❌ Error guardando estado del turno: {e}")
+            log.error("❌ Error guardando estado del turno: %s", e)
 
     def clear_active_shift(self):
         """✅ Limpiar registro de turno activo"""
@@ -444,9 +457,9 @@ class CajaTab(QWidget):
             # Eliminar cualquier turno activo sin cerrar
             session.query(Shift).filter(Shift.end.is_(None)).delete()
             session.commit()
-            print(f"✅ Registro de turno activo eliminado")
+            log.info("✅ Registro de turno activo eliminado")
         except Exception as e:
-            print(f"❌ Error limpiando turno activo: {e}")
+            log.error("❌ Error limpiando turno activo: %s", e)
 
     def eventFilter(self, obj, event):
         """✅ Manejo de eventos con confirmación mejorada"""
@@ -455,6 +468,7 @@ class CajaTab(QWidget):
             r = self.table.currentRow()
             if r >= 0:
                 # Obtener información del cierre
+                shift_id = self.table.item(r, 0).data(Qt.UserRole)
                 date_text = self.table.item(r, 0).text()
                 total_text = self.table.item(r, 8).text()
                 
@@ -470,21 +484,18 @@ class CajaTab(QWidget):
                 
                 if reply == QMessageBox.Yes:
                     try:
-                        # Buscar y eliminar el shift correspondiente de la base de datos
-                        shift_date = datetime.strptime(date_text, "%Y-%m-%d %H:%M")
-                        shift = session.query(Shift).filter_by(end=shift_date).first()
-                        
-                        if shift:
-                            session.delete(shift)
+                        # Un solo DELETE por id (la fecha mostrada no identifica el turno)
+                        if session.query(Shift).filter(Shift.id == shift_id).delete():
                             session.commit()
-                            print(f"✅ Cierre eliminado de la base de datos: {date_text}")
+                            log.info("✅ Cierre eliminado de la base de datos: %s", date_text)
                         
                         self.table.removeRow(r)
                         QMessageBox.information(self, "Cierre Eliminado", 
                                                "✅ Cierre de caja eliminado correctamente")
                         
                     except Exception as e:
-                        print(f"❌ Error eliminando cierre: {e}")
+                        session.rollback()
+                        log.error("❌ Error eliminando cierre: %s", e)
                         QMessageBox.warning(self, "Error", f"Error eliminando cierre: {str(e)}")
             return True
         return super().eventFilter(obj, event)
@@ -514,7 +525,7 @@ class CajaTab(QWidget):
                                        f"✅ Turno iniciado correctamente\n\n" +
                                        f"🕐 Hora de inicio: {self.shift_start_time.strftime('%Y-%m-%d %H:%M:%S')}")
                 
-                print(f"✅ Turno iniciado: {self.shift_start_time.strftime('%Y-%m-%d %H:%M:%S')}")
+                log.info("✅ Turno iniciado: %s", self.shift_start_time.strftime('%Y-%m-%d %H:%M:%S'))
 
     def _close(self):
         """✅ Cerrar turno con validaciones y confirmación"""
@@ -539,19 +550,18 @@ class CajaTab(QWidget):
         # Calcular totales del turno
         try:
             # Sumar sólo los pagos a proveedores del turno
+            window = turno(self.shift_start_time, shift_end_time)
             prov = session.query(func.coalesce(func.sum(Payment.amount), 0.0)) \
                           .filter(
                               Payment.is_provider == True,
-                              Payment.date >= self.shift_start_time,
-                              Payment.date <= shift_end_time
+                              within(Payment.date, window)
                           ).scalar() or 0
 
             # Sumar sólo los pagos genéricos del turno
             pagos = session.query(func.coalesce(func.sum(Payment.amount), 0.0)) \
                             .filter(
                                 Payment.is_provider == False,
-                                Payment.date >= self.shift_start_time,
-                                Payment.date <= shift_end_time
+                                within(Payment.date, window)
                             ).scalar() or 0
 
             ventas = self.turn_sales
@@ -605,7 +615,7 @@ class CajaTab(QWidget):
                 )
                 session.add(shift_record)
                 session.commit()
-                print(f"✅ Cierre de caja guardado: {ts}")
+                log.info("✅ Cierre de caja guardado: %s", ts)
                 
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Error guardando cierre: {str(e)}")
@@ -621,6 +631,7 @@ class CajaTab(QWidget):
             
             # ✅ LIMPIAR REGISTRO DE TURNO ACTIVO
             self.clear_active_shift()
+            self.shiftClosed.emit()
             
             # Recargar historial para mostrar el nuevo cierre
             self.load_history()
@@ -629,7 +640,7 @@ class CajaTab(QWidget):
                                    f"✅ Turno cerrado correctamente\n\n" +
                                    f"💰 Total final: ₡{int(total):,}")
             
-            print(f"✅ Turno cerrado correctamente")
+            log.info("✅ Turno cerrado correctamente")
             
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error cerrando turno: {str(e)}")
@@ -638,23 +649,28 @@ class CajaTab(QWidget):
         """✅ Callback cuando se realiza una venta"""
         if self.active:
             self.turn_sales += ventas
-            print(f"🛒 Venta registrada: ₡{ventas:,} (Total turno: ₡{self.turn_sales:,})")
+            log.debug("🛒 Venta registrada: ₡%s (Total turno: ₡%s)", ventas, self.turn_sales)
 
     # Cálculo directo en BD, slots vacíos
     def on_provider_payment(self, amount):
         """Se llama cuando se AGREGA un pago a proveedor"""
         if self.active:
-            print(f"🏪 Pago a proveedor registrado: ₡{amount:,}")
+            log.debug("🏪 Pago a proveedor registrado: ₡%s", amount)
 
     def on_generic_payment(self, amount):
         """Se llama cuando se AGREGA un pago genérico"""
         if self.active:
-            print(f"💳 Pago genérico registrado: ₡{amount:,}")
+            log.debug("💳 Pago genérico registrado: ₡%s", amount)
+    
+    def on_payments_imported(self, count, total):
+        """Se llama UNA vez al importar pagos genéricos desde CSV"""
+        if self.active:
+            log.debug("💳 %s pagos genéricos importados: ₡%s", count, total)
     
     def on_payment_deleted(self, amount, is_provider=True):
         """✅ Se llama cuando se ELIMINA un pago"""
         if self.active and self.shift_start_time:
             tipo = 'proveedor' if is_provider else 'genérico'
-            print(f"🔄 Pago eliminado durante turno activo: ₡{amount:,} ({tipo})")
+            log.debug("🔄 Pago eliminado durante turno activo: ₡%s (%s)", amount, tipo)
             # Los pagos se recalcularán automáticamente al cerrar porque 
             # consultamos la base de datos en tiempo real
\ No newline at end of file
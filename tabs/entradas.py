@@ -9,6 +9,12 @@ from PySide6.QtGui import QFont, QColor
 from db import session
 from database_setup import Product, Entry, Provider
 from datetime import date
+from stock_entries import apply_entries
+from query_cache import cached_query
+import queries
+from pos_logging import get_logger
+
+log = get_logger(__name__)
 
 class EntradasTab(QWidget):
     def __init__(self):
@@ -269,20 +275,25 @@ class EntradasTab(QWidget):
         # Carga inicial
         self.load_history()
 
+    @cached_query('providers')
+    def _provider_choices(self):
+        """(id, nombre) de los proveedores en orden alfabético"""
+        return tuple(session.query(Provider.id, Provider.name).order_by(Provider.name).all())
+
     def load_providers(self):
         """✅ CARGAR PROVEEDORES - MANEJA SI NO HAY NINGUNO"""
         self.combo_provider.clear()
         
         try:
-            providers = session.query(Provider).order_by(Provider.name).all()
+            providers = self._provider_choices()
             
             if not providers:
                 # Si no hay proveedores, permitir continuar sin uno
                 self.combo_provider.addItem("🚫 Sin proveedor (crear uno en Proveedores)", None)
             else:
                 self.combo_provider.addItem("📋 Seleccionar proveedor...", None)
-                for prov in providers:
-                    self.combo_provider.addItem(f"🏪 {prov.name}", prov.id)
+                for prov_id, name in providers:
+                    self.combo_provider.addItem(f"🏪 {name}", prov_id)
                     
         except Exception as e:
             # Si hay error, permitir continuar
@@ -295,19 +306,11 @@ class EntradasTab(QWidget):
             return
             
         try:
-            pattern = f"%{text}%"
-            prods = (
-                session.query(Product)
-                .filter(
-                    (Product.code.ilike(pattern)) | (Product.name.ilike(pattern))
-                )
-                .limit(10)
-                .all()
-            )
+            prods = session.execute(queries.PRODUCT_SUGGEST, queries.like(text)).all()
             suggestions = [f"{p.code} - {p.name}" for p in prods]
             self.completer_model.setStringList(suggestions)
         except Exception as e:
-            print(f"Error en autocompletado: {e}")
+            log.warning("⚠️ Error en autocompletado: %s", e)
             self.completer_model.setStringList([])
 
     def add_line(self):
@@ -324,7 +327,7 @@ class EntradasTab(QWidget):
             
         # Buscar producto en la base de datos
         try:
-            prod = session.query(Product).filter_by(code=code).first()
+            prod = session.scalars(queries.PRODUCT_BY_CODE, {'code': code}).first()
             if not prod:
                 QMessageBox.warning(self, "Producto No Encontrado", 
                                    f"No se encontró un producto con código: '{code}'")
@@ -362,9 +365,9 @@ class EntradasTab(QWidget):
             if not prod.provider_id and provider_id:
                 prod.provider_id = provider_id
                 session.commit()
-                print(f"✅ Proveedor asignado a {code}: {provider_name}")
+                log.info("✅ Proveedor asignado a %s: %s", code, provider_name)
         except Exception as e:
-            print(f"⚠️ No se pudo asignar proveedor: {e}")
+            log.warning("⚠️ No se pudo asignar proveedor: %s", e)
         
         # ===== PASO CRÍTICO: INSERTAR FILA ANTES DE CREAR ITEMS =====
         row_index = self.table.rowCount()
@@ -406,7 +409,7 @@ class EntradasTab(QWidget):
             self.table.setItem(row_index, 5, provider_item)
             
             # ✅ CONFIRMAR QUE SE INSERTÓ CORRECTAMENTE
-            print(f"✅ Producto agregado: {code} - {prod.name} (Fila {row_index})")
+            log.debug("✅ Producto agregado: %s - %s (Fila %s)", code, prod.name, row_index)
             
             # Limpiar input y mantener foco
             self.input_code.clear()
@@ -417,7 +420,7 @@ class EntradasTab(QWidget):
             
         except Exception as e:
             # Si hay error creando los items, eliminar la fila vacía
-            print(f"❌ Error creando items: {e}")
+            log.error("❌ Error creando items: %s", e)
             self.table.removeRow(row_index)
             QMessageBox.critical(self, "Error", 
                                 f"Error al agregar producto a la tabla: {str(e)}")
@@ -438,7 +441,7 @@ class EntradasTab(QWidget):
         code = code_item.text()
         
         try:
-            prod = session.query(Product).filter_by(code=code).first()
+            prod = session.scalars(queries.PRODUCT_BY_CODE, {'code': code}).first()
             if not prod:
                 return
                 
@@ -447,7 +450,7 @@ class EntradasTab(QWidget):
                 if new_name:
                     prod.name = new_name
                     session.commit()
-                    print(f"✅ Nombre actualizado: {code} -> {new_name}")
+                    log.info("✅ Nombre actualizado: %s -> %s", code, new_name)
                     
             elif col == 3:  # ✅ VALIDAR CANTIDAD
                 qty_text = item.text().strip()
@@ -470,7 +473,7 @@ class EntradasTab(QWidget):
                 prod.price = new_price
                 session.commit()
                 item.setText(f"₡{int(new_price):,}")  # Formatear correctamente
-                print(f"✅ Precio actualizado: {code} -> ₡{new_price:,.0f}")
+                log.info("✅ Precio actualizado: %s -> ₡%.0f", code, new_price)
                 
         except ValueError as e:
             # Si hay error en cantidad o precio, revertir
@@ -482,7 +485,7 @@ class EntradasTab(QWidget):
                                "Por favor ingrese un número válido")
             return
         except Exception as e:
-            print(f"❌ Error actualizando producto: {e}")
+            log.error("❌ Error actualizando producto: %s", e)
             return
         
         # ✅ Actualizar inventario en tiempo real
@@ -502,7 +505,7 @@ class EntradasTab(QWidget):
                 elif hasattr(inv_tab, 'load'):
                     inv_tab.load()
         except Exception as e:
-            print(f"⚠️ No se pudo actualizar inventario: {e}")
+            log.warning("⚠️ No se pudo actualizar inventario: %s", e)
 
     def finish(self):
         """✅ CONFIRMAR - FUNCIONA CON O SIN PROVEEDORES"""
@@ -523,10 +526,8 @@ class EntradasTab(QWidget):
             if result != QMessageBox.Yes:
                 return
             
-        entries_processed = 0
-        total_quantity = 0
-        
         try:
+            lines = []
             for r in range(self.table.rowCount()):
                 code_item = self.table.item(r, 0)
                 qty_item = self.table.item(r, 3)
@@ -534,44 +535,16 @@ class EntradasTab(QWidget):
                 if not code_item or not qty_item:
                     continue
                     
-                code = code_item.text()
-                
-                try:
-                    qty_text = qty_item.text().strip()
-                    qty = int(qty_text) if qty_text else 0
-                except (ValueError, AttributeError):
-                    continue
-                    
-                if qty <= 0:
-                    continue
-                    
-                prod = session.query(Product).filter_by(code=code).first()
-                if prod:
-                    # Actualizar stock
-                    old_stock = prod.stock
-                    prod.stock += qty
-                    
-                    # ✅ Crear entrada (con o sin proveedor)
-                    entry = Entry(
-                        provider_id=provider_id,  # Puede ser None
-                        date=date.today(),
-                        product_id=prod.id,
-                        quantity=qty
-                    )
-                    session.add(entry)
-                    
-                    # ✅ Asignar proveedor al producto si no lo tiene Y hay uno seleccionado
-                    if not prod.provider_id and provider_id:
-                        prod.provider_id = provider_id
-                    
-                    entries_processed += 1
-                    total_quantity += qty
-                    print(f"✅ Stock actualizado: {code} {old_stock} → {prod.stock} (+{qty})")
-                        
-            session.commit()
+                lines.append({'code': code_item.text(), 'quantity': qty_item.text()})
             
-            # Actualizar inventario
-            self.update_inventory_tab()
+            # ✅ Una sola transacción: stock, entradas y proveedor (ver stock_entries.py).
+            # Las filas con cantidad inválida o producto inexistente se omiten.
+            results = [r for r in apply_entries(session, lines, provider_id) if r and r['success']]
+            entries_processed = len(results)
+            total_quantity = sum(r['quantity'] for r in results)
+            for r in results:
+                log.debug("✅ Stock actualizado: %s → %s (+%s)", r['code'], r['new_stock'], r['quantity'])
+            # El inventario y el historial se actualizan con los avisos de change_feed
                 
             provider_name = self.combo_provider.currentText().replace("🏪 ", "").replace("📋 ", "")
             QMessageBox.information(self, "Entradas Procesadas", 
@@ -579,7 +552,6 @@ class EntradasTab(QWidget):
                                    f"📦 {total_quantity} unidades ingresadas\n" +
                                    f"🏪 Proveedor: {provider_name}")
             self.clear()
-            self.load_history()
             
         except Exception as e:
             session.rollback()
@@ -632,7 +604,27 @@ class EntradasTab(QWidget):
                 
         except Exception as e:
             # Si hay error cargando historial, continuar sin mostrar error molesto
-            print(f"❌ Error cargando historial: {e}")
+            log.error("❌ Error cargando historial: %s", e)
+
+    def on_entries_added(self, entries):
+        """✅ HISTORIAL EN VIVO: agregar arriba las entradas nuevas (de aquí o del servidor web)"""
+        for e in entries:
+            self.history_table.insertRow(0)
+            values = [e['date'], e['code'], e['name'], f"{e['quantity']:,}", e['provider'] or "Sin proveedor"]
+            for c, v in enumerate(values):
+                self.history_table.setItem(0, c, QTableWidgetItem(v))
+        # Mismo límite que load_history
+        while self.history_table.rowCount() > 100:
+            self.history_table.removeRow(self.history_table.rowCount() - 1)
+
+    def on_stock_changed(self, products):
+        """✅ Refrescar la columna "Stock Actual" de las líneas pendientes"""
+        stock_by_code = {p['code']: p['stock'] for p in products}
+        for r in range(self.table.rowCount()):
+            code_item = self.table.item(r, 0)
+            stock_item = self.table.item(r, 2)
+            if code_item and stock_item and code_item.text() in stock_by_code:
+                stock_item.setText(f"{int(stock_by_code[code_item.text()]):,}")
 
     def eventFilter(self, obj, event):
         """✅ Manejo de eventos del teclado"""
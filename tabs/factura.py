@@ -6,13 +6,22 @@ from PySide6.QtWidgets import (
 from PySide6.QtGui import QFont
 from PySide6.QtCore import Qt, QEvent, Signal, QTimer, QStringListModel
 from db import session
-from database_setup import Sale, SaleItem, Product, BulkProduct
+from database_setup import Sale, SaleItem
 from datetime import date
+from catalog import catalog, completions
+import queries
+from cart_journal import CartJournal
+from scanner import ScanBurstDetector, parse_scale_label
+from pos_logging import get_logger
+
+log = get_logger(__name__)
+
+COMPLETER_DELAY_MS = 80  # Pausa de escritura antes de consultar sugerencias
 
 class FacturaTab(QWidget):
     saleDone = Signal(float, float, float, float)
 
-    def __init__(self):
+    def __init__(self, name=None):
         super().__init__()
         self.setLayout(QVBoxLayout())
 
@@ -33,6 +42,11 @@ class FacturaTab(QWidget):
             """
         )
         self.layout().addWidget(self.client_indicator)
+        self._indicator_has_items = None
+
+        # ⚡ TOTAL INCREMENTAL: cada fila guarda su total numérico en la columna 4 (Qt.UserRole)
+        # y la suma se ajusta por diferencia al agregar, editar o eliminar líneas
+        self.running_total = 0
 
         # Fila de entrada limpia
         input_layout = QHBoxLayout()
@@ -70,7 +84,15 @@ class FacturaTab(QWidget):
         popup.setMinimumWidth(300)
         self.completer.setMaxVisibleItems(10)
         self.input_code.setCompleter(self.completer)
-        self.input_code.textChanged.connect(self.update_completer)
+
+        # ⚡ MODO LECTOR: las ráfagas de teclas del escáner no consultan el completer.
+        # El completer espera una pausa breve, así que un escaneo nunca llega a dispararlo.
+        self.scanner = ScanBurstDetector()
+        self._completer_timer = QTimer(self)
+        self._completer_timer.setSingleShot(True)
+        self._completer_timer.setInterval(COMPLETER_DELAY_MS)
+        self._completer_timer.timeout.connect(lambda: self.update_completer(self.input_code.text()))
+        self.input_code.textChanged.connect(self._on_text_changed)
 
         # Botón Añadir simple
         self.btn_add = QPushButton("Añadir")
@@ -246,8 +268,15 @@ class FacturaTab(QWidget):
         self.input_code.returnPressed.connect(self.on_enter_pressed)  # 🆕 Cambio aquí
         self.btn_confirm.clicked.connect(self.finish_sale)
         self.btn_cancel.clicked.connect(self.clear)
+        self.journal = None
         self.clear()  # inicializar focus
         
+        # 💾 DIARIO DEL CARRITO: recuperar lo que quedó abierto si el programa se cerró
+        if name:
+            self.setObjectName(name)
+            self.journal = CartJournal.for_lane(name)
+            self.restore_cart()
+        
         # ✅ AHORA SÍ actualizar indicador (después de que todo esté creado)
         self.update_client_indicator()
 
@@ -262,9 +291,16 @@ class FacturaTab(QWidget):
         client_name = self.objectName() or "Cliente"
         item_count = self.table.rowCount()
         
-        if item_count > 0:
+        # ⚡ Solo re-aplicar el estilo cuando cambia de vacía a con artículos (o al revés)
+        has_items = item_count > 0
+        restyle = has_items != self._indicator_has_items
+        self._indicator_has_items = has_items
+        
+        if has_items:
             total_text = self.display_total.text()
             self.client_indicator.setText(f"🛒 {client_name} - {item_count} artículos - {total_text}")
+            if not restyle:
+                return
             self.client_indicator.setStyleSheet(
                 """
                 QLabel {
@@ -280,6 +316,8 @@ class FacturaTab(QWidget):
             )
         else:
             self.client_indicator.setText(f"🛒 {client_name} - Factura vacía")
+            if not restyle:
+                return
             self.client_indicator.setStyleSheet(
                 """
                 QLabel {
@@ -294,6 +332,15 @@ class FacturaTab(QWidget):
                 """
             )
 
+    def _on_text_changed(self, text):
+        """Reprogramar el completer, salvo durante una ráfaga del lector"""
+        if self.scanner.in_burst or not text:
+            self._completer_timer.stop()
+            if not text:
+                self.completer_model.setStringList([])
+            return
+        self._completer_timer.start()
+
     def update_completer(self, text):
         if not any(c.isalpha() for c in text):
             self.completer_model.setStringList([])
@@ -302,67 +349,39 @@ class FacturaTab(QWidget):
             self.completer_model.setStringList([])
             return
         
-        suggestions = []
-        
-        # 🔥 PRIORIDAD 1: Códigos exactos primero
-        exact_products = session.query(Product).filter(Product.code.ilike(text)).limit(2).all()
-        for p in exact_products:
-            suggestions.append(f"{p.code} - {p.name}")
-        
-        exact_bulk = session.query(BulkProduct).filter(BulkProduct.code.ilike(text)).limit(2).all()
-        for p in exact_bulk:
-            suggestions.append(f"{p.code} - {p.name} (A GRANEL)")
-        
-        # 🔥 PRIORIDAD 2: Códigos parciales
-        pattern = f"{text}%"  # Solo que empiecen con el texto
-        partial_products = (
-            session.query(Product)
-            .filter(Product.code.ilike(pattern))
-            .filter(~Product.code.ilike(text))  # Excluir exactos ya agregados
-            .limit(3)
-            .all()
-        )
-        for p in partial_products:
-            suggestions.append(f"{p.code} - {p.name}")
-        
-        partial_bulk = (
-            session.query(BulkProduct)
-            .filter(BulkProduct.code.ilike(pattern))
-            .filter(~BulkProduct.code.ilike(text))  # Excluir exactos ya agregados
-            .limit(3)
-            .all()
-        )
-        for p in partial_bulk:
-            suggestions.append(f"{p.code} - {p.name} (A GRANEL)")
-        
-        # 🔥 PRIORIDAD 3: Nombres (solo si hay espacio)
-        if len(suggestions) < 8:
-            pattern = f"%{text}%"
-            name_products = (
-                session.query(Product)
-                .filter(Product.name.ilike(pattern))
-                .limit(2)
-                .all()
-            )
-            for p in name_products:
-                if f"{p.code} - {p.name}" not in suggestions:
-                    suggestions.append(f"{p.code} - {p.name}")
-        
-        self.completer_model.setStringList(suggestions[:10])  # Máximo 10 sugerencias
+        # ⚡ Motor compartido por todas las facturas: índice en memoria, sin consultas
+        self.completer_model.setStringList(completions.suggest(text))  # Máximo 10 sugerencias
 
     def on_enter_pressed(self):
         """🆕 FUNCIÓN NUEVA: Manejar Enter inteligentemente"""
         text = self.input_code.text().strip()
+        is_scan, started = self.scanner.finish(len(text))
         
         if text:
-            # Si hay texto, agregar línea
-            self.add_line()
+            self._completer_timer.stop()
+            if is_scan:
+                self._add_scanned(started)
+            else:
+                # Si hay texto, agregar línea
+                self.add_line()
         else:
             # Si está vacío, confirmar venta
             self.finish_sale()
 
+    def _add_scanned(self, started):
+        """⚡ RUTA DEL LECTOR: sin completer, búsqueda directa y latencia medida"""
+        self.completer.popup().hide()
+        self.add_line()
+        ms = self.scanner.record_scan(started)
+        log.debug("📷 Escaneo agregado en %.1f ms", ms)
+
     def eventFilter(self, obj, event):
         """✅ EVENT FILTER MEJORADO: Backspace inteligente + Eliminación por selección"""
+        if event.type() == QEvent.KeyPress and obj is self.input_code:
+            if event.text().isprintable() and event.text():
+                self.scanner.key()  # Tiempo entre teclas para detectar el lector
+            elif event.key() == Qt.Key_Backspace:
+                self.scanner.reset()
         if event.type() == QEvent.KeyPress and event.key() == Qt.Key_Backspace:
             if obj is self.input_code:
                 # 🆕 BACKSPACE EN BARRA DE BÚSQUEDA
@@ -387,12 +406,10 @@ class FacturaTab(QWidget):
         product_name = self.table.item(current_row, 1).text() if self.table.item(current_row, 1) else "Producto"
         
         # Eliminar la fila seleccionada
-        self.table.removeRow(current_row)
-        self._update_total()
-        self.update_client_indicator()
+        self._remove_line(current_row)
         
         # Feedback visual opcional
-        print(f"🗑️ Eliminado (selección): {product_name}")
+        log.debug("🗑️ Eliminado (selección): %s", product_name)
         
         # 🆕 LIMPIAR SELECCIÓN Y DEVOLVER FOCO A BARRA DE BÚSQUEDA
         self.table.clearSelection()
@@ -413,12 +430,10 @@ class FacturaTab(QWidget):
         product_name = self.table.item(last_row, 1).text() if self.table.item(last_row, 1) else "Producto"
         
         # Eliminar silenciosamente sin confirmación (para rapidez)
-        self.table.removeRow(last_row)
-        self._update_total()
-        self.update_client_indicator()
+        self._remove_line(last_row)
         
         # Feedback visual opcional (puedes comentar esta línea si quieres que sea completamente silencioso)
-        print(f"🗑️ Eliminado (último): {product_name}")
+        log.debug("🗑️ Eliminado (último): %s", product_name)
         
         return True  # Consumir el evento
 
@@ -437,45 +452,50 @@ class FacturaTab(QWidget):
         price = None
         is_bulk = False
         
+        # ⚡ PRIORIDAD 1-2: Código exacto desde el catálogo en memoria (O(1)).
+        # Un número solo se toma como producto normal; si no, puede ser un monto directo.
+        entry = catalog.lookup(text)
+        if entry is not None and entry.kind == 'product':
+            prod = entry
+        elif entry is not None and not text.isdigit():
+            bulk_prod = entry
+            is_bulk = True
+        
+        # ⚖️ ETIQUETA DE BALANZA (EAN-13 2x): PLU del producto a granel + peso o precio
+        label = parse_scale_label(text) if not prod and not bulk_prod else None
+        if label:
+            bulk_prod = catalog.lookup(label.plu)
+            if bulk_prod is not None and bulk_prod.kind == 'bulk':
+                is_bulk = True
+            else:
+                log.warning("⚖️ Etiqueta de balanza con PLU desconocido: %s", label.plu)
+                bulk_prod, label = None, None
+        
         # 🆕 BÚSQUEDA MEJORADA CON PRIORIDAD
-        if text.isdigit():
-            # Buscar por código exacto numérico
-            prod = session.query(Product).filter_by(code=text).first()
-            if not prod:
-                val = int(text)
-                if 5 <= val <= 20000 and val % 5 == 0:
-                    price = val
+        if prod or bulk_prod:
+            pass
+        elif text.isdigit():
+            val = int(text)
+            if 5 <= val <= 20000 and val % 5 == 0:
+                price = val
         else:
-            # 🔥 PRIORIDAD 1: Código exacto en productos normales
-            prod = session.query(Product).filter(Product.code.ilike(text)).first()
-            
-            # 🔥 PRIORIDAD 2: Código exacto en productos a granel
-            if not prod:
-                bulk_prod = session.query(BulkProduct).filter(BulkProduct.code.ilike(text)).first()
-                if bulk_prod:
-                    is_bulk = True
-            
             # 🔥 PRIORIDAD 3: Código parcial en productos normales
             if not prod and not bulk_prod:
-                pattern = f"%{text}%"
-                prod = session.query(Product).filter(Product.code.ilike(pattern)).first()
+                prod = session.scalars(queries.PRODUCT_CODE_LIKE, queries.like(text)).first()
             
             # 🔥 PRIORIDAD 4: Código parcial en productos a granel
             if not prod and not bulk_prod:
-                pattern = f"%{text}%"
-                bulk_prod = session.query(BulkProduct).filter(BulkProduct.code.ilike(pattern)).first()
+                bulk_prod = session.scalars(queries.BULK_CODE_LIKE, queries.like(text)).first()
                 if bulk_prod:
                     is_bulk = True
             
             # 🔥 PRIORIDAD 5: Nombre en productos normales (solo si no hay coincidencias de código)
             if not prod and not bulk_prod:
-                pattern = f"%{text}%"
-                prod = session.query(Product).filter(Product.name.ilike(pattern)).first()
+                prod = session.scalars(queries.PRODUCT_NAME_LIKE, queries.like(text)).first()
             
             # 🔥 PRIORIDAD 6: Nombre en productos a granel (último recurso)
             if not prod and not bulk_prod:
-                pattern = f"%{text}%"
-                bulk_prod = session.query(BulkProduct).filter(BulkProduct.name.ilike(pattern)).first()
+                bulk_prod = session.scalars(queries.BULK_NAME_LIKE, queries.like(text)).first()
                 if bulk_prod:
                     is_bulk = True
         
@@ -489,6 +509,10 @@ class FacturaTab(QWidget):
             code, name, price = bulk_prod.code, f"{bulk_prod.name} (kg)", int(bulk_prod.price)
             qty = 1  # Por defecto 1kg, el usuario puede cambiar a 0.5, 2.3, etc.
             is_bulk = True
+            if label and label.mode == 'weight':
+                qty = label.value / 1000  # gramos -> kg
+            elif label and price:
+                qty = round(label.value / price, 3)  # kg equivalentes al precio impreso
         elif price is not None:
             # Monto directo
             code, name, qty = '', 'Monto', 1
@@ -496,12 +520,30 @@ class FacturaTab(QWidget):
             # Producto no reconocido
             code, name, price, qty = text, 'Producto no reconocido', 0, 1
         
-        total = qty * (price or 0)
+        if label and label.mode == 'price':
+            total = label.value  # La balanza ya cobró: se respeta el precio impreso
+        elif label:
+            # Peso exacto de la balanza: sin el recargo del redondeo de cantidades escritas a mano
+            total = round(qty * price)
+        else:
+            total = self._compute_line_total(qty, price or 0)
+        
+        values = [code, name, str(price or 0), str(qty)]
+        self._append_row(values, total)
+        if self.journal:
+            self.journal.append('add', row=values + [total])
         
-        # 🆕 INSERTAR FILA CON FORMATO CORRECTO
+        self._update_total()
+        self.input_code.clear()
+        self.input_code.setFocus()
+
+    def _append_row(self, values, total):
+        """🆕 INSERTAR FILA CON FORMATO CORRECTO (código, nombre, precio, cantidad) + total"""
+        # Señales bloqueadas: cada setItem dispararía _on_cell_changed sobre una fila incompleta
         r = self.table.rowCount()
+        self.table.blockSignals(True)
         self.table.insertRow(r)
-        for i, v in enumerate([code, name, str(price or 0), str(qty), f"₡{total:,}"]):
+        for i, v in enumerate(values + [f"₡{total:,}"]):
             item = QTableWidgetItem(v)
             item.setFont(self.table_font)  # ✅ FUENTE CORRECTA DESDE EL INICIO
             
@@ -513,18 +555,17 @@ class FacturaTab(QWidget):
             elif i == 4:  # Total
                 item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
             
-            # ✅ PERMITIR EDITAR CANTIDAD EN PRODUCTOS A GRANEL
-            if i == 3 and is_bulk:  # Columna cantidad para productos a granel
-                item.setFlags(item.flags() | Qt.ItemIsEditable)
-            elif i in (1,2,3):  # Permitir editar nombre, precio y cantidad en productos no reconocidos
+            # ✅ PERMITIR EDITAR NOMBRE, PRECIO Y CANTIDAD (cantidad decimal en productos a granel)
+            if i in (1,2,3):
                 item.setFlags(item.flags() | Qt.ItemIsEditable)
             
+            if i == 4:
+                item.setData(Qt.UserRole, total)
+            
             self.table.setItem(r, i, item)
+        self.table.blockSignals(False)
         
-        self._update_total()
-        self.input_code.clear()
-        self.input_code.setFocus()
-        self.update_client_indicator()  # 🆕 Actualizar indicador
+        self.running_total += total
 
     def round_to_5_or_0(self, amount):
         """🆕 REDONDEO INTELIGENTE: +50 colones y redondear hacia arriba a 5 o 0"""
@@ -545,7 +586,30 @@ class FacturaTab(QWidget):
             # Redondear al próximo 0
             return int(amount) + (10 - last_digit)
 
+    def _compute_line_total(self, qty, price):
+        """Total de una línea; las cantidades decimales (a granel) llevan redondeo"""
+        total = qty * price
+        
+        # 🆕 DETECTAR SI ES PRODUCTO A GRANEL (cantidad decimal)
+        is_bulk = (qty != int(qty))  # Si la cantidad no es entera, es a granel
+        
+        if is_bulk:
+            # 🆕 APLICAR REDONDEO INTELIGENTE PARA PRODUCTOS A GRANEL
+            total = self.round_to_5_or_0(total)
+            log.debug("🔄 Producto a granel: %skg × ₡%s = ₡%s (redondeado)", qty, price, total)
+            return total
+        # Productos normales sin redondeo
+        return int(total)
+
+    def _journal_row(self, row):
+        """💾 Registrar el estado actual de una fila editada"""
+        if self.journal:
+            values = [self.table.item(row, c).text() for c in range(4)]
+            self.journal.append('set', i=row, row=values + [self._line_total(row)])
+
     def _on_cell_changed(self, row, col):
+        if col == 1:
+            self._journal_row(row)  # Nombre editado en un producto no reconocido
         # Si cambia precio(2) o cantidad(3), recalcular total fila
         if col not in (2,3):
             return
@@ -556,53 +620,49 @@ class FacturaTab(QWidget):
             return
         
         # Calcular total
-        total = qty * price
+        total = self._compute_line_total(qty, price)
         
-        # 🆕 DETECTAR SI ES PRODUCTO A GRANEL (cantidad decimal)
-        is_bulk = (qty != int(qty))  # Si la cantidad no es entera, es a granel
-        
-        if is_bulk:
-            # 🆕 APLICAR REDONDEO INTELIGENTE PARA PRODUCTOS A GRANEL
-            total = self.round_to_5_or_0(total)
-            print(f"🔄 Producto a granel: {qty}kg × ₡{price} = ₡{total} (redondeado)")
-        else:
-            # Productos normales sin redondeo
-            total = int(total)
+        # ⚡ Ajustar la suma por la diferencia con el total anterior de la fila
+        self.running_total += total - self._line_total(row)
         
         self.table.blockSignals(True)
         # ✅ CREAR ITEM CON FUENTE CORRECTA Y FORMATO
         total_item = QTableWidgetItem(f"₡{total:,}")
         total_item.setFont(self.table_font)  # 🎯 APLICAR FUENTE CORRECTA
         total_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)  # Alineación a la derecha
+        total_item.setData(Qt.UserRole, total)
         self.table.setItem(row, 4, total_item)
         self.table.blockSignals(False)
+        self._journal_row(row)
+        self._update_total()
+
+    def _line_total(self, row):
+        """Total numérico guardado en la fila (0 si la fila aún no tiene total)"""
+        item = self.table.item(row, 4)
+        value = item.data(Qt.UserRole) if item else None
+        return value or 0
+
+    def _remove_line(self, row):
+        """⚡ Quitar una fila descontando su total, sin recorrer la factura"""
+        self.running_total -= self._line_total(row)
+        self.table.removeRow(row)
+        if self.journal:
+            self.journal.append('del', i=row)
+        if self.table.rowCount() == 0:
+            self.running_total = 0  # Evita arrastrar residuos de punto flotante
+        self._update_total()
+
+    def _recalculate_total(self):
+        """Resincronizar la suma desde los totales numéricos de cada fila"""
+        self.running_total = sum(self._line_total(r) for r in range(self.table.rowCount()))
         self._update_total()
 
     def _update_total(self):
-        """✅ FUNCIÓN ARREGLADA: Suma correcta del total"""
-        total_sum = 0
-        
-        for r in range(self.table.rowCount()):
-            try:
-                # Obtener el texto de la columna total (columna 4)
-                total_text = self.table.item(r, 4).text()
-                
-                # Limpiar el texto: quitar ₡, comas y espacios
-                clean_text = total_text.replace('₡', '').replace(',', '').strip()
-                
-                # Convertir a número y sumar
-                total_sum += float(clean_text)
-                
-            except (ValueError, AttributeError, TypeError):
-                # Si hay error en alguna fila, continuar con la siguiente
-                print(f"⚠️ Error procesando fila {r}: {total_text if 'total_text' in locals() else 'N/A'}")
-                continue
-        
-        # Actualizar display del total
-        self.display_total.setText(f"₡{int(total_sum):,}")
+        """✅ MOSTRAR TOTAL: formatea una sola vez la suma incremental"""
+        self.display_total.setText(f"₡{int(self.running_total):,}")
         self.update_client_indicator()  # Actualizar indicador cuando cambie el total
         
-        print(f"💰 Total calculado: ₡{int(total_sum):,}")  # Debug
+        log.debug("💰 Total calculado: ₡%s", int(self.running_total))
 
     def finish_sale(self):
         if self.table.rowCount() == 0:
@@ -618,8 +678,8 @@ class FacturaTab(QWidget):
             qty = float(self.table.item(r, 3).text())  # 🆕 Permitir decimales para productos a granel
             
             # 🆕 BUSCAR EN PRODUCTOS NORMALES Y A GRANEL
-            prod = session.query(Product).filter_by(code=code).first() if code else None
-            bulk_prod = session.query(BulkProduct).filter_by(code=code).first() if code and not prod else None
+            prod = session.scalars(queries.PRODUCT_BY_CODE, {'code': code}).first() if code else None
+            bulk_prod = session.scalars(queries.BULK_BY_CODE, {'code': code}).first() if code and not prod else None
             
             # Determinar product_id para SaleItem
             if prod:
@@ -632,8 +692,12 @@ class FacturaTab(QWidget):
             else:
                 pid = None
             
-            session.add(SaleItem(sale=sale, product_id=pid, quantity=qty, price=price))
-            total_ventas += qty * price
+            # Se guarda lo cobrado en la fila (etiqueta de balanza, redondeo a granel):
+            # precio unitario = total / cantidad, así quantity * price da ese mismo total
+            charged = self._line_total(r) or qty * price
+            unit_price = charged / qty if qty else price
+            session.add(SaleItem(sale=sale, product_id=pid, quantity=qty, price=unit_price))
+            total_ventas += charged
         
         session.commit()
         self.saleDone.emit(total_ventas, 0.0, 0.0, total_ventas)
@@ -648,8 +712,25 @@ class FacturaTab(QWidget):
 
         self.clear()
 
+    def restore_cart(self):
+        """✅ Restaurar el carrito desde su diario al iniciar programa"""
+        try:
+            rows = self.journal.replay()
+            if not rows:
+                return
+            for row in rows:
+                self._append_row([str(v) for v in row[:4]], row[4])
+            self.journal.rewrite(rows)  # Compactar: sólo las filas vigentes
+            self._recalculate_total()  # Una suma limpia tras reproducir el diario
+            log.info("✅ Carrito restaurado en %s: %d líneas, %s",
+                     self.objectName(), len(rows), self.display_total.text())
+        except Exception as e:
+            log.error("❌ Error restaurando carrito de %s: %s", self.objectName(), e)
+
     def clear(self):
         self.table.setRowCount(0)
-        self.display_total.setText("₡0")
+        if self.journal:
+            self.journal.clear()
+        self.running_total = 0
         self.input_code.setFocus()
-        self.update_client_indicator()  # 🆕 Actualizar indicador al limpiar
\ No newline at end of file
+        self._update_total()  # 🆕 Actualizar total e indicador al limpiar
\ No newline at end of file
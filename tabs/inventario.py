@@ -11,8 +11,16 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy import func
 from db import session
 from database_setup import Product, SaleItem, Sale, Entry, Provider
+from query_cache import cached_query
+from archive import union_of
+import maintenance
+import reports
 from datetime import date, timedelta
 import csv
+import logging
+from pos_logging import get_logger
+
+log = get_logger(__name__)
 
 class InventoryTab(QWidget):
     def __init__(self):
@@ -374,28 +382,37 @@ class InventoryTab(QWidget):
         
         return query.order_by(Product.id)
 
+    @cached_query('providers', 'products')
+    def _provider_counts(self):
+        """(nombre, id, cantidad de productos) de cada proveedor, en una sola consulta"""
+        return tuple(
+            session.query(Provider.name, Provider.id, func.count(Product.id))
+                   .outerjoin(Product, Product.provider_id == Provider.id)
+                   .group_by(Provider.id)
+                   .order_by(Provider.name)
+                   .all()
+        )
+
     def debug_providers(self):
         """✅ FUNCIÓN DE DEBUG PARA VERIFICAR PROVEEDORES"""
         try:
-            total_providers = session.query(Provider).count()
-            providers = session.query(Provider).order_by(Provider.name).all()
+            providers = self._provider_counts()
             
-            print(f"\n🔍 DEBUG PROVEEDORES:")
-            print(f"📊 Total en base de datos: {total_providers}")
-            print(f"📋 Proveedores encontrados:")
+            log.debug("🔍 DEBUG PROVEEDORES:")
+            log.debug("📊 Total en base de datos: %s", len(providers))
+            log.debug("📋 Proveedores encontrados:")
             
-            for i, prov in enumerate(providers[:10], 1):  # Mostrar primeros 10
-                product_count = session.query(Product).filter_by(provider_id=prov.id).count()
-                print(f"  {i}. {prov.name} (ID: {prov.id}) - {product_count} productos")
+            for i, (name, pid, product_count) in enumerate(providers[:10], 1):  # Mostrar primeros 10
+                log.debug("  %s. %s (ID: %s) - %s productos", i, name, pid, product_count)
                 
             if len(providers) > 10:
-                print(f"  ... y {len(providers) - 10} más")
+                log.debug("  ... y %s más", len(providers) - 10)
                 
             return len(providers)
             
         except Exception as e:
             session.rollback()
-            print(f"❌ Error en debug: {e}")
+            log.error("❌ Error en debug: %s", e)
             return 0
 
     def assign_provider(self):
@@ -447,7 +464,7 @@ class InventoryTab(QWidget):
         try:
             # ✅ CARGAR TODOS LOS PROVEEDORES SIN LÍMITE
             providers = session.query(Provider).order_by(Provider.name).all()
-            print(f"📊 Cargando {len(providers)} proveedores para asignación")
+            log.debug("📊 Cargando %s proveedores para asignación", len(providers))
             
             for prov in providers:
                 # Contar productos de este proveedor
@@ -462,7 +479,7 @@ class InventoryTab(QWidget):
                 return
                 
         except Exception as e:
-            print(f"❌ Error cargando proveedores: {e}")
+            log.error("❌ Error cargando proveedores: %s", e)
             QMessageBox.critical(self, "Error", f"Error cargando proveedores: {str(e)}")
             return
         
@@ -499,7 +516,7 @@ class InventoryTab(QWidget):
                     
             except Exception as e:
                 session.rollback()
-                print(f"❌ Error asignando proveedor: {e}")
+                log.error("❌ Error asignando proveedor: %s", e)
                 QMessageBox.critical(self, "Error", f"Error asignando proveedor: {str(e)}")
 
     def delete_item(self):
@@ -613,6 +630,7 @@ class InventoryTab(QWidget):
 
             session.commit()
             progress_msg.close()
+            maintenance.mark_dirty("importación de productos")
             
             QMessageBox.information(self, "Importar", 
                                    f"Importación completada.\n{imported_count:,} productos importados.")
@@ -629,64 +647,59 @@ class InventoryTab(QWidget):
             QMessageBox.critical(self, "Error", f"Error en importación: {str(e)}")
 
     def export_csv(self):
-        """✅ EXPORTAR OPTIMIZADO"""
+        """✅ EXPORTAR OPTIMIZADO (la lectura y escritura corren en un hilo)"""
         path, _ = QFileDialog.getSaveFileName(
             self, "Exportar CSV", "inventario_completo.csv", "CSV Files (*.csv)"
         )
         if not path:
             return
         
-        try:
-            # Contar total para mostrar progreso
-            total = session.query(Product).count()
-            
-            if total > 1000:
-                reply = QMessageBox.question(self, "Exportación Grande",
-                                           f"Se exportarán {total:,} productos.\n\n" +
-                                           "Esto puede tardar varios minutos. ¿Continuar?",
-                                           QMessageBox.Yes | QMessageBox.No)
-                if reply != QMessageBox.Yes:
-                    return
-            
-            # Mostrar progreso
-            progress_msg = QMessageBox(self)
-            progress_msg.setWindowTitle("Exportando...")
-            progress_msg.setText(f"Exportando {total:,} productos...\n\nPor favor espere.")
-            progress_msg.setStandardButtons(QMessageBox.NoButton)
-            progress_msg.show()
-            
-            with open(path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f, delimiter=';')
-                writer.writerow(['Código','Nombre','Precio','Stock','Proveedor'])
-                
-                # Exportar en lotes para no saturar memoria
-                batch_size = 1000
-                offset = 0
-                
-                while True:
-                    items = (session.query(Product)
-                            .outerjoin(Provider)
-                            .offset(offset)
-                            .limit(batch_size)
-                            .all())
-                    
-                    if not items:
-                        break
-                        
-                    for p in items:
-                        provider_name = p.provider.name if p.provider else ""
-                        writer.writerow([p.code, p.name, p.price, p.stock, provider_name])
-                    
-                    offset += batch_size
-            
+        # Contar total para mostrar progreso
+        total = reports.read(lambda s: s.query(Product).count())
+        
+        if total > 1000:
+            reply = QMessageBox.question(self, "Exportación Grande",
+                                       f"Se exportarán {total:,} productos.\n\n" +
+                                       "Esto puede tardar varios minutos. ¿Continuar?",
+                                       QMessageBox.Yes | QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                return
+        
+        # Mostrar progreso
+        progress_msg = QMessageBox(self)
+        progress_msg.setWindowTitle("Exportando...")
+        progress_msg.setText(f"Exportando {total:,} productos...\n\nPor favor espere.")
+        progress_msg.setStandardButtons(QMessageBox.NoButton)
+        progress_msg.show()
+
+        def done(exported):
             progress_msg.close()
             QMessageBox.information(self, "Exportar", 
-                                   f"Exportación completada.\n{total:,} productos exportados.")
-            
-        except Exception as e:
-            if 'progress_msg' in locals():
-                progress_msg.close()
-            QMessageBox.critical(self, "Error", f"Error en exportación: {str(e)}")
+                                   f"Exportación completada.\n{exported:,} productos exportados.")
+
+        def failed(message):
+            progress_msg.close()
+            QMessageBox.critical(self, "Error", f"Error en exportación: {message}")
+
+        reports.run('inventario.exportar', self._write_csv, path, on_done=done, on_error=failed)
+
+    @staticmethod
+    def _write_csv(s, path):
+        """Escribir el CSV del inventario; devuelve la cantidad de productos"""
+        exported = 0
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(['Código','Nombre','Precio','Stock','Proveedor'])
+            
+            # Sólo columnas y de a lotes para no saturar memoria
+            rows = (s.query(Product.code, Product.name, Product.price, Product.stock, Provider.name)
+                    .outerjoin(Provider, Product.provider_id == Provider.id)
+                    .order_by(Product.id)
+                    .yield_per(1000))
+            for code, name, price, stock, provider_name in rows:
+                writer.writerow([code, name, price, stock, provider_name or ""])
+                exported += 1
+        return exported
 
     def eventFilter(self, obj, event):
         if (obj is self.table and event.type() == Qt.QEvent.KeyPress and 
@@ -701,14 +714,14 @@ class InventoryTab(QWidget):
         try:
             self.load_optimized()
         except Exception as e:
-            print(f"❌ Error en debug: {e}")
+            log.error("❌ Error en debug: %s", e)
             return 0
 
     def load_optimized(self):
         """✅ CARGA ULTRA-OPTIMIZADA CON DEBUG"""
         try:
-            # Debug de proveedores
-            provider_count = self.debug_providers()
+            # Debug de proveedores (sólo con POS_LOG_LEVEL=DEBUG: hace una consulta por proveedor)
+            provider_count = self.debug_providers() if log.isEnabledFor(logging.DEBUG) else None
             
             # Limpiar tabla
             self.table.setRowCount(0)
@@ -723,7 +736,7 @@ class InventoryTab(QWidget):
             offset = self.current_page * self.items_per_page
             items = base_query.offset(offset).limit(self.items_per_page).all()
             
-            print(f"📊 Mostrando {len(items)} productos de {total_count} totales")
+            log.debug("📊 Mostrando %s productos de %s totales", len(items), total_count)
             
             # Llenar tabla
             self.table.setRowCount(len(items))
@@ -742,12 +755,21 @@ class InventoryTab(QWidget):
             # Actualizar controles de paginación
             self.update_pagination_controls(total_count)
             
-            print(f"✅ Inventario cargado: {len(items)} productos, {provider_count} proveedores disponibles")
+            log.debug("✅ Inventario cargado: %s productos, %s proveedores disponibles", len(items), provider_count)
             
         except Exception as e:
-            print(f"❌ Error cargando inventario: {e}")
+            log.error("❌ Error cargando inventario: %s", e)
             QMessageBox.warning(self, "Error", f"Error cargando inventario: {str(e)}")
 
+    def update_stock(self, products):
+        """✅ STOCK EN VIVO: actualizar sólo las filas visibles que cambiaron (change_feed)"""
+        stock_by_code = {p['code']: p['stock'] for p in products}
+        for r in range(self.table.rowCount()):
+            code_item = self.table.item(r, 0)
+            stock_item = self.table.item(r, 3)
+            if code_item and stock_item and code_item.text() in stock_by_code:
+                stock_item.setText(f"{stock_by_code[code_item.text()]:,}")
+
     def verify_database_connection(self):
         """✅ VERIFICAR CONEXIÓN Y DATOS"""
         try:
@@ -779,11 +801,11 @@ class InventoryTab(QWidget):
             QMessageBox.information(self, "Estado de la Base de Datos", info_text)
             
             # Debug en consola
-            print(f"\n{info_text}")
+            log.info("%s", info_text)
             
         except Exception as e:
             error_msg = f"❌ Error verificando base de datos: {str(e)}"
-            print(error_msg)
+            log.error("%s", error_msg)
             QMessageBox.critical(self, "Error de Base de Datos", error_msg)
 
     def update_pagination_controls(self, total_count):
@@ -824,7 +846,7 @@ class InventoryTab(QWidget):
             # Primero verificar si hay productos obsoletos SIN eliminar
             cutoff = date.today() - timedelta(days=120)  # 4 meses
             
-            print(f"🔍 Verificando productos obsoletos desde: {cutoff}")
+            log.debug("🔍 Verificando productos obsoletos desde: %s", cutoff)
             
             # Contar productos obsoletos primero (más eficiente)
             obsolete_count = self.count_obsolete_products(cutoff)
@@ -876,19 +898,25 @@ class InventoryTab(QWidget):
             if 'progress_msg' in locals():
                 progress_msg.close()
             error_msg = f"Error en limpieza: {str(e)}"
-            print(f"❌ {error_msg}")
+            log.error("❌ %s", error_msg)
             QMessageBox.critical(self, "Error", error_msg)
 
+    def _products_sold_since(self, cutoff_date):
+        """Productos con ventas desde cutoff_date, también en las ventas archivadas (archive.py)"""
+        sales = union_of(Sale.__table__)
+        items = union_of(SaleItem.__table__)
+        return (
+            session.query(Product.id.label('id'))
+                   .join(items, Product.id == items.c.product_id)
+                   .join(sales, items.c.sale_id == sales.c.id)
+                   .filter(sales.c.date >= cutoff_date)
+        )
+
     def count_obsolete_products(self, cutoff_date):
         """✅ CONTAR PRODUCTOS OBSOLETOS SIN CARGARLOS"""
         try:
             # Query más eficiente usando subconsultas
-            subquery_sales = (
-                session.query(Product.id)
-                       .join(SaleItem, Product.id == SaleItem.product_id)
-                       .join(Sale, SaleItem.sale_id == Sale.id)
-                       .filter(Sale.date >= cutoff_date)
-            )
+            subquery_sales = self._products_sold_since(cutoff_date)
             
             subquery_entries = (
                 session.query(Product.id)
@@ -906,11 +934,11 @@ class InventoryTab(QWidget):
                        .count()
             )
             
-            print(f"📊 Productos obsoletos encontrados: {obsolete_count}")
+            log.debug("📊 Productos obsoletos encontrados: %s", obsolete_count)
             return obsolete_count
             
         except Exception as e:
-            print(f"❌ Error contando obsoletos: {e}")
+            log.error("❌ Error contando obsoletos: %s", e)
             return 0
 
     def cleanup_old_products_efficient(self, cutoff_date):
@@ -919,12 +947,7 @@ class InventoryTab(QWidget):
             deleted_count = 0
             
             # Obtener IDs de productos obsoletos en una sola query
-            subquery_sales = (
-                session.query(Product.id)
-                       .join(SaleItem, Product.id == SaleItem.product_id)
-                       .join(Sale, SaleItem.sale_id == Sale.id)
-                       .filter(Sale.date >= cutoff_date)
-            )
+            subquery_sales = self._products_sold_since(cutoff_date)
             
             subquery_entries = (
                 session.query(Product.id)
@@ -957,17 +980,19 @@ class InventoryTab(QWidget):
                 session.commit()  # Commit después de cada lote
                 
                 deleted_count += len(ids_to_delete)
-                print(f"🗑️ Eliminados {len(ids_to_delete)} productos, total: {deleted_count}")
+                log.info("🗑️ Eliminados %s productos, total: %s", len(ids_to_delete), deleted_count)
                 
                 # Pequeña pausa para no saturar la UI
                 self.repaint()
             
-            print(f"✅ Limpieza completada: {deleted_count} productos eliminados")
+            log.info("✅ Limpieza completada: %s productos eliminados", deleted_count)
+            if deleted_count:
+                maintenance.mark_dirty("limpieza de productos obsoletos")
             return deleted_count
             
         except Exception as e:
             session.rollback()
-            print(f"❌ Error en limpieza eficiente: {e}")
+            log.error("❌ Error en limpieza eficiente: %s", e)
             raise e
 
     def cleanup_old_products(self):
@@ -1026,19 +1051,19 @@ class InventoryTab(QWidget):
         try:
             # ✅ QUITAR LÍMITE - CARGAR TODOS LOS PROVEEDORES
             providers = session.query(Provider).order_by(Provider.name).all()
-            print(f"📊 Cargando {len(providers)} proveedores en el diálogo")
+            log.debug("📊 Cargando %s proveedores en el diálogo", len(providers))
             
             for prov in providers:
                 inp_provider.addItem(f"🏪 {prov.name}", prov.id)
                 
             if len(providers) == 0:
-                print("⚠️ No se encontraron proveedores en la base de datos")
+                log.warning("⚠️ No se encontraron proveedores en la base de datos")
                 QMessageBox.information(dlg, "Sin Proveedores", 
                                        "No hay proveedores registrados.\n\n" +
                                        "Vaya a la pestaña de Proveedores para crear uno.")
                 
         except Exception as e:
-            print(f"❌ Error cargando proveedores: {e}")
+            log.error("❌ Error cargando proveedores: %s", e)
             QMessageBox.warning(dlg, "Error", f"Error cargando proveedores: {str(e)}")
         
         # Seleccionar proveedor actual
@@ -1046,7 +1071,7 @@ class InventoryTab(QWidget):
             for i in range(inp_provider.count()):
                 if inp_provider.itemData(i) == prod.provider.id:
                     inp_provider.setCurrentIndex(i)
-                    print(f"✅ Proveedor seleccionado: {prod.provider.name}")
+                    log.info("✅ Proveedor seleccionado: %s", prod.provider.name)
                     break
         
         form.addRow("🏷️ Nombre:", inp_name)
@@ -9,14 +9,19 @@ from PySide6.QtCore import Qt, QEvent, Signal
 from PySide6.QtGui import QFont
 from db import session
 from database_setup import Payment
+from payment_import import read_payments_csv, replace_payments
 from datetime import datetime
 import csv
-import re
-import unicodedata
+from pos_logging import get_logger
+import reports
+
+log = get_logger(__name__)
 
 class PagosTab(QWidget):
     # Señal emitida tras registrar un pago genérico: monto
     paymentDone = Signal(float)
+    # Señal emitida una vez por importación CSV: cantidad de pagos, monto total
+    paymentsImported = Signal(int, float)
 
     def __init__(self):
         super().__init__()
@@ -201,6 +206,7 @@ class PagosTab(QWidget):
                 
                 # Fecha y hora formateada
                 date_item = QTableWidgetItem(p.date.strftime("%Y-%m-%d %H:%M"))
+                date_item.setData(Qt.UserRole, p.id)  # Identidad de la fila para borrar
                 concept_item = QTableWidgetItem(p.category or "Sin concepto")
                 amount_item = QTableWidgetItem(f"₡{int(p.amount):,}")
                 
@@ -209,7 +215,7 @@ class PagosTab(QWidget):
                 self.table.setItem(r, 2, amount_item)
                 
         except Exception as e:
-            print(f"❌ Error cargando pagos: {e}")
+            log.error("❌ Error cargando pagos: %s", e)
 
     def open_dialog(self):
         """✅ DIÁLOGO MEJORADO PARA AGREGAR PAGOS"""
@@ -303,6 +309,7 @@ class PagosTab(QWidget):
             return
             
         # Obtener datos del pago seleccionado
+        payment_id = self.table.item(r, 0).data(Qt.UserRole)
         date_str = self.table.item(r, 0).text()
         concept = self.table.item(r, 1).text()
         amount_str = self.table.item(r, 2).text()
@@ -322,30 +329,22 @@ class PagosTab(QWidget):
             return
             
         try:
-            # Obtener el pago desde la base de datos
-            payments = (session.query(Payment)
-                       .filter(Payment.is_provider == 0)
-                       .order_by(Payment.date.desc())
-                       .all())
-            
-            if r < len(payments):
-                pay = payments[r]
-                payment_info = f"{pay.category} - ₡{int(pay.amount):,}"
-                
-                session.delete(pay)
-                session.commit()
-                
-                print(f"✅ Pago eliminado: {payment_info}")
+            # Un solo DELETE por id y se quita sólo esa fila (sin recargar la tabla)
+            deleted = session.query(Payment).filter(Payment.id == payment_id).delete()
+            session.commit()
+
+            if deleted:
+                self.table.removeRow(r)
+                log.info("✅ Pago eliminado: %s - %s", concept, amount_str)
                 QMessageBox.information(self, "Pago Eliminado", 
                                        "✅ Pago eliminado correctamente")
-                self.refresh()
             else:
                 QMessageBox.warning(self, "Error", "No se pudo encontrar el pago seleccionado")
-                self.refresh()
+                self.refresh()  # La tabla no coincidía con la base
                 
         except Exception as e:
             session.rollback()
-            print(f"❌ Error eliminando pago: {e}")
+            log.error("❌ Error eliminando pago: %s", e)
             QMessageBox.critical(self, "Error", f"Error eliminando pago: {str(e)}")
             self.refresh()
 
@@ -364,6 +363,7 @@ class PagosTab(QWidget):
                                "2024-01-15 10:30;Servicios públicos;25000\n\n" +
                                "📝 Formatos de fecha soportados:\n" +
                                "• YYYY-MM-DD HH:MM:SS\n" +
+                               "• YYYY-MM-DD HH:MM\n" +
                                "• YYYY-MM-DD\n" +
                                "• DD/MM/YYYY HH:MM:SS\n" +
                                "• DD/MM/YYYY\n" +
@@ -386,115 +386,36 @@ class PagosTab(QWidget):
         progress_msg.show()
         
         try:
-            # Eliminar pagos existentes
-            session.query(Payment).filter(Payment.is_provider == 0).delete()
-            session.commit()
-
-            new_amounts = []
-            imported_count = 0
-            
-            with open(path, mode='r', encoding='utf-8-sig', newline='') as f:
-                # Detectar delimitador automáticamente
-                sample = f.read(8192)
-                f.seek(0)
-                delims = [';', ',', '\t']
-                counts = {d: sample.count(d) for d in delims}
-                delim = max(counts, key=counts.get)
-                
-                reader = csv.reader(f, delimiter=delim)
-                try:
-                    headers = next(reader)
-                except StopIteration:
-                    progress_msg.close()
-                    QMessageBox.warning(self, "Archivo Vacío", "El archivo CSV está vacío")
-                    return
-                
-                # Detectar columnas automáticamente
-                norm = [unicodedata.normalize('NFKD', h).encode('ascii','ignore').decode('ascii').lower() 
-                       for h in headers]
-                
-                def idx_match(keys):
-                    for i, h in enumerate(norm):
-                        for k in keys:
-                            if k in h:
-                                return i
-                    return None
-                
-                date_i = idx_match(['fecha','date']) or 0
-                concept_i = idx_match(['concepto','desc','descr','concept']) or 1
-                amt_i = idx_match(['monto','amount','amt']) or 2
-
-                for row_num, row in enumerate(reader, 2):  # Empezar en fila 2
-                    if len(row) <= max(date_i, concept_i, amt_i):
-                        continue
-                        
-                    raw_date = row[date_i].strip()
-                    concept = row[concept_i].strip()
-                    raw_amt = row[amt_i]
-                    
-                    # Parsear fecha
-                    dt = None
-                    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d/%m/%Y %H:%M:%S", 
-                               "%d/%m/%Y", "%d/%m/%y"): 
-                        try:
-                            dt = datetime.strptime(raw_date, fmt)
-                            break
-                        except ValueError:
-                            continue
-                    
-                    if not dt:
-                        print(f"⚠️ Fila {row_num}: fecha inválida '{raw_date}'")
-                        continue
-                        
-                    if not concept:
-                        print(f"⚠️ Fila {row_num}: concepto vacío")
-                        continue
-                    
-                    # Limpiar monto
-                    clean = re.sub(r"[^0-9\.,]", "", raw_amt)
-                    if clean.count(',') > 0 and clean.count('.') > 1:
-                        clean = clean.replace('.', '')
-                    value = clean.replace(',', '.')
-                    
-                    try:
-                        amt = float(value)
-                        if amt <= 0:
-                            continue
-                    except ValueError:
-                        print(f"⚠️ Fila {row_num}: monto inválido '{raw_amt}'")
-                        continue
-                    
-                    # Crear pago
-                    pay = Payment(date=dt, amount=amt, category=concept, is_provider=0)
-                    session.add(pay)
-                    new_amounts.append(amt)
-                    imported_count += 1
-
-            session.commit()
+            # ✅ Lectura con formato de fecha detectado una vez e INSERT en lote (payment_import.py)
+            rows, skipped = read_payments_csv(path)
+            if not rows and not skipped:
+                progress_msg.close()
+                QMessageBox.warning(self, "Archivo Vacío", "El archivo CSV está vacío")
+                return
+            imported_count, total = replace_payments(session, rows)
             progress_msg.close()
             
-            # Emitir señales para todos los montos importados
-            for amt in new_amounts:
-                self.paymentDone.emit(amt)
+            # Una sola señal con el resumen (no una por pago)
+            self.paymentsImported.emit(imported_count, total)
                 
             self.refresh()
             QMessageBox.information(
                 self, "Importación Completada", 
                 f"✅ Importación completada\n\n" +
                 f"📊 {imported_count:,} pagos importados\n" +
-                f"💰 Total: ₡{sum(new_amounts):,.0f}"
+                (f"⚠️ {skipped:,} filas omitidas\n" if skipped else "") +
+                f"💰 Total: ₡{total:,.0f}"
             )
             
         except Exception as e:
-            if 'progress_msg' in locals():
-                progress_msg.close()
+            progress_msg.close()
             session.rollback()
             QMessageBox.critical(self, "Error de Importación", f"Error importando CSV: {str(e)}")
 
     def export_csv(self):
-        """✅ EXPORTAR CSV CON MEJOR UX"""
+        """✅ EXPORTAR CSV CON MEJOR UX (la lectura y escritura corren en un hilo)"""
         # Contar registros
-        count = session.query(Payment).filter(Payment.is_provider == 0).count()
+        count = reports.read(lambda s: s.query(Payment).filter(Payment.is_provider == 0).count())
         
         if count == 0:
             QMessageBox.information(self, "Sin Datos", "No hay pagos generales para exportar")
@@ -516,41 +437,46 @@ class PagosTab(QWidget):
             progress_msg.setText(f"Exportando {count:,} pagos...\n\nPor favor espere.")
             progress_msg.setStandardButtons(QMessageBox.NoButton)
             progress_msg.show()
-            
-        try:
-            with open(path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f, delimiter=';')
-                writer.writerow(['Fecha', 'Concepto', 'Monto'])
-                
-                payments = session.query(Payment).filter(
-                    Payment.is_provider == 0
-                ).order_by(Payment.date.desc()).all()
-                
-                total_exported = 0
-                total_amount = 0
-                
-                for p in payments:
-                    writer.writerow([
-                        p.date.strftime("%Y-%m-%d %H:%M:%S"),
-                        p.category or "",
-                        f"{p.amount:.0f}"
-                    ])
-                    total_exported += 1
-                    total_amount += p.amount
-                    
+
+        def done(result):
+            total_exported, total_amount = result
             if progress_msg:
                 progress_msg.close()
-                
             QMessageBox.information(self, "Exportación Completada", 
                                    f"✅ Exportación completada\n\n" +
                                    f"📁 Archivo: {path}\n" +
                                    f"📊 {total_exported:,} registros exportados\n" +
                                    f"💰 Total: ₡{total_amount:,.0f}")
-            
-        except Exception as e:
+
+        def failed(message):
             if progress_msg:
                 progress_msg.close()
-            QMessageBox.critical(self, "Error de Exportación", f"Error exportando CSV: {str(e)}")
+            QMessageBox.critical(self, "Error de Exportación", f"Error exportando CSV: {message}")
+
+        reports.run('pagos.exportar', self._write_csv, path, on_done=done, on_error=failed)
+
+    @staticmethod
+    def _write_csv(s, path):
+        """Escribir el CSV de pagos generales; devuelve (registros, monto total)"""
+        total_exported = 0
+        total_amount = 0
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(['Fecha', 'Concepto', 'Monto'])
+
+            payments = s.query(Payment).filter(
+                Payment.is_provider == 0
+            ).order_by(Payment.date.desc()).yield_per(1000)
+
+            for p in payments:
+                writer.writerow([
+                    p.date.strftime("%Y-%m-%d %H:%M:%S"),
+                    p.category or "",
+                    f"{p.amount:.0f}"
+                ])
+                total_exported += 1
+                total_amount += p.amount
+        return total_exported, total_amount
 
     def eventFilter(self, obj, event):
         """✅ Manejo de eventos del teclado"""
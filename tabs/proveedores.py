@@ -9,10 +9,15 @@ from PySide6.QtCore import Qt, QEvent, Signal, QTimer
 from PySide6.QtGui import QFont
 from db import session
 from database_setup import Provider, Payment, Product
+from sqlalchemy import func
+from query_cache import cached_query
 from datetime import datetime
 import csv
 import unicodedata
 import re
+from pos_logging import get_logger
+
+log = get_logger(__name__)
 
 class ProveedoresTab(QWidget):
     providerDone = Signal(float)
@@ -561,7 +566,7 @@ class ProveedoresTab(QWidget):
             self.stats_label.setText(stats_text)
             
         except Exception as e:
-            print(f"❌ Error cargando detalles del proveedor: {e}")
+            log.error("❌ Error cargando detalles del proveedor: %s", e)
 
     def add_payment_to_selected_provider(self):
         """✅ AGREGAR PAGO AL PROVEEDOR SELECCIONADO"""
@@ -638,32 +643,32 @@ class ProveedoresTab(QWidget):
                 session.rollback()
                 QMessageBox.critical(self, "Error", f"Error registrando pago: {str(e)}")
 
+    @cached_query('providers', 'products')
+    def _provider_rows(self, search_text):
+        """(id, nombre, contacto, cantidad de productos) de los proveedores que coinciden"""
+        query = (session.query(Provider.id, Provider.name, Provider.contact, func.count(Product.id))
+                        .outerjoin(Product, Product.provider_id == Provider.id))
+        if search_text:
+            query = query.filter(
+                (Provider.name.ilike(f'%{search_text}%')) |
+                (Provider.contact.ilike(f'%{search_text}%'))
+            )
+        return tuple(query.group_by(Provider.id).order_by(Provider.name).all())
+
     def refresh_providers(self):
         """✅ CARGAR LISTA DE PROVEEDORES CON FILTRO DE BÚSQUEDA"""
         self.providers_table.setRowCount(0)
         try:
             search_text = self.search_provider.text().lower().strip()
             
-            query = session.query(Provider)
-            
-            if search_text:
-                query = query.filter(
-                    (Provider.name.ilike(f'%{search_text}%')) |
-                    (Provider.contact.ilike(f'%{search_text}%'))
-                )
-            
-            providers = query.order_by(Provider.name).all()
-            
-            for prov in providers:
-                product_count = session.query(Product).filter_by(provider_id=prov.id).count()
-                
+            for prov_id, name, contact, product_count in self._provider_rows(search_text):
                 r = self.providers_table.rowCount()
                 self.providers_table.insertRow(r)
                 
-                name_item = QTableWidgetItem(f"🏪 {prov.name}")
-                name_item.setData(Qt.UserRole, prov.id)
+                name_item = QTableWidgetItem(f"🏪 {name}")
+                name_item.setData(Qt.UserRole, prov_id)
                 
-                contact_item = QTableWidgetItem(prov.contact or "Sin contacto")
+                contact_item = QTableWidgetItem(contact or "Sin contacto")
                 products_item = QTableWidgetItem(f"{product_count:,}")
                 
                 if product_count == 0:
@@ -675,7 +680,8 @@ class ProveedoresTab(QWidget):
                 self.providers_table.setItem(r, 2, products_item)
                 
         except Exception as e:
-            print(f"❌ Error cargando proveedores: {e}")
+            session.rollback()
+            log.error("❌ Error cargando proveedores: %s", e)
 
     def create_payments_tab(self):
         """✅ PESTAÑA DE PAGOS CON BOTÓN DE EDITAR Y BÚSQUEDA"""
@@ -1059,7 +1065,7 @@ class ProveedoresTab(QWidget):
             for prod in products:
                 prod.provider_id = None
                 
-            print(f"🔧 Desasignados {len(products)} productos del proveedor {prov.name}")
+            log.info("🔧 Desasignados %s productos del proveedor %s", len(products), prov.name)
         else:
             reply = QMessageBox.question(
                 self, "Confirmar Eliminación",
@@ -1075,7 +1081,7 @@ class ProveedoresTab(QWidget):
             provider_name = prov.name
             session.delete(prov)
             session.commit()
-            print(f"✅ Proveedor eliminado: {provider_name} (ID: {provider_id})")
+            log.info("✅ Proveedor eliminado: %s (ID: %s)", provider_name, provider_id)
             
             QMessageBox.information(self, "Proveedor Eliminado", 
                                    f"✅ Proveedor '{provider_name}' eliminado correctamente")
@@ -1091,7 +1097,7 @@ class ProveedoresTab(QWidget):
             
         except Exception as e:
             session.rollback()
-            print(f"❌ Error eliminando proveedor: {e}")
+            log.error("❌ Error eliminando proveedor: %s", e)
             QMessageBox.critical(self, "Error", f"Error eliminando proveedor: {str(e)}")
             self.refresh_providers()
 
@@ -1147,7 +1153,7 @@ class ProveedoresTab(QWidget):
                 self.table.setItem(r, 2, amount_item)
                 
         except Exception as e:
-            print(f"❌ Error cargando pagos: {e}")
+            log.error("❌ Error cargando pagos: %s", e)
 
     def open_add_dialog(self):
         """✅ AGREGAR PAGO A PROVEEDOR"""
@@ -1355,7 +1361,7 @@ class ProveedoresTab(QWidget):
                     QMessageBox.critical(self, "Error", f"Error actualizando pago: {str(e)}")
                     
         except Exception as e:
-            print(f"❌ Error editando pago: {e}")
+            log.error("❌ Error editando pago: %s", e)
             QMessageBox.critical(self, "Error", f"Error editando pago: {str(e)}")
 
     def delete_payment(self):
@@ -1401,17 +1407,17 @@ class ProveedoresTab(QWidget):
                 
             session.delete(payment)
             session.commit()
+            self.table.removeRow(r)  # Sólo esa fila: la tabla no se recarga
             
-            print(f"✅ Pago eliminado: {provider_name} - ₡{payment.amount} ({date_str})")
+            log.info("✅ Pago eliminado: %s - %s (%s)", provider_name, amount_str, date_str)
             QMessageBox.information(self, "Pago Eliminado", "✅ Pago eliminado correctamente")
-            self.refresh()
             
             # Si el proveedor está seleccionado, actualizar su vista
             self.on_provider_selected()
             
         except Exception as e:
             session.rollback()
-            print(f"❌ Error eliminando pago: {e}")
+            log.error("❌ Error eliminando pago: %s", e)
             QMessageBox.critical(self, "Error", f"Error eliminando pago: {str(e)}")
             self.refresh()
 
@@ -0,0 +1,30 @@
+# conftest.py - BASE DE PRUEBA AISLADA
+"""
+db.py abre 'sqlite:///pos.db' relativo al directorio actual al importarse:
+antes de cualquier import del programa se cambia a un directorio temporal
+con un pos.db recién migrado.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_workdir = tempfile.mkdtemp(prefix='pos-tests-')
+os.chdir(_workdir)
+os.environ.setdefault('POS_CART_DIR', os.path.join(_workdir, 'carts'))
+os.environ.setdefault('POS_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')  # Pestañas de Qt sin pantalla
+
+import pos_logging  # noqa: E402
+
+# El hilo de logs escribe después de que pytest cierra su stderr capturado: usar el descriptor 2
+_stderr, sys.stderr = sys.stderr, sys.__stderr__
+pos_logging.setup()
+sys.stderr = _stderr
+
+import migrations  # noqa: E402
+
+migrations.migrate('pos.db')
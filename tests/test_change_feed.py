@@ -0,0 +1,35 @@
+import sqlite3
+
+import migrations
+from change_feed import ChangeFeed
+
+
+def _feed(path):
+    feed = ChangeFeed(path)
+    events = []
+    feed.subscribe(lambda event_id, event: events.append(event))
+    feed._open()  # Sin hilo: poll() a mano
+    return feed, events
+
+
+def test_sales_and_stock_events(tmp_path):
+    path = str(tmp_path / 'feed.db')
+    migrations.migrate(path)
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO products (code, name, price, stock) VALUES ('p1', 'Arroz', 1000, 10)")
+    feed, events = _feed(path)
+
+    with sqlite3.connect(path) as conn:
+        sale_id = conn.execute("INSERT INTO sales (date) VALUES ('2024-03-01')").lastrowid
+        conn.execute("INSERT INTO sale_items (sale_id, product_id, quantity, price) VALUES (?, 1, 2, 1000)",
+                     (sale_id,))
+        conn.execute("UPDATE products SET stock = stock - 2 WHERE id = 1")
+    feed.poll()
+
+    by_type = {e['type']: e for e in events}
+    assert by_type['sales']['sales'] == [{'id': sale_id, 'date': '2024-03-01', 'items': 1, 'total': 2000}]
+    assert by_type['stock']['products'] == [{'id': 1, 'code': 'p1', 'name': 'Arroz', 'stock': 8}]
+
+    events.clear()
+    feed.poll()  # Sin commits nuevos no se publica nada
+    assert events == []
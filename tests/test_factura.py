@@ -0,0 +1,48 @@
+import pytest
+from PySide6.QtWidgets import QApplication
+
+from database_setup import BulkProduct
+from db import session
+from scanner import ean13_check_digit
+
+PLU = '04321'
+PRICE = 1500  # ₡ por kg
+
+
+def _label(prefix, value):
+    digits = f"{prefix}{PLU}{value:05d}"
+    return digits + ean13_check_digit(digits)
+
+
+@pytest.fixture
+def factura():
+    app = QApplication.instance() or QApplication([])
+    if session.query(BulkProduct).filter_by(code=PLU).first() is None:
+        session.add(BulkProduct(code=PLU, name="Tomate", price=PRICE))
+        session.commit()
+    from tabs.factura import FacturaTab
+    tab = FacturaTab()
+    yield tab
+    tab.clear()
+    tab.deleteLater()
+    app.processEvents()
+
+
+def _scan(tab, text):
+    tab.input_code.setText(text)
+    tab.add_line()
+    row = tab.table.rowCount() - 1
+    return float(tab.table.item(row, 3).text()), tab._line_total(row)
+
+
+def test_weight_label_charges_weight_times_price(factura):
+    qty, total = _scan(factura, _label('23', 750))  # 750 g
+    assert qty == 0.75
+    assert total == 1125  # 0.75 kg × ₡1500, sin recargo
+
+
+def test_price_label_charges_printed_price(factura):
+    qty, total = _scan(factura, _label('20', 1734))  # ₡1734 impreso
+    assert qty == round(1734 / PRICE, 3)
+    assert total == 1734
+    assert factura.running_total == 1734
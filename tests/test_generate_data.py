@@ -0,0 +1,19 @@
+import sqlite3
+
+import generate_data
+
+
+def _dump(path):
+    with sqlite3.connect(path) as conn:
+        return list(conn.iterdump())
+
+
+def test_same_seed_same_db(tmp_path):
+    params = dict(seed=7, scale='small', products=300, providers=5, bulk=5, years=1, sales_per_day=20)
+    first, second = str(tmp_path / 'a.db'), str(tmp_path / 'b.db')
+    counts, _ = generate_data.generate(first, **params)
+    generate_data.generate(second, **params)
+    assert counts['products'] == 300
+    assert _dump(first) == _dump(second)
+    with sqlite3.connect(first) as conn:
+        assert conn.execute("SELECT MAX(date) FROM sales").fetchone()[0] == str(generate_data.END_DATE)
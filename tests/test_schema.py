@@ -0,0 +1,44 @@
+import sqlite3
+
+from sqlalchemy import create_engine
+
+import database_setup
+import migrations
+
+PRODUCT_TRIGGERS = {'products_stock_ins', 'products_stock_upd', 'products_stock_del'}
+
+
+def _triggers(path):
+    with sqlite3.connect(path) as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+
+
+def _changes_after_stock_update(path):
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO products (code, name, price, stock) VALUES ('t1', 'Prueba', 100, 1)")
+        conn.execute("UPDATE products SET stock = 5 WHERE code = 't1'")
+        return conn.execute("SELECT product_id, seq FROM product_changes").fetchall()
+
+
+def test_migrate_builds_fresh_db(tmp_path):
+    path = str(tmp_path / 'fresh.db')
+    assert migrations.migrate(path) == migrations.LATEST
+    assert PRODUCT_TRIGGERS <= _triggers(path)
+    assert _changes_after_stock_update(path) == [(1, 2)]
+
+
+def test_init_and_reset_fresh_db(tmp_path):
+    path = str(tmp_path / 'fresh.db')
+    database_setup.init_db(path)
+    database_setup.reset_db(path)
+    assert PRODUCT_TRIGGERS <= _triggers(path)
+
+
+def test_create_all_fresh_db(tmp_path):
+    # generate_data.py crea las tablas con create_all, sin pasar por las migraciones
+    path = str(tmp_path / 'fresh.db')
+    engine = create_engine(f'sqlite:///{path}')
+    database_setup.Base.metadata.create_all(engine)
+    engine.dispose()
+    assert PRODUCT_TRIGGERS <= _triggers(path)
+    assert _changes_after_stock_update(path) == [(1, 2)]
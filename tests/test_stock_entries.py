@@ -0,0 +1,45 @@
+from sqlalchemy import func
+
+from database_setup import Product
+from db import session
+from query_cache import cached_query
+from stock_entries import apply_entries
+
+
+@cached_query('products')
+def _total_stock():
+    return session.query(func.coalesce(func.sum(Product.stock), 0)).scalar()
+
+
+def _product(code, stock=0):
+    product = Product(code=code, name=f"Producto {code}", price=500, stock=stock)
+    session.add(product)
+    session.commit()
+    return product.id
+
+
+def test_apply_entries_invalidates_cached_products_query():
+    pid = _product('se-cache', stock=4)
+    before = _total_stock()
+    assert _total_stock() == before  # Segunda llamada servida del caché
+
+    results = apply_entries(session, [{'product_id': pid, 'quantity': 6}])
+
+    assert results[0]['success'] and results[0]['new_stock'] == 10
+    assert _total_stock() == before + 6
+
+
+def test_all_or_nothing_rejects_whole_batch():
+    good = _product('se-batch', stock=1)
+    lines = [{'product_id': good, 'quantity': 3}, {'product_id': good, 'quantity': 'x'},
+             {'code': 'no-existe', 'quantity': 1}]
+
+    results = apply_entries(session, lines, all_or_nothing=True)
+
+    assert [r['success'] for r in results] == [False, False, False]
+    assert results[0]['skipped'] and not results[1].get('skipped') and not results[2].get('skipped')
+    assert session.get(Product, good).stock == 1
+
+    # Sin all_or_nothing las líneas válidas se aplican igual (EntradasTab)
+    results = apply_entries(session, lines)
+    assert results[0]['success'] and session.get(Product, good).stock == 4
@@ -56,7 +56,7 @@ window.addEventListener("DOMContentLoaded", () => {
       scanInfo.innerHTML += js2.success
         ? `<p style="color:green">Nuevo stock: ${js2.new_stock}</p>`
         : `<p style="color:red">${js2.error}</p>`;
-      loadHistory();
+      if (!liveFeed) loadHistory();
     };
   };
 
@@ -103,18 +103,38 @@ window.addEventListener("DOMContentLoaded", () => {
 
   confirmManual.onclick = async () => {
     const rows = [...manualTable.children];
-    for (let r of rows) {
+    if (!rows.length) return;
+
+    // Todas las líneas en una sola solicitud y una sola transacción
+    const entries = rows.map(r => {
       const [idCell, , qtyCell] = r.querySelectorAll('td');
-      const form = new FormData();
-      form.append('product_id', idCell.textContent);
-      form.append('quantity',   qtyCell.textContent);
-      const res = await fetch('/entry/', { method: 'POST', body: form });
-      const js = await res.json();
-      console.log('Respuesta /entry/:', js);
+      return { product_id: idCell.textContent, quantity: qtyCell.textContent };
+    });
+    const res = await fetch('/entries/batch', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ entries })
+    });
+    const js = await res.json();
+    console.log('Respuesta /entries/batch:', js);
+
+    if (!js.results) {
+      alert(`Error: ${js.error || 'No se registraron las entradas'}`);
+      return;
     }
-    manualTable.innerHTML = '';
-    alert('Entradas registradas');
-    loadHistory();
+    // El lote se aplica completo o no se aplica: si falló, se marcan sólo las filas con errores
+    js.results.forEach((result, i) => {
+      if (result.success) {
+        rows[i].remove();
+      } else if (!result.skipped) {
+        rows[i].style.background = '#f8d7da';
+        rows[i].title = result.error;
+      }
+    });
+    alert(js.success
+      ? 'Entradas registradas'
+      : 'No se registró ninguna entrada. Corrige las filas marcadas y vuelve a confirmar.');
+    if (!liveFeed) loadHistory();
   };
 
   cancelManual.onclick = () => {
@@ -127,16 +147,48 @@ window.addEventListener("DOMContentLoaded", () => {
     const res = await fetch('/entries/');
     const list = await res.json();
     console.log('Historial:', list);
-    list.forEach(e => {
-      const tr = document.createElement('tr');
-      tr.innerHTML = `
-        <td>${e.date}</td>
-        <td>${e.code}</td>
-        <td>${e.name}</td>
-        <td>${e.quantity}</td>
-      `;
-      historyTable.append(tr);
+    list.forEach(e => historyTable.append(historyRow(e)));
+  }
+
+  function historyRow(e) {
+    const tr = document.createElement('tr');
+    tr.innerHTML = `
+      <td>${e.date}</td>
+      <td>${e.code}</td>
+      <td>${e.name}</td>
+      <td>${e.quantity}</td>
+    `;
+    return tr;
+  }
+
+  // --- CAMBIOS EN VIVO (/events) ---
+  // Entradas y stock llegan del servidor (también los de la caja): se actualiza sólo lo que cambió
+  const HISTORY_ROWS = 50;
+  let liveFeed = null;
+
+  if (window.EventSource) {
+    liveFeed = new EventSource('/events');
+
+    liveFeed.addEventListener('entries', (msg) => {
+      const { entries } = JSON.parse(msg.data);
+      entries.forEach(e => historyTable.prepend(historyRow(e)));
+      while (historyTable.children.length > HISTORY_ROWS) historyTable.lastElementChild.remove();
     });
+
+    liveFeed.addEventListener('stock', (msg) => {
+      const { products } = JSON.parse(msg.data);
+      const byId = new Map(products.map(p => [String(p.id), p]));
+      [...productSelect.options].forEach(opt => {
+        const p = byId.get(opt.value);
+        if (p) opt.text = `${p.code} - ${p.name} (Stock: ${p.stock})`;
+      });
+    });
+
+    liveFeed.onerror = () => {
+      // Un error de red reintenta solo; una respuesta de error cierra el flujo: volver a recargar
+      if (liveFeed.readyState === EventSource.CLOSED) liveFeed = null;
+      else console.warn('Avisos en vivo desconectados, reintentando…');
+    };
   }
 
   loadHistory();
@@ -0,0 +1,657 @@
+# web_server.py - SERVIDOR HTTP LOCAL PARA web/ Y templates/
+"""
+Servidor asyncio (sólo biblioteca estándar + SQLAlchemy) para que los
+teléfonos en el Wi-Fi de la tienda reciban mercadería sin tocar la caja.
+
+    python web_server.py --host 0.0.0.0 --port 8000
+
+- /web/              página de web/ (escaneo con foto, entrada manual, historial)
+- /                  formularios de templates/ (factura completa, foto de código)
+- /scan/, /update_stock/, /products/?q=, /entry/, /entries/, /entries/batch
+                     API JSON de web/script.js
+- /events            cambios de stock, entradas y ventas en vivo (Server-Sent Events)
+- /upload, /confirm, /scan, /scan/add                        formularios de templates/
+                     (/upload extrae los artículos con invoice_extract y envía
+                     cada página a la revisión apenas está lista)
+
+Las conexiones se atienden en el event loop; todo el trabajo con la base se
+hace en un ThreadPoolExecutor del mismo tamaño que el pool de conexiones
+(acotado, sin desbordes), y la lectura de imágenes en otro pool aparte.
+La base se abre en modo WAL para que las lecturas del servidor no bloqueen
+a la caja y viceversa.
+
+jinja2 es opcional: sin él las páginas de templates/ con datos responden 503.
+"""
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from email import policy
+from email.parser import BytesParser
+
+from sqlalchemy import create_engine, event, func, or_, select
+from sqlalchemy.orm import sessionmaker
+
+from database_setup import Product, Entry, Provider
+from stock_entries import apply_entries
+from barcode_decode import decode_barcodes, warm_up, DecodeUnavailable
+from change_feed import ChangeFeed
+import migrations
+from invoice_extract import ProductMatcher, extract_page, get_recognizer, iter_pages, page_items
+from pos_logging import get_logger
+
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
+
+log = get_logger("web_server")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_URL = os.environ.get('POS_DB_URL', 'sqlite:///pos.db')
+POOL_SIZE = int(os.environ.get('POS_WEB_POOL', 4))
+MAX_BODY = 20 * 1024 * 1024          # fotos de teléfono
+HEADER_TIMEOUT = 15                   # segundos para recibir los encabezados
+STATIC_DIRS = ('static', 'web')       # /static/script.js está en web/
+MATCHER_TTL = 300                     # segundos antes de releer los nombres del catálogo
+SSE_KEEPALIVE = 15                    # segundos entre comentarios para mantener viva la conexión
+FORM_TYPES = ('multipart/form-data', 'application/x-www-form-urlencoded')
+
+STATUS_TEXT = {200: 'OK', 303: 'See Other', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 413: 'Payload Too Large',
+               500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ========== HTTP ==========
+class Request:
+    """Solicitud ya leída: método, ruta, query, encabezados y cuerpo"""
+
+    def __init__(self, method, target, headers, body):
+        self.method = method
+        parsed = urllib.parse.urlsplit(target)
+        self.path = urllib.parse.unquote(parsed.path)
+        self.query = urllib.parse.parse_qs(parsed.query)
+        self.headers = headers
+        self.body = body
+        self._form = None
+
+    @property
+    def has_form(self):
+        return self.headers.get('content-type', '').startswith(FORM_TYPES)
+
+    def form(self):
+        """(campos, archivos): campos nombre -> [valores], archivos nombre -> bytes
+
+        PosWebServer.dispatch ya lo llamó en cpu_pool; aquí sólo se devuelve lo guardado.
+        """
+        if self._form is None:
+            ctype = self.headers.get('content-type', '')
+            if ctype.startswith('multipart/form-data'):
+                self._form = _parse_multipart(self.body, ctype)
+            else:
+                fields = urllib.parse.parse_qs(self.body.decode('utf-8', 'replace'), keep_blank_values=True)
+                self._form = (fields, {})
+        return self._form
+
+    def json(self):
+        try:
+            return json.loads(self.body.decode('utf-8'))
+        except ValueError:
+            raise HttpError(400, "JSON inválido")
+
+    def field(self, name, default=None):
+        values = self.form()[0].get(name)
+        return values[0] if values else default
+
+
+def _parse_multipart(body, content_type):
+    msg = BytesParser(policy=policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode('latin-1') + b"\r\n\r\n" + body)
+    fields, files = {}, {}
+    for part in msg.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if not name:
+            continue
+        payload = part.get_payload(decode=True) or b""
+        if part.get_filename() is not None:
+            files[name] = payload
+        else:
+            fields.setdefault(name, []).append(payload.decode('utf-8', 'replace'))
+    return fields, files
+
+
+class Response:
+    def __init__(self, body=b"", status=200, content_type='text/plain; charset=utf-8', headers=None):
+        self.body = body.encode('utf-8') if isinstance(body, str) else body
+        self.status = status
+        self.content_type = content_type
+        self.headers = headers or {}
+
+    def encode(self):
+        head = [f"HTTP/1.1 {self.status} {STATUS_TEXT.get(self.status, '')}",
+                f"Content-Type: {self.content_type}",
+                f"Content-Length: {len(self.body)}",
+                "Connection: close"]
+        head += [f"{k}: {v}" for k, v in self.headers.items()]
+        return ("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + self.body
+
+
+class StreamingResponse(Response):
+    """Cuerpo enviado por partes (chunked) a medida que el iterador asíncrono lo produce"""
+
+    def __init__(self, chunks, status=200, content_type='text/html; charset=utf-8', headers=None):
+        super().__init__(b"", status, content_type, dict(headers or {}, **{'Transfer-Encoding': 'chunked'}))
+        self.chunks = chunks
+
+    def encode(self):
+        head = [f"HTTP/1.1 {self.status} {STATUS_TEXT.get(self.status, '')}",
+                f"Content-Type: {self.content_type}",
+                "Connection: close"]
+        head += [f"{k}: {v}" for k, v in self.headers.items()]
+        return ("\r\n".join(head) + "\r\n\r\n").encode('latin-1')
+
+    async def write_body(self, writer):
+        try:
+            async for chunk in self.chunks:
+                data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+                if data:
+                    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            # Cliente desconectado a mitad: cerrar el generador libera sus recursos (suscripciones)
+            await self.chunks.aclose()
+
+
+def sse_message(event_id, event):
+    return f"id: {event_id}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+
+def json_response(data, status=200):
+    return Response(json.dumps(data, ensure_ascii=False, default=str), status,
+                    'application/json; charset=utf-8')
+
+
+def redirect(location):
+    return Response(b"", 303, headers={'Location': location})
+
+
+async def read_request(reader):
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HEADER_TIMEOUT)
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+        return None
+    lines = head.decode('latin-1').split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Solicitud inválida")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HttpError(400, "Content-Length inválido")
+    if length < 0:
+        raise HttpError(400, "Content-Length inválido")
+    if length > MAX_BODY:
+        raise HttpError(413, "Archivo demasiado grande")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, headers, body)
+
+
+# ========== BASE DE DATOS (se ejecuta en los hilos del pool) ==========
+def make_engine(url=DB_URL, pool_size=POOL_SIZE):
+    """Engine con pool acotado y WAL para convivir con la caja"""
+    engine = create_engine(url, pool_size=pool_size, max_overflow=0, pool_timeout=30,
+                           connect_args={'check_same_thread': False, 'timeout': 15})
+
+    @event.listens_for(engine, 'connect')
+    def _sqlite_pragmas(dbapi_conn, record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA busy_timeout=15000")
+        cur.close()
+
+    return engine
+
+
+def _product_dict(p):
+    return {'id': p.id, 'code': p.code, 'name': p.name, 'stock': p.stock, 'price': p.price}
+
+
+def _search_products(s, q, limit=20):
+    stmt = select(Product).order_by(Product.name).limit(limit)
+    if q:
+        stmt = stmt.where(or_(Product.code.startswith(q), Product.name.ilike(f"%{q}%")))
+    return [_product_dict(p) for p in s.scalars(stmt)]
+
+
+def _products_by_code(s, codes):
+    found = s.scalars(select(Product).where(Product.code.in_(codes))).all()
+    return {p.code: _product_dict(p) for p in found}
+
+
+def _confirm_invoice(s, rows):
+    """Aplicar las filas revisadas de una factura: (cantidad, nombre, código)"""
+    # Las filas sin código reconocido se buscan por nombre exacto, en una sola consulta
+    names = [name for _, name, code in rows if name and not code]
+    by_name = dict(s.execute(select(Product.name, Product.id).where(Product.name.in_(names))).all()) if names else {}
+    lines = [{'code': code, 'quantity': qty} if code else {'product_id': by_name.get(name), 'quantity': qty}
+             for qty, name, code in rows]
+    return apply_entries(s, lines)
+
+
+def _catalog_signature(s):
+    return tuple(s.execute(select(func.count(Product.id), func.max(Product.id))).one())
+
+
+def _catalog_names(s):
+    return s.execute(select(Product.id, Product.code, Product.name)).all()
+
+
+def _recent_entries(s, limit=50):
+    rows = s.execute(
+        select(Entry.date, Product.code, Product.name, Entry.quantity)
+        .join(Product, Entry.product_id == Product.id)
+        .order_by(Entry.id.desc()).limit(limit)
+    )
+    return [{'date': r.date.isoformat(), 'code': r.code, 'name': r.name, 'quantity': r.quantity}
+            for r in rows]
+
+
+def _provider_exists(s, provider_id):
+    return s.get(Provider, provider_id) is not None
+
+
+def _positive_int(value, field):
+    try:
+        n = int(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f"{field} inválido")
+    if n <= 0:
+        raise HttpError(400, f"{field} debe ser mayor que cero")
+    return n
+
+
+# ========== SERVIDOR ==========
+class PosWebServer:
+    """✅ SERVIDOR LOCAL: API de web/script.js y formularios de templates/"""
+
+    def __init__(self, host='0.0.0.0', port=8000, db_url=DB_URL, pool_size=POOL_SIZE):
+        self.host = host
+        self.port = port
+        self.engine = make_engine(db_url, pool_size)
+        self.Session = sessionmaker(bind=self.engine)
+        # Un hilo por conexión del pool: ninguna tarea espera una conexión libre
+        self.db_pool = ThreadPoolExecutor(pool_size, thread_name_prefix="pos-web-db")
+        self.cpu_pool = ThreadPoolExecutor(2, thread_name_prefix="pos-web-img")
+        self.templates = None
+        if jinja2 is not None:
+            # Modo async: review.html puede recorrer los artículos mientras se extraen
+            self.templates = jinja2.Environment(
+                loader=jinja2.FileSystemLoader(os.path.join(BASE_DIR, 'templates')),
+                autoescape=True, enable_async=True)
+        self.recognizer = get_recognizer()
+        self.feed = None
+        if db_url.startswith('sqlite:///') and db_url != 'sqlite:///:memory:':
+            path = db_url[len('sqlite:///'):]
+            migrations.migrate(path)  # product_changes, que lee el feed; si ya está al día es una lectura
+            self.feed = ChangeFeed(path)
+        self.matcher = None
+        self.matcher_signature = None
+        self.matcher_loaded = 0
+        self.server = None
+        self.routes = {
+            ('GET', '/'): self.index,
+            ('GET', '/web'): self.web_index,
+            ('GET', '/web/'): self.web_index,
+            ('POST', '/scan/'): self.api_scan,
+            ('POST', '/update_stock/'): self.api_entry,
+            ('POST', '/entry/'): self.api_entry,
+            ('POST', '/entries/batch'): self.api_entries_batch,
+            ('GET', '/products/'): self.api_products,
+            ('GET', '/entries/'): self.api_entries,
+            ('GET', '/events'): self.events,
+            ('POST', '/upload'): self.upload,
+            ('POST', '/confirm'): self.confirm,
+            ('POST', '/scan'): self.scan_form,
+            ('POST', '/scan/add'): self.scan_add,
+        }
+
+    # ---------- infraestructura ----------
+    async def db(self, fn, *args):
+        """Ejecutar fn(session, *args) en el pool de la base"""
+        def work():
+            with self.Session() as s:
+                return fn(s, *args)
+        return await asyncio.get_running_loop().run_in_executor(self.db_pool, work)
+
+    async def decode(self, data):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.cpu_pool, decode_barcodes, data)
+        except DecodeUnavailable as e:
+            raise HttpError(503, str(e))
+        except Exception as e:
+            log.warning("⚠️ No se pudo leer la imagen: %s", e)
+            raise HttpError(400, "No se pudo leer la imagen")
+
+    def _template(self, name):
+        if self.templates is None:
+            raise HttpError(503, "Instale jinja2 para usar esta página")
+        return self.templates.get_template(name)
+
+    async def render(self, name, **context):
+        return Response(await self._template(name).render_async(**context), 200,
+                        'text/html; charset=utf-8')
+
+    def stream(self, name, **context):
+        """Enviar la página a medida que la plantilla consume sus iteradores asíncronos"""
+        return StreamingResponse(self._template(name).generate_async(**context))
+
+    async def product_matcher(self):
+        """Índice de nombres del catálogo; se reconstruye si cambió la tabla o venció"""
+        signature = await self.db(_catalog_signature)
+        if (self.matcher is None or signature != self.matcher_signature
+                or time.monotonic() - self.matcher_loaded > MATCHER_TTL):
+            rows = await self.db(_catalog_names)
+            loop = asyncio.get_running_loop()
+            self.matcher = await loop.run_in_executor(self.cpu_pool, ProductMatcher, rows)
+            self.matcher_signature = signature
+            self.matcher_loaded = time.monotonic()
+            log.debug("📚 Índice de nombres para facturas: %d productos", len(self.matcher))
+        return self.matcher
+
+    async def handle(self, reader, writer):
+        request = None
+        try:
+            request = await read_request(reader)
+            if request is None:
+                writer.close()
+                return
+            response = await self.dispatch(request)
+        except HttpError as e:
+            response = json_response({'success': False, 'error': str(e)}, e.status)
+        except Exception as e:
+            log.error("❌ Error atendiendo %s: %s", request.path if request else "?", e)
+            response = json_response({'success': False, 'error': "Error interno"}, 500)
+        try:
+            writer.write(response.encode())
+            await writer.drain()
+            if isinstance(response, StreamingResponse):
+                await response.write_body(writer)
+        except ConnectionError:
+            pass
+        except Exception as e:
+            # Los encabezados ya salieron: sólo queda cortar la respuesta
+            log.error("❌ Error enviando %s: %s", request.path, e)
+        finally:
+            writer.close()
+        if request is not None:
+            log.debug("🌐 %s %s -> %d", request.method, request.path, response.status)
+
+    async def dispatch(self, request):
+        handler = self.routes.get((request.method, request.path))
+        if handler is not None:
+            if request.body and request.has_form:
+                # Separar un multipart de hasta MAX_BODY lleva tiempo: fuera del event loop
+                await asyncio.get_running_loop().run_in_executor(self.cpu_pool, request.form)
+            return await handler(request)
+        if request.method == 'GET' and (request.path.startswith('/static/') or request.path.startswith('/web/')):
+            return self.static_file(request.path)
+        if any(path == request.path for _, path in self.routes):
+            raise HttpError(405, "Método no permitido")
+        raise HttpError(404, "No encontrado")
+
+    def static_file(self, path):
+        prefix, _, name = path.lstrip('/').partition('/')
+        name = os.path.normpath(name)
+        if name.startswith(('..', '/')) or os.path.isabs(name):
+            raise HttpError(404, "No encontrado")
+        for directory in (STATIC_DIRS if prefix == 'static' else ('web',)):
+            full = os.path.join(BASE_DIR, directory, name)
+            if os.path.isfile(full):
+                with open(full, 'rb') as f:
+                    data = f.read()
+                ctype = mimetypes.guess_type(full)[0] or 'application/octet-stream'
+                if ctype.startswith('text/') or ctype.endswith('javascript'):
+                    ctype += '; charset=utf-8'
+                return Response(data, 200, ctype)
+        raise HttpError(404, "No encontrado")
+
+    # ---------- páginas ----------
+    async def index(self, request):
+        if self.templates is None:
+            # index.html no usa variables: se puede servir tal cual
+            with open(os.path.join(BASE_DIR, 'templates', 'index.html'), 'rb') as f:
+                return Response(f.read(), 200, 'text/html; charset=utf-8')
+        return await self.render('index.html')
+
+    async def web_index(self, request):
+        return self.static_file('/web/index.html')
+
+    # ---------- API JSON (web/script.js) ----------
+    async def api_scan(self, request):
+        data = request.form()[1].get('file')
+        if not data:
+            raise HttpError(400, "Falta la imagen")
+        codes = await self.decode(data)
+        if not codes:
+            return json_response({'code': None, 'found': False, 'error': 'No se detectó código'})
+        products = await self.db(_products_by_code, codes)
+        for code in codes:
+            if code in products:
+                return json_response({'code': code, 'found': True, 'product': products[code]})
+        return json_response({'code': codes[0], 'found': False, 'error': 'Producto no existe'})
+
+    async def api_entry(self, request):
+        product_id = _positive_int(request.field('product_id'), "Producto")
+        qty = _positive_int(request.field('quantity'), "Cantidad")
+        result = (await self.db(apply_entries, [{'product_id': product_id, 'quantity': qty}]))[0]
+        if not result['success']:
+            return json_response(result, 404)
+        return json_response(result)
+
+    async def api_entries_batch(self, request):
+        """Todas las líneas en una sola transacción: {"entries": [{"product_id", "quantity"}, ...]}"""
+        payload = request.json()
+        lines = payload.get('entries') if isinstance(payload, dict) else payload
+        if not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines):
+            raise HttpError(400, "Se esperaba una lista de entradas")
+        provider_id = payload.get('provider_id') if isinstance(payload, dict) else None
+        if provider_id is not None:
+            # Se guarda en entries y products: sólo el id de un proveedor que exista
+            if isinstance(provider_id, bool) or not isinstance(provider_id, int) or provider_id <= 0:
+                error = "Proveedor inválido"
+            elif not await self.db(_provider_exists, provider_id):
+                error = "Proveedor no existe"
+            else:
+                error = None
+            if error:
+                return json_response({'success': False, 'applied': 0, 'error': error,
+                                      'errors': {'provider_id': error}}, 400)
+        # Todo o nada: un reintento después de corregir no duplica las líneas válidas
+        results = await self.db(lambda s: apply_entries(s, lines, provider_id, all_or_nothing=True))
+        applied = sum(1 for r in results if r['success'])
+        if applied < len(lines):
+            return json_response({'success': False, 'applied': applied, 'error': "Hay líneas con errores",
+                                  'results': results}, 400)
+        return json_response({'success': True, 'applied': applied, 'results': results})
+
+    async def api_products(self, request):
+        q = (request.query.get('q') or [''])[0].strip()
+        return json_response(await self.db(_search_products, q))
+
+    async def api_entries(self, request):
+        return json_response(await self.db(_recent_entries))
+
+    async def events(self, request):
+        """Flujo SSE de change_feed; con Last-Event-ID se reenvía lo que el cliente se perdió"""
+        if self.feed is None:
+            raise HttpError(503, "Avisos en vivo no disponibles para esta base")
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        def push(event_id, event):
+            loop.call_soon_threadsafe(queue.put_nowait, (event_id, event))
+
+        unsubscribe = self.feed.subscribe(push)
+        try:
+            last_id = int(request.headers.get('last-event-id') or 0)
+        except ValueError:
+            last_id = 0
+
+        async def messages():
+            sent = last_id
+            try:
+                yield "retry: 3000\n\n"
+                for event_id, event in self.feed.since(last_id) if last_id else ():
+                    sent = event_id
+                    yield sse_message(event_id, event)
+                while True:
+                    try:
+                        event_id, event = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+                    except asyncio.TimeoutError:
+                        yield ": ping\n\n"
+                        continue
+                    if event_id > sent:  # Ya enviado desde el historial
+                        sent = event_id
+                        yield sse_message(event_id, event)
+            finally:
+                unsubscribe()
+
+        return StreamingResponse(messages(), content_type='text/event-stream; charset=utf-8',
+                                 headers={'Cache-Control': 'no-cache'})
+
+    # ---------- formularios (templates/) ----------
+    async def upload(self, request):
+        data = request.form()[1].get('factura')
+        if not data:
+            raise HttpError(400, "Falta la factura")
+        self._template('review.html')
+        pages = iter_pages(data)
+        # La primera página se procesa antes de responder: un archivo ilegible da 400, no media página
+        first = await self.extract(pages)
+        if first is None:
+            raise HttpError(400, "La factura no tiene páginas")
+        matcher = await self.product_matcher()
+        return self.stream('review.html', items=self.invoice_items(first, pages, matcher))
+
+    async def extract(self, pages):
+        """Siguiente página de la factura ya extraída, o None al terminar"""
+        loop = asyncio.get_running_loop()
+        try:
+            page = await loop.run_in_executor(self.cpu_pool, next, pages, None)
+            if page is None:
+                return None
+            return await loop.run_in_executor(self.cpu_pool, extract_page, page, self.recognizer)
+        except DecodeUnavailable as e:
+            raise HttpError(503, str(e))
+        except Exception as e:
+            log.warning("⚠️ No se pudo leer la factura: %s", e)
+            raise HttpError(400, "No se pudo leer la factura")
+
+    async def invoice_items(self, first, pages, matcher):
+        """Artículos de cada página, con el stock actual, a medida que se extraen"""
+        page, number = first, 1
+        while page is not None:
+            items = page_items(page, matcher)
+            stock = await self.db(_products_by_code, [it['code'] for it in items if it['code']])
+            log.debug("🧾 Factura página %d: %d renglones, %d códigos, %d artículos",
+                      number, len(page['lines']), len(page['codes']), len(items))
+            for it in items:
+                it['curr_stock'] = stock[it['code']]['stock'] if it['code'] in stock else 0
+                yield it
+            try:
+                page = await self.extract(pages)
+            except HttpError as e:
+                log.warning("⚠️ Factura: página %d omitida (%s)", number + 1, e)
+                break
+            number += 1
+
+    async def confirm(self, request):
+        fields = request.form()[0]
+        qtys, names, codes = fields.get('qtys', []), fields.get('names', []), fields.get('codes', [])
+        rows = []
+        for i, qty in enumerate(qtys):
+            try:
+                rows.append((int(qty), names[i] if i < len(names) else '', codes[i] if i < len(codes) else ''))
+            except ValueError:
+                continue
+        applied = sum(1 for r in await self.db(_confirm_invoice, rows) if r['success'])
+        log.info("📦 Factura confirmada desde la web: %d líneas", applied)
+        return redirect('/')
+
+    async def scan_form(self, request):
+        data = request.form()[1].get('photo')
+        if not data:
+            raise HttpError(400, "Falta la foto")
+        codes = await self.decode(data)
+        products = await self.db(_products_by_code, codes) if codes else {}
+        items = [{'code': code, 'product': products.get(code), 'found': code in products} for code in codes]
+        return await self.render('scan.html', items=items)
+
+    async def scan_add(self, request):
+        code = (request.field('code') or '').strip()
+        qty = _positive_int(request.field('qty'), "Cantidad")
+        result = (await self.db(apply_entries, [{'code': code, 'quantity': qty}]))[0]
+        if not result['success']:
+            raise HttpError(404, result['error'])
+        return redirect('/')
+
+    # ---------- ciclo de vida ----------
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        if self.feed is not None:
+            self.feed.start()
+        # Los procesos de decodificación arrancan en segundo plano, no con la primera foto
+        asyncio.get_running_loop().run_in_executor(self.cpu_pool, warm_up)
+        log.info("🌐 Servidor web en http://%s:%d/web/", self.host, self.port)
+        return self.server
+
+    async def serve_forever(self):
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    def run_in_thread(self):
+        """Arrancar el servidor en un hilo propio (para usarlo junto a la app de escritorio)"""
+        thread = threading.Thread(target=lambda: asyncio.run(self.serve_forever()),
+                                  name="pos-web", daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor web local de POS Py")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--db', default=None, help="Ruta de la base (por defecto pos.db)")
+    parser.add_argument('--pool', type=int, default=POOL_SIZE, help="Conexiones a la base")
+    args = parser.parse_args()
+
+    db_url = f"sqlite:///{args.db}" if args.db else DB_URL
+    server = PosWebServer(args.host, args.port, db_url, args.pool)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        log.info("🛑 Servidor detenido")
+
+
+if __name__ == "__main__":
+    main()